@@ -0,0 +1,86 @@
+"""
+Micro-benchmark for LLM output JSON extraction.
+
+Compares the previous regex + parse/dump/parse extraction with
+`extract_json` on model-shaped outputs of growing size.
+
+Run from the project root:
+    python benchmarks/bench_json_cleaner.py [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import timeit
+
+# Ensure we can import modules from src when running from project root
+sys.path.append(os.getcwd())
+
+from src.log.guardians.app.utils.json_cleaner import extract_json
+
+
+def legacy_extract(raw_content: str):
+    """The pre-`extract_json` path: clean_json_content followed by json.loads."""
+    content = re.sub(r'```json', '', raw_content, flags=re.IGNORECASE)
+    content = re.sub(r'```', '', content)
+    match = re.search(r'(\{.*\}|\[.*\])', content, flags=re.DOTALL)
+    if not match:
+        return None
+    try:
+        cleaned = json.dumps(json.loads(match.group(0).strip()))
+    except json.JSONDecodeError:
+        return None
+    return json.loads(cleaned)
+
+
+def make_records(count: int):
+    return [
+        {
+            "log_id": str(134681 + i),
+            "node": f"node-{i % 256}",
+            "component": "unix.hw",
+            "state": "state_change.unavailable",
+            "timestamp": str(1077804742 + i),
+            "flag": "1",
+            "message": f"Component State Change: Component \\042alt0\\042 is in the unavailable state (HWID={i})",
+        }
+        for i in range(count)
+    ]
+
+
+def make_cases():
+    cases = {}
+    for count in (10, 500, 5000):
+        body = json.dumps(make_records(count), indent=2)
+        cases[f"fenced array, {count} records"] = f"Here is the JSON:\n```json\n{body}\n```\nDone."
+        # Trailing prose with brackets defeats the greedy regex
+        cases[f"trailing brackets, {count} records"] = f"```json\n{body}\n```\nNote: [raw] values stay in {{}}."
+        # Output cut off mid-record, e.g. by the max output token limit
+        cases[f"truncated, {count} records"] = body[: int(len(body) * 0.9)]
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="timing repetitions per case (best is reported)")
+    args = parser.parse_args()
+
+    print(f"{'case':<32} {'size':>9} {'legacy ms':>10} {'extract ms':>11} {'speedup':>8}  recovered (legacy/new)")
+    for name, text in make_cases().items():
+        number = max(1, 200_000 // len(text))
+        legacy = min(timeit.repeat(lambda: legacy_extract(text), number=number, repeat=args.repeat)) / number
+        new = min(timeit.repeat(lambda: extract_json(text), number=number, repeat=args.repeat)) / number
+
+        def describe(value):
+            return "none" if value is None else f"{len(value)} items"
+
+        print(
+            f"{name:<32} {len(text) / 1024:>7.0f}KB {legacy * 1000:>10.3f} {new * 1000:>11.3f} "
+            f"{legacy / new:>7.1f}x  {describe(legacy_extract(text))} / {describe(extract_json(text))}"
+        )
+
+
+if __name__ == "__main__":
+    main()
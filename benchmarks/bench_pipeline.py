@@ -0,0 +1,297 @@
+"""
+Pipeline benchmarks against the bundled sample logs, offline.
+
+Agent stages run on the stand-in model of benchmarks/stand_in_llm.py, swapped
+in behind every agent, so no API key or quota is needed and latency, error rate and anomaly rate are set
+from the command line. Every case runs in a fresh subprocess inside a
+temporary working directory holding its own copy of the config, so peak RSS
+is measured per case and the repository's .LogGuardians is left alone.
+
+Cases:
+    chunk     chunk_log_file over the input log
+    clean     extract_json over model-shaped replies for every chunk
+    save      save_json_tool for every chunk
+    agents    LLM conversion, anomaly detection and report through the agent loops
+    pipeline  the whole staged pipeline (run_pipeline), chunking included
+
+Run from the project root:
+    python benchmarks/bench_pipeline.py [--logs HPC Linux] [--scale 1 10]
+        [--cases chunk agents] [--latency 0.05] [--error-rate 0.02] [--agent-io direct]
+        [--json results.json] [--baseline previous.json --tolerance 0.2]
+
+Failed model turns are retried on the agents' own schedule; --retry-delay
+shortens it for runs with a high --error-rate. With --baseline, throughput
+drops and peak RSS growth beyond --tolerance are listed and the exit status
+is 1, so regressions fail CI.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CONFIG_PATH = "src/log/guardians/app/main/config/chunker_config.yaml"
+CASES = ("chunk", "clean", "save", "agents", "pipeline")
+# Sample log -> log profile
+PROFILES = {
+    "Android": "android", "Apache": "apache", "Hadoop": "java_bigdata", "HealthApp": "healthapp",
+    "HPC": "hpc", "Linux": "syslog", "OpenSSH": "syslog", "Proxifier": "proxifier",
+    "Zookeeper": "java_bigdata",
+}
+RESULT_MARKER = "BENCH_RESULT "
+
+
+# --- case runner (child process) ---
+
+def _write_config(spec):
+    import yaml
+
+    with open(os.path.join(ROOT, CONFIG_PATH), 'r') as f:
+        config = yaml.safe_load(f)
+    config.update(
+        input_log_file=spec['log_path'],
+        active_profile=spec['profile'],
+        chunk_workers=1,
+        cache_enabled=False,
+        agent_concurrency=spec['concurrency'],
+        conversion_mode=spec['conversion_mode'],
+        agent_io_mode=spec['agent_io'],
+    )
+    if spec['max_entries']:
+        config['max_entries_per_chunk'] = spec['max_entries']
+    os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
+    with open(CONFIG_PATH, 'w') as f:
+        yaml.safe_dump(config, f)
+    return config
+
+
+def _quiet(fn, *args):
+    """Runs fn with stdout discarded (the stages print per chunk)."""
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            return fn(*args)
+        finally:
+            sys.stdout = stdout
+
+
+def run_case(spec):
+    os.chdir(spec['workdir'])
+    config = _write_config(spec)
+
+    from src.log.guardians.app.agent.tools import read_file_tool, save_json_tool, json_output_path
+    from src.log.guardians.app.features.chunking.chunker import chunk_log_file
+    from src.log.guardians.app.utils.json_cleaner import extract_json
+    from src.log.guardians.app.utils.metrics import tracer
+
+    case = spec['case']
+    if case in ('agents', 'pipeline'):
+        from benchmarks.stand_in_llm import install_stand_in
+        install_stand_in(
+            latency_s=spec['latency'], latency_jitter_s=spec['jitter'],
+            error_rate=spec['error_rate'], anomaly_rate=spec['anomaly_rate'],
+        )
+
+    if spec['retry_delay'] is not None:
+        # Keep the agents' retry counts but shorten their production backoff
+        from src.log.guardians.app.agent import anomaly_detection_agent, json_converter_agent
+        for module in (json_converter_agent, anomaly_detection_agent):
+            module.retry_config.initial_delay = spec['retry_delay']
+            module.retry_config.exp_base = 2
+
+    extra = {}
+    if case in ('chunk', 'pipeline'):
+        files = None
+    else:
+        files = _quiet(chunk_log_file, config)
+        chunk_records = [
+            [{"message": line} for line in read_file_tool(path).splitlines()] for path in files
+        ]
+
+    started = time.perf_counter()
+    if case == 'chunk':
+        files = _quiet(chunk_log_file, config)
+    elif case == 'clean':
+        replies = [f"```json\n{json.dumps(records, indent=2)}\n```" for records in chunk_records]
+        started = time.perf_counter()
+        for reply in replies:
+            extract_json(reply)
+    elif case == 'save':
+        for path, records in zip(files, chunk_records):
+            save_json_tool(records, path)
+    elif case == 'agents':
+        from src.log.guardians.app.agent.json_converter_agent import run_conversion
+        from src.log.guardians.app.agent.anomaly_detection_agent import run_anomaly_detection
+        from src.log.guardians.app.agent.report_generator_agent import run_report_generation
+
+        async def agents():
+            await run_conversion(files)
+            await run_anomaly_detection([json_output_path(path) for path in files])
+            await run_report_generation()
+        _quiet(asyncio.run, agents())
+    else:
+        from src.log.guardians.app.main.main import run_pipeline
+        _quiet(asyncio.run, run_pipeline())
+        from src.log.guardians.app.agent.tools import get_log_files_tool
+        files = get_log_files_tool()
+    elapsed = time.perf_counter() - started
+
+    if case in ('agents', 'pipeline'):
+        counters = {}
+        for stats in tracer.stages.values():
+            counters['llm_calls'] = counters.get('llm_calls', 0) + len(stats.latencies)
+            for name in ('retries', 'rate_limited', 'prompt_tokens'):
+                counters[name] = counters.get(name, 0) + stats.counters.get(name, 0)
+        extra.update(counters)
+
+    with open(spec['log_path'], 'rb') as f:
+        lines = sum(1 for _ in f)
+    size = os.path.getsize(spec['log_path'])
+    # ru_maxrss is in KB on Linux; parse pools are children, not counted
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return dict(
+        extra,
+        elapsed_s=round(elapsed, 4),
+        lines=lines,
+        chunks=len(files),
+        lines_per_s=round(lines / elapsed, 1) if elapsed else None,
+        chunks_per_s=round(len(files) / elapsed, 1) if elapsed else None,
+        mb_per_s=round(size / 1048576 / elapsed, 2) if elapsed else None,
+        peak_rss_mb=round(peak_rss_mb, 1),
+    )
+
+
+# --- driver ---
+
+def scaled_copy(log_name, scale, tmp_dir):
+    """Returns the sample log, or a copy concatenated ``scale`` times."""
+    source = os.path.join(ROOT, "data", "logs", f"{log_name}_2k.log")
+    if scale == 1:
+        return source
+    target = os.path.join(tmp_dir, f"{log_name}_2k_x{scale}.log")
+    if not os.path.exists(target):
+        with open(source, 'rb') as f:
+            data = f.read()
+        if not data.endswith(b"\n"):
+            data += b"\n"
+        with open(target, 'wb') as f:
+            for _ in range(scale):
+                f.write(data)
+    return target
+
+
+def launch(spec):
+    """Runs one case in a fresh interpreter and returns its result (or an error)."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    env.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-case", json.dumps(spec)],
+        capture_output=True, text=True, env=env,
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    tail = (proc.stderr or proc.stdout).strip().splitlines()[-1:] or ["no output"]
+    return {"error": tail[0]}
+
+
+def compare(results, baseline, tolerance):
+    """Returns (cases compared, regression messages) against the baseline."""
+    regressions = []
+    compared = 0
+    for key, result in results.items():
+        old = baseline.get(key)
+        if not old or "error" in result or "error" in old:
+            continue
+        compared += 1
+        if old.get("lines_per_s") and result["lines_per_s"] < old["lines_per_s"] * (1 - tolerance):
+            regressions.append(f"{key}: {result['lines_per_s']:.0f} lines/s vs {old['lines_per_s']:.0f}")
+        if old.get("peak_rss_mb") and result["peak_rss_mb"] > old["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{key}: peak RSS {result['peak_rss_mb']:.0f} MB vs {old['peak_rss_mb']:.0f} MB")
+    return compared, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logs", nargs="+", default=["HPC", "Linux", "Hadoop"], choices=sorted(PROFILES))
+    parser.add_argument("--scale", nargs="+", type=int, default=[1, 10], help="copies of each log to concatenate")
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=CASES)
+    parser.add_argument("--latency", type=float, default=0.0, help="stand-in model seconds per turn")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds per turn")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of turns failing with a 429")
+    parser.add_argument("--anomaly-rate", type=float, default=0.05)
+    parser.add_argument("--retry-delay", type=float, help="first retry delay in seconds (default: the agents' own)")
+    parser.add_argument("--concurrency", type=int, default=4, help="agent_concurrency")
+    parser.add_argument("--conversion-mode", default="llm", choices=("llm", "regex"))
+    parser.add_argument("--agent-io", default="tools", choices=("tools", "direct"), help="agent_io_mode")
+    parser.add_argument("--max-entries", type=int, default=0, help="max_entries_per_chunk (0 = config)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(RESULT_MARKER + json.dumps(run_case(json.loads(args.run_case))))
+        return
+
+    tmp_root = tempfile.mkdtemp(prefix="lg_bench_")
+    results = {}
+    header = (f"{'case':<9} {'log':<10} {'scale':>5} {'chunks':>7} {'time s':>8} {'lines/s':>10} "
+              f"{'chunks/s':>9} {'MB/s':>7} {'RSS MB':>7}  LLM calls/retries")
+    print(header)
+    print("-" * len(header))
+    try:
+        for log_name in args.logs:
+            for scale in args.scale:
+                log_path = scaled_copy(log_name, scale, tmp_root)
+                for case in args.cases:
+                    workdir = tempfile.mkdtemp(dir=tmp_root)
+                    spec = dict(
+                        case=case, log_path=log_path, profile=PROFILES[log_name], workdir=workdir,
+                        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                        anomaly_rate=args.anomaly_rate, concurrency=args.concurrency,
+                        conversion_mode=args.conversion_mode, agent_io=args.agent_io, max_entries=args.max_entries,
+                        retry_delay=args.retry_delay,
+                    )
+                    result = launch(spec)
+                    shutil.rmtree(workdir, ignore_errors=True)
+                    results[f"{case}:{log_name}:x{scale}"] = result
+                    if "error" in result:
+                        print(f"{case:<9} {log_name:<10} {scale:>5}  ❌ {result['error']}")
+                        continue
+                    llm = f"{result['llm_calls']}/{result['retries']}" if "llm_calls" in result else ""
+                    print(f"{case:<9} {log_name:<10} {scale:>5} {result['chunks']:>7} {result['elapsed_s']:>8.3f} "
+                          f"{result['lines_per_s']:>10.0f} {result['chunks_per_s']:>9.1f} {result['mb_per_s']:>7.2f} "
+                          f"{result['peak_rss_mb']:>7.1f}  {llm}")
+    finally:
+        shutil.rmtree(tmp_root, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)["results"]
+        compared, regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressions beyond {args.tolerance:.0%}:")
+            for message in regressions:
+                print(f"  - {message}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.tolerance:.0%} in {compared} cases compared with {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Offline stand-in for Gemini, used by the benchmarks.
+
+``install_stand_in`` swaps the model behind the pipeline's agents for
+a ``StandInLlm`` after the agent modules are imported, so production code
+and config know nothing about it.
+"""
+
+import ast
+import asyncio
+import json
+import os
+import random
+import re
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from google.adk.agents import Agent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from src.log.guardians.app.utils.async_pool import retry_delay
+from src.log.guardians.app.utils.metrics import tracer
+from src.log.guardians.app.utils.token_budget import estimate_tokens
+
+_FILE_BLOCK = re.compile(r"<<<FILE ([^>]+)>>>\n(.*?)(?=\n<<<FILE |\Z)", re.DOTALL)
+_ENTRY_BLOCK = re.compile(r"<<<ENTRY \d+>>>\n(.*?)(?=\n<<<ENTRY |\Z)", re.DOTALL)
+
+
+class StandInRateLimitError(Exception):
+    """Simulated HTTP 429 from the stand-in model."""
+    code = 429
+
+
+class StandInLlm(BaseLlm):
+    """
+    Offline stand-in for Gemini that follows the pipeline's prompts.
+
+    It plays each agent's tool protocol (reading a chunk, then saving it),
+    answers the batched, inline and direct prompts with well-formed JSON, and reports
+    token usage estimated from the request size. So the agent loops,
+    sessions, pools and retries all run as they would against the API, with
+    no quota or network involved.
+
+    Args:
+        latency_s: Base delay per model turn.
+        latency_jitter_s: Extra uniform random delay per turn.
+        error_rate: Share of requests failing with a simulated 429. Like the
+            Gemini client, the stand-in retries them on ``retry_options``
+            and only raises once every attempt failed.
+        anomaly_rate: Share of files reported as anomalous (decided per file
+            name, so results do not depend on scheduling).
+        responses: Canned replies, ``[{"match": regex, "text": reply}]``,
+            tried in order against the prompt before the built-in behaviour.
+        seed: Seed for latency jitter, errors and anomaly decisions.
+        retry_options: The agent's ``HttpRetryOptions``.
+    """
+
+    latency_s: float = 0.0
+    latency_jitter_s: float = 0.0
+    error_rate: float = 0.0
+    anomaly_rate: float = 0.05
+    responses: List[Dict[str, str]] = []
+    seed: int = 0
+    retry_options: Optional[Any] = None
+
+    def model_post_init(self, __context: Any):
+        self._rng = random.Random(self.seed)
+
+    # --- request inspection ---
+
+    @staticmethod
+    def _prompt_and_results(llm_request: LlmRequest):
+        """Returns (the last user prompt, {tool name: response} given since)."""
+        prompt, results = "", {}
+        for content in llm_request.contents or []:
+            for part in content.parts or []:
+                if part.function_response is not None:
+                    results[part.function_response.name] = part.function_response.response
+                elif part.text and content.role == "user":
+                    prompt, results = part.text, {}
+        return prompt, results
+
+    def _anomalous(self, name: str) -> bool:
+        return random.Random(f"{self.seed}:{name}").random() < self.anomaly_rate
+
+    @staticmethod
+    def _anomaly(name: str) -> Dict[str, Any]:
+        return {
+            "severity": "High",
+            "description": f"Stand-in anomaly in {name}",
+            "evidence": [],
+            "correlation": "none",
+        }
+
+    @staticmethod
+    def _entries(text: str) -> List[Dict[str, Any]]:
+        return [{"message": line} for line in text.splitlines() if line.strip()]
+
+    # --- replies ---
+
+    def _reply(self, prompt: str, results: Dict[str, Any]):
+        """Returns the turn's reply: a text string or a (tool name, args) call."""
+        for canned in self.responses:
+            if re.search(canned["match"], prompt):
+                return canned["text"]
+
+        match = re.search(r"Process this log file: (.+?)\. Read it", prompt)
+        if match:
+            path = match.group(1)
+            if "read_file_tool" not in results:
+                return "read_file_tool", {"file_path": path}
+            if "save_json_tool" not in results:
+                content = results["read_file_tool"].get("result", "")
+                return "save_json_tool", {"data": self._entries(content), "original_file_path": path}
+            return f"Saved {os.path.basename(path)}."
+
+        match = re.search(r"Analyze this JSON log file: (.+?)\. Original filename is '([^']+)'", prompt)
+        if match:
+            path, name = match.groups()
+            if "read_json_file_tool" not in results:
+                return "read_json_file_tool", {"file_path": path}
+            if not self._anomalous(name):
+                return "No anomalies found."
+            if "save_anomaly_json_tool" not in results:
+                return "save_anomaly_json_tool", {"data": {"anomalies": [self._anomaly(name)]}, "original_filename": name}
+            return "Anomalies detected and saved."
+
+        match = re.search(r"Analyze the log entries of the JSON log file '([^']+)'", prompt)
+        if match:
+            name = match.group(1)
+            if not self._anomalous(name):
+                return "No anomalies found."
+            if "save_anomaly_json_tool" not in results:
+                return "save_anomaly_json_tool", {"data": {"anomalies": [self._anomaly(name)]}, "original_filename": name}
+            return "Anomalies detected and saved."
+
+        match = re.search(r"Convert the log file '([^']+)' below", prompt)
+        if match:
+            blocks = dict(_FILE_BLOCK.findall(prompt))
+            return json.dumps(self._entries(blocks.get(match.group(1), "")))
+
+        match = re.search(r"Find the anomalies in the JSON log file '([^']+)' below", prompt)
+        if match:
+            name = match.group(1)
+            return json.dumps({"anomalies": [self._anomaly(name)] if self._anomalous(name) else []})
+
+        if "log files to JSON using the schema" in prompt:
+            return json.dumps({name: self._entries(text) for name, text in _FILE_BLOCK.findall(prompt)})
+
+        if "JSON log files on its own" in prompt:
+            return json.dumps({
+                name: [self._anomaly(name)] if self._anomalous(name) else []
+                for name, _ in _FILE_BLOCK.findall(prompt)
+            })
+
+        match = re.search(r"using exactly these keys in this order: (\[.*?\])\.", prompt)
+        if match:
+            keys = ast.literal_eval(match.group(1))
+            return json.dumps([
+                {k: (raw if k == "message" else None) for k in keys} for raw in _ENTRY_BLOCK.findall(prompt)
+            ])
+
+        if '{"parse_pattern"' in prompt:
+            return json.dumps({"parse_pattern": r"^(?P<message>.*)$"})
+        if "Design the JSON schema" in prompt:
+            design = {"fields": {"message": "the full log line"}}
+            if '"schema_keys"' in prompt:
+                design.update(schema_keys=["message"], field_types={"message": "string"})
+            return json.dumps(design)
+        if "Consolidated Security Report" in prompt:
+            return f"# Consolidated Security Report\n\nStand-in report over {len(prompt)} characters of anomaly data.\n"
+        if "Partial Findings" in prompt:
+            return f"## Partial Findings\n\n- Stand-in summary of {len(prompt)} characters of anomaly groups.\n"
+        return "OK"
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        delay = self.latency_s + self._rng.uniform(0, self.latency_jitter_s)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        attempts = max(1, getattr(self.retry_options, 'attempts', None) or 1)
+        for attempt in range(1, attempts + 1):
+            if not (self.error_rate and self._rng.random() < self.error_rate):
+                break
+            if attempt == attempts:
+                raise StandInRateLimitError("429 RESOURCE_EXHAUSTED: stand-in model rate limit")
+            tracer.count("rate_limited")
+            tracer.count("retries")
+            await asyncio.sleep(retry_delay(self.retry_options, attempt))
+
+        prompt, results = self._prompt_and_results(llm_request)
+        reply = self._reply(prompt, results)
+        if isinstance(reply, str):
+            part = types.Part(text=reply)
+            completion = reply
+        else:
+            name, args = reply
+            part = types.Part(function_call=types.FunctionCall(name=name, args=args))
+            completion = json.dumps(args)
+
+        request_text = "".join(
+            p.text or "" for content in llm_request.contents or [] for p in content.parts or []
+        )
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[part]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=estimate_tokens(request_text),
+                candidates_token_count=estimate_tokens(completion),
+            ),
+        )
+
+
+def install_stand_in(**settings) -> None:
+    """
+    Replaces the model of every pipeline agent (converter, detector, report)
+    with a ``StandInLlm`` built from ``settings`` (the ``StandInLlm``
+    fields), keeping each agent's model name and retry options.
+    """
+    from src.log.guardians.app.agent import anomaly_detection_agent, json_converter_agent, report_generator_agent
+
+    stand_ins = {}
+
+    def stand_in(model):
+        if isinstance(model, StandInLlm):
+            return model
+        if id(model) not in stand_ins:
+            stand_ins[id(model)] = StandInLlm(model=model.model, retry_options=model.retry_options, **settings)
+        return stand_ins[id(model)]
+
+    for module in (json_converter_agent, anomaly_detection_agent, report_generator_agent):
+        for name, value in list(vars(module).items()):
+            if isinstance(value, Agent):
+                value.model = stand_in(value.model)
+            elif isinstance(value, BaseLlm):
+                # Module-level models build agents later (direct runners) and name the cache keys
+                setattr(module, name, stand_in(value))
@@ -2,7 +2,8 @@ import asyncio
 import sys
 import os
 import json
-from typing import Dict, List, Any
+import re
+from typing import Dict, List, Any, Optional
 
 # Ensure we can import modules from src when running from project root
 sys.path.append(os.getcwd())
@@ -12,7 +13,23 @@ from google.adk.agents import Agent
 from google.adk.models.google_llm import Gemini
 from google.adk.runners import InMemoryRunner
 from google.genai import types
-from src.log.guardians.app.agent.tools import read_json_file_tool, get_json_files_tool, save_anomaly_json_tool
+from src.log.guardians.app.agent.tools import read_json_file_tool, get_json_files_tool, save_anomaly_json_tool, anomaly_output_path, json_output_path
+from src.log.guardians.app.features.chunking.chunk_store import chunk_path
+from src.log.guardians.app.features.chunking.chunker import chunk_output_dir, load_config
+from src.log.guardians.app.features.correlation.entity_index import EntityIndex
+from src.log.guardians.app.features.dedup.near_duplicates import NearDuplicates
+from src.log.guardians.app.features.parsing.record_io import parse_records
+from src.log.guardians.app.features.scoring.prefilter import SCORES_LOG, ChunkPrefilter
+from src.log.guardians.app.features.templates.assignments import load_template_ids
+from src.log.guardians.app.features.templates.compress import compress_records
+from src.log.guardians.app.features.templates.drain import TemplateMiner
+from src.log.guardians.app.utils.agent_sessions import ContextMeter, SessionStrategy
+from src.log.guardians.app.utils.async_pool import run_batched, run_bounded
+from src.log.guardians.app.utils.json_cleaner import extract_json
+from src.log.guardians.app.utils.metrics import timed_run, tracer
+from src.log.guardians.app.utils.result_cache import ResultCache
+from src.log.guardians.app.utils.structured_output import AGENT_IO_MODES, ANOMALY_REPORT_SCHEMA
+from src.log.guardians.app.utils.token_budget import estimate_file_tokens, estimate_tokens
 
 load_dotenv()
 
@@ -26,7 +43,7 @@ retry_config = types.HttpRetryOptions(
 )
 
 model = Gemini(
-    model="gemini-2.5-flash", 
+    model="gemini-2.5-flash",
     retry_options=retry_config
 )
 
@@ -68,9 +85,362 @@ agent = Agent(
 
 runner = InMemoryRunner(agent=agent)
 
+# 'direct' agent I/O: the file is in the prompt and the reply is the report itself
+direct_agent = Agent(
+    name="AnomalyDetectorDirect",
+    model=model,
+    description="Detects anomalies in structured log data given in the prompt, in one reply.",
+    instruction="""
+    You are an expert Anomaly Detection Agent. Your goal is to analyze a SINGLE structured JSON log file, given in the prompt, and identify security threats, system failures, and unusual patterns using your own reasoning.
+
+    - Look for patterns such as:
+        - **Security Threats**: Repeated authentication failures, unauthorized access attempts (sudo/su), suspicious IP addresses.
+        - **System Failures**: Critical errors, service crashes, hardware warnings.
+        - **Anomalous Behavior**: Unusual time spikes, high frequency of specific events.
+    - Use your broad knowledge of computer systems, applications, network protocols, and security to interpret the logs, regardless of the platform (Linux, Windows, Cloud, etc.).
+    - **CRITICAL**: Only report ACTUAL anomalies. Do not report normal system operations.
+
+    **Output Format**: a JSON object whose `anomalies` list holds one object per anomaly with
+    `severity` ("Critical", "High", "Medium" or "Low"), `description` (what happened?), `evidence`
+    (specific log messages or patterns) and `correlation` (connection between events). If NO
+    anomalies are found, `anomalies` is an empty list.
+    """,
+    output_schema=ANOMALY_REPORT_SCHEMA,
+)
+
+direct_runner = InMemoryRunner(agent=direct_agent)
+
+CONFIG_PATH = "src/log/guardians/app/main/config/chunker_config.yaml"
+_CHUNK_ID = re.compile(r"chunk_(\d+)")
+
+
+class AnomalyDetector:
+    """
+    Analyzes one structured JSON file at a time.
+
+    Holds the per-run sessions, cache and context meter so the batch
+    `run_anomaly_detection` stage and the streaming pipeline share one
+    implementation.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.io_mode = config.get('agent_io_mode', 'tools')
+        if self.io_mode not in AGENT_IO_MODES:
+            raise ValueError(f"Unknown agent_io_mode '{self.io_mode}'. Expected one of: {', '.join(AGENT_IO_MODES)}")
+        self.sessions = SessionStrategy.from_config(runner, "detector", config)
+        self.direct_sessions = SessionStrategy.from_config(direct_runner, "detector", config)
+        self.meter = ContextMeter("detector")
+        self.cache = ResultCache.from_config(config, "detector")
+        self.batch_budget = int(config.get('batch_token_budget', 0))
+        # 'tool': the agent reads each file itself; 'templates': entries are
+        # sent inline, compressed by mined message template
+        self.prompt_mode = config.get('detector_prompt_mode', 'tool')
+        # Shared with the converter, whose per-entry assignments it reuses
+        self.miner = TemplateMiner.shared(config) if self.prompt_mode == 'templates' else None
+        # Cross-chunk context per chunk from the entity index, when chunking built
+        # one; opened on first use, since chunking replaces the previous run's
+        self._entities = None
+        self._entities_opened = False
+        self.hint_limit = int(config.get('entity_index_hints', 8))
+
+    async def analyze(self, slot: int, file_path: str, index: int, entries_text: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Analyzes one JSON file. ``entries_text`` is the file's inline text
+        when the caller already built it, so its entries are not mined again.
+
+        Returns:
+            {"found": bool, "report": saved anomaly report or None}
+        """
+        filename = os.path.basename(file_path)
+        print(f"\n[{index+1}] Analyzing: {filename}")
+
+        output_path = anomaly_output_path(filename)
+        hints = self._hints(filename)
+        with open(file_path, 'rb') as f:
+            cache_key = self._cache_key(f.read(), hints)
+            tracer.count("bytes_read", f.tell())
+        cached = self._restore_cached(cache_key, filename)
+        if cached is not None:
+            return cached
+
+        if os.path.exists(output_path):
+            os.remove(output_path)  # so a stale report can't pass for this run's result
+
+        if self.io_mode == 'direct':
+            return await self._analyze_direct(slot, file_path, index, hints, cache_key, entries_text)
+
+        if self.miner is None:
+            prompt = f"Analyze this JSON log file: {file_path}. Original filename is '{filename}'. Read it using `read_json_file_tool`. If anomalies are found, save them using `save_anomaly_json_tool`."
+        else:
+            if entries_text is None:
+                entries_text = self._read_entries_text(file_path)
+            prompt = (
+                f"Analyze the log entries of the JSON log file '{filename}' below; they are already "
+                f"included, so do not read the file.\n\n{entries_text}\n\n"
+                f"If anomalies are found, save them using `save_anomaly_json_tool` with original filename '{filename}'."
+            )
+        if hints:
+            prompt += f"\n\n{hints}"
+
+        # Run the agent for this specific file, on a session chosen by the strategy
+        session_id = await self.sessions.acquire(slot, index)
+        try:
+            response = await timed_run(runner, prompt, session_id=session_id, chunk=index)
+            self.meter.record(index, session_id, response)
+        finally:
+            await self.sessions.release(session_id)
+
+        # Extract response
+        last_turn = response[-1]
+        if hasattr(last_turn, 'content') and last_turn.content and last_turn.content.parts:
+            agent_text = last_turn.content.parts[0].text
+        else:
+            agent_text = str(last_turn)
+
+        # Check if anomalies were found
+        found = "No anomalies found" not in agent_text
+        if found:
+            print(f"⚠️  Anomalies detected in {filename}!")
+            print(f"Agent Response: {agent_text}")
+        else:
+            print(f"✅ No anomalies found in {filename}.")
+
+        return self._store_result(cache_key, found, output_path)
+
+    async def _analyze_direct(self, slot: int, file_path: str, index: int, hints: str, cache_key: str,
+                              entries_text: Optional[str] = None) -> Dict[str, Any]:
+        """One schema-constrained turn with the entries in the prompt; a report is saved here."""
+        filename = os.path.basename(file_path)
+        if entries_text is None:
+            entries_text = self._read_entries_text(file_path)
+        prompt = f"Find the anomalies in the JSON log file '{filename}' below.\n\n{entries_text}"
+        if hints:
+            prompt += f"\n\n{hints}"
+
+        session_id = await self.direct_sessions.acquire(slot, index)
+        try:
+            response = await timed_run(direct_runner, prompt, session_id=session_id, chunk=index)
+            self.meter.record(index, session_id, response)
+        finally:
+            await self.direct_sessions.release(session_id)
+
+        last_turn = response[-1]
+        if hasattr(last_turn, 'content') and last_turn.content and last_turn.content.parts:
+            agent_text = last_turn.content.parts[0].text or ""
+        else:
+            agent_text = str(last_turn)
+        report = extract_json(agent_text)
+        if not isinstance(report, dict) or not isinstance(report.get("anomalies"), list):
+            raise RuntimeError("model reply is not an anomaly report")
+
+        anomalies = report["anomalies"]
+        if anomalies:
+            save_anomaly_json_tool({"anomalies": anomalies}, filename)
+            print(f"⚠️  Anomalies detected in {filename}!")
+        else:
+            print(f"✅ No anomalies found in {filename}.")
+        return self._store_result(cache_key, bool(anomalies), anomaly_output_path(filename))
+
+    def _cache_key(self, content: bytes, hints: str = "") -> str:
+        instruction = direct_agent.instruction if self.io_mode == 'direct' else agent.instruction
+        parts = [content, instruction, model.model, self.prompt_mode]
+        if hints:
+            parts.append(hints)
+        return ResultCache.make_key(*parts)
+
+    def _hints(self, filename: str) -> str:
+        """What the entity index knows from other chunks about this chunk's entities."""
+        match = _CHUNK_ID.search(filename)
+        entities = self._entity_index()
+        if entities is None or not match:
+            return ""
+        lines = entities.chunk_hints(int(match.group(1)), self.hint_limit)
+        if not lines:
+            return ""
+        return "Context from other chunks (entity index):\n" + "\n".join(f"- {line}" for line in lines)
+
+    def _entity_index(self) -> Optional[EntityIndex]:
+        if not self._entities_opened:
+            if self.config.get('entity_index_enabled', False):
+                self._entities = EntityIndex.open(chunk_output_dir(self.config))
+            self._entities_opened = True
+        return self._entities
+
+    def _entries_text(self, content: bytes, filename: str) -> str:
+        """A file's entries as sent inline: the raw JSON, or template-compressed."""
+        if self.miner is None:
+            return content.decode('utf-8', errors='replace')
+        records = [r for r in parse_records(content, filename) if isinstance(r, dict)]
+        template_ids = load_template_ids(self.config, filename, len(records), self.miner)
+        return compress_records(records, self.miner, filename, template_ids)
+
+    def _read_entries_text(self, file_path: str) -> str:
+        with open(file_path, 'rb') as f:
+            entries_text = self._entries_text(f.read(), os.path.basename(file_path))
+            tracer.count("bytes_read", f.tell())
+        return entries_text
 
-async def run_anomaly_detection():
-    """Runs the anomaly detection pipeline."""
+    def _restore_cached(self, cache_key: str, filename: str):
+        """Re-saves a cached verdict's report and returns the verdict, or None on a miss."""
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return None
+        if cached['report'] is not None:
+            save_anomaly_json_tool(cached['report'], filename)
+        print(f"💽 Cached verdict for {filename}.")
+        return cached
+
+    def _store_result(self, cache_key: str, found: bool, output_path: str) -> Dict[str, Any]:
+        """Caches a verdict along with the report saved at `output_path`, if any."""
+        report = None
+        if os.path.exists(output_path):
+            with open(output_path, 'r') as f:
+                report = json.load(f)
+            # Re-stamped by save_anomaly_json_tool on a cache hit
+            cached_report = {k: v for k, v in report.items() if k not in ("file", "timestamp_analyzed")}
+        else:
+            cached_report = None
+        self.cache.put(cache_key, {"found": found, "report": cached_report})
+        return {"found": found, "report": report}
+
+    def batch_token_budget(self) -> int:
+        """Tokens left for file content per batched request, after the fixed prompt."""
+        return max(1, self.batch_budget - estimate_tokens(agent.instruction))
+
+    async def analyze_batch(self, slot: int, files: List[str], index: int) -> List[Dict[str, Any]]:
+        """
+        Analyzes several JSON files with one LLM request.
+
+        The model replies with a list of anomalies per file name; each
+        non-empty list is saved with `save_anomaly_json_tool`, so reports are
+        laid out exactly as with `analyze`. A file missing from the reply is
+        analyzed on its own, reusing its text so its entries are mined once.
+        """
+        results = {}
+        contents = {}
+        hints = {file_path: self._hints(os.path.basename(file_path)) for file_path in files}
+        for file_path in files:
+            with open(file_path, 'rb') as f:
+                content = f.read()
+                tracer.count("bytes_read", len(content))
+            cached = self._restore_cached(self._cache_key(content, hints[file_path]), os.path.basename(file_path))
+            if cached is not None:
+                results[file_path] = cached
+            else:
+                contents[file_path] = content
+
+        if contents:
+            print(f"\n[batch {index+1}] Analyzing {len(contents)} files: {', '.join(os.path.basename(p) for p in contents)}")
+            for file_path in contents:
+                output_path = anomaly_output_path(os.path.basename(file_path))
+                if os.path.exists(output_path):
+                    os.remove(output_path)  # so a stale report can't pass for this run's result
+            texts = {p: self._entries_text(content, os.path.basename(p)) for p, content in contents.items()}
+            blocks = "\n".join(
+                f"<<<FILE {os.path.basename(p)}>>>\n{texts[p]}" + (f"\n[{hints[p]}]" if hints[p] else "")
+                for p in contents
+            )
+            session_id = await self.sessions.acquire(slot, index)
+            try:
+                response = await timed_run(
+                    runner,
+                    f"Analyze each of the following {len(contents)} JSON log files on its own. Do not call any tools. "
+                    "Reply with ONLY a JSON object mapping each file name to the list of anomaly objects "
+                    "(severity, description, evidence, correlation) found in that file, or an empty list "
+                    f"if it has no anomalies.\n\n{blocks}",
+                    session_id=session_id, chunk=index,
+                )
+                self.meter.record(index, session_id, response)
+            finally:
+                await self.sessions.release(session_id)
+
+            last_turn = response[-1]
+            if hasattr(last_turn, 'content') and last_turn.content and last_turn.content.parts:
+                agent_text = last_turn.content.parts[0].text or ""
+            else:
+                agent_text = str(last_turn)
+            verdicts = extract_json(agent_text)
+            if not isinstance(verdicts, dict):
+                verdicts = {}
+
+            for file_path, content in contents.items():
+                filename = os.path.basename(file_path)
+                anomalies = verdicts.get(filename)
+                if not isinstance(anomalies, list):
+                    print(f"⚠️  {filename} missing from the batched reply; analyzing it alone.")
+                    results[file_path] = await self.analyze(slot, file_path, index, texts[file_path])
+                    continue
+                if anomalies:
+                    save_anomaly_json_tool({"anomalies": anomalies}, filename)
+                    print(f"⚠️  Anomalies detected in {filename}!")
+                else:
+                    print(f"✅ No anomalies found in {filename}.")
+                results[file_path] = self._store_result(
+                    self._cache_key(content, hints[file_path]), bool(anomalies), anomaly_output_path(filename)
+                )
+
+        return [results[file_path] for file_path in files]
+
+    def summary(self):
+        print(self.meter.summary())
+        print(self.cache.stats())
+        if self.miner is not None:
+            self.miner.save()
+            print(f"🧬 {len(self.miner.templates)} message templates in {self.miner.table_path}")
+
+
+def _carry_verdicts(clusters: Dict[str, List[int]], results: Dict[str, Dict[str, Any]], output_dir: str) -> int:
+    """
+    Records each representative's verdict on its near-duplicate member
+    chunks. The representative's report gets the cluster size; a member's
+    report only refers to it (``duplicate_of``) and lists the severity and
+    description of its anomalies, with no evidence, since the evidence names
+    the representative's entities. Returns the member reports saved. Members
+    of representatives that failed get no verdict.
+    """
+    saved = 0
+    for rep_path, members in clusters.items():
+        if rep_path not in results:
+            print(f"⚠️  {os.path.basename(rep_path)} failed; its {len(members)} near-duplicates have no verdict.")
+            continue
+        rep_name = os.path.basename(rep_path)
+        report = results[rep_path]['report'] if results[rep_path] else None
+        anomalies = (report or {}).get("anomalies")
+        size = len(members) + 1
+        if anomalies:
+            save_anomaly_json_tool(
+                dict({k: v for k, v in report.items() if k not in ("file", "timestamp_analyzed")}, cluster_size=size),
+                rep_name,
+            )
+        summary = [
+            {"severity": anomaly.get("severity"), "description": anomaly.get("description")}
+            for anomaly in anomalies or () if isinstance(anomaly, dict)
+        ]
+        for member in members:
+            member_name = os.path.basename(json_output_path(chunk_path(output_dir, member)))
+            if anomalies:
+                save_anomaly_json_tool(
+                    {"duplicate_of": rep_name, "cluster_size": size, "representative_anomalies": summary}, member_name,
+                )
+                saved += 1
+            else:
+                output_path = anomaly_output_path(member_name)
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+    return saved
+
+
+@tracer.traced("detection")
+async def run_anomaly_detection(json_files: List[str] = None):
+    """
+    Runs the anomaly detection pipeline.
+
+    Files are analyzed by a pool of `agent_concurrency` workers. Pass
+    `json_files` to analyze only those files instead of every structured log.
+    Returns a dict of file index -> error for files that failed after all
+    retries.
+    """
     print("=" * 60)
     print("🔍 LOG ANOMALY DETECTION AGENT (Iterative JSON Mode)")
     print("=" * 60)
@@ -79,49 +449,74 @@ async def run_anomaly_detection():
     try:
         # 1. Get List of JSON Files
         print("Step 1: Getting list of JSON files...")
-        json_files = get_json_files_tool()
+        if json_files is None:
+            json_files = get_json_files_tool()
         print(f"Found {len(json_files)} JSON files to analyze.")
 
         if not json_files:
             print("No JSON files found. Exiting.")
-            return
+            return {}
 
         # 2. Iterate and Analyze
         print("\nStep 2: Analyzing files...")
 
-        anomalies_found_count = 0
+        config = load_config(CONFIG_PATH)
+        verdicts = {}
+        duplicates = NearDuplicates.open(chunk_output_dir(config)) if config.get('dedup_enabled', False) else None
+        clusters = {}
+        if duplicates is not None:
+            json_files, clusters = duplicates.split(json_files)
+            members = sum(len(m) for m in clusters.values())
+            print(f"🧬 Near-duplicates: {members} chunks take the verdict of {len(clusters)} cluster representatives.")
 
-        for i, file_path in enumerate(json_files):
-            filename = os.path.basename(file_path)
-            print(f"\n[{i+1}/{len(json_files)}] Analyzing: {filename}")
+        if config.get('prefilter_enabled', False):
+            prefilter = ChunkPrefilter.from_config(config)
+            suspicious, clean, scores = prefilter.split(json_files)
+            for file_path in clean:
+                # An explicit verdict, replacing any report from an earlier run
+                report = {
+                    "anomalies": [], "verdict": "clean", "skipped_by": "prefilter",
+                    "score": scores[file_path], "threshold": prefilter.threshold,
+                }
+                save_anomaly_json_tool(report, os.path.basename(file_path))
+                verdicts[file_path] = {"found": False, "report": report}
+            print(f"🧮 Pre-filter: {len(suspicious)}/{len(json_files)} chunks scored >= {prefilter.threshold} "
+                  f"and go to the LLM; {len(clean)} marked clean (see {SCORES_LOG}).")
+            json_files = suspicious
 
-            # Run the agent for this specific file
-            response = await runner.run_debug(
-                f"Analyze this JSON log file: {file_path}. Original filename is '{filename}'. Read it using `read_json_file_tool`. If anomalies are found, save them using `save_anomaly_json_tool`."
-            )
+        concurrency = int(config.get('agent_concurrency', 1))
+        print(f"Running {concurrency} concurrent workers.")
+        detector = AnomalyDetector(config)
 
-            # Extract response
-            last_turn = response[-1]
-            if hasattr(last_turn, 'content') and last_turn.content and last_turn.content.parts:
-                agent_text = last_turn.content.parts[0].text
-            else:
-                agent_text = str(last_turn)
-
-            # Check if anomalies were found
-            if "No anomalies found" not in agent_text:
-                print(f"⚠️  Anomalies detected in {filename}!")
-                print(f"Agent Response: {agent_text}")
-                anomalies_found_count += 1
-            else:
-                print(f"✅ No anomalies found in {filename}.")
+        if detector.batch_budget > 0:
+            budget = detector.batch_token_budget()
+            print(f"Packing files into requests of up to {budget} content tokens.")
+            results, failures = await run_batched(
+                json_files, [estimate_file_tokens(f) for f in json_files], budget,
+                detector.analyze_batch, concurrency, retry_config,
+            )
+        else:
+            results, failures = await run_bounded(json_files, detector.analyze, concurrency, retry_config)
+        anomalies_found_count = sum(1 for result in results if result and result['found'])
+        detector.summary()
+        if clusters:
+            verdicts.update(
+                (file_path, result) for index, (file_path, result) in enumerate(zip(json_files, results))
+                if index not in failures
+            )
+            carried = _carry_verdicts(clusters, verdicts, chunk_output_dir(config))
+            anomalies_found_count += carried
+            print(f"🧬 Referenced anomaly reports from {carried} near-duplicate chunks.")
 
-            # Break after processing 5 files for testing
-            if i >=5:
-                break
+        if failures:
+            print(f"\n⚠️  {len(failures)}/{len(json_files)} files failed after retries:")
+            for index in sorted(failures):
+                print(f"  - {os.path.basename(json_files[index])}: {failures[index]}")
 
         print("\n" + "=" * 60)
         print(f"Analysis Complete. Found anomalies in {anomalies_found_count} files.")
         print("=" * 60)
+        return failures
 
     except Exception as e:
         print(f"\n❌ An error occurred: {e}")
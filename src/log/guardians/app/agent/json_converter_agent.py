@@ -1,6 +1,10 @@
 import asyncio
+import json
+import re
 import sys
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from typing import Dict, Any, List
 
 # Ensure we can import modules from src when running from project root
@@ -11,7 +15,24 @@ from google.adk.agents import Agent
 from google.adk.models.google_llm import Gemini
 from google.adk.runners import InMemoryRunner
 from google.genai import types
-from src.log.guardians.app.agent.tools import structure_architect_tool, read_file_tool, save_json_tool, get_log_files_tool, run_log_generator
+from src.log.guardians.app.agent.tools import structure_architect_tool, read_file_tool, save_json_tool, get_log_files_tool, run_log_generator, parse_log_file_with_pattern, json_output_path
+from src.log.guardians.app.features.chunking.chunk_store import read_chunk_view
+from src.log.guardians.app.features.chunking.chunker import chunk_output_dir, load_config
+from src.log.guardians.app.features.dedup.near_duplicates import NearDuplicates
+from src.log.guardians.app.features.parsing.parser_engine import MESSAGE_KEY, compile_parse_pattern, match_rate
+from src.log.guardians.app.features.parsing.record_io import read_records
+from src.log.guardians.app.features.parsing.schema_registry import (
+    SchemaRegistry, infer_field_types, registry_key, sample_fingerprint,
+)
+from src.log.guardians.app.features.templates.assignments import save_assignments
+from src.log.guardians.app.features.templates.drain import TemplateMiner
+from src.log.guardians.app.utils.agent_sessions import ContextMeter, SessionStrategy
+from src.log.guardians.app.utils.async_pool import run_batched, run_bounded
+from src.log.guardians.app.utils.json_cleaner import extract_json
+from src.log.guardians.app.utils.metrics import timed_run, tracer
+from src.log.guardians.app.utils.result_cache import ResultCache
+from src.log.guardians.app.utils.structured_output import AGENT_IO_MODES, entries_schema, field_types, schema_keys
+from src.log.guardians.app.utils.token_budget import estimate_tokens
 
 load_dotenv()
 
@@ -60,39 +81,496 @@ agent = Agent(
 
 runner = InMemoryRunner(agent=agent)
 
+DIRECT_INSTRUCTION = """
+    You are the Log Processor. You convert the log entries given in the prompt to JSON with **high precision**.
+
+    **Important Rules for Processing:**
+    *   **ACCURACY IS PARAMOUNT**: Do not summarize, truncate, or alter the data.
+    *   **Message Field**: The `message` field must contain the **exact** text from the log, preserving all whitespace and special characters.
+    *   **Output**: Reply with ONLY a JSON array holding one object per log entry, in log order, with the schema's keys in the schema's order.
+    """
+
+
+def _direct_runner(keys: List[str] = None, types_by_key: Dict[str, str] = None) -> InMemoryRunner:
+    """
+    Runner for 'direct' agent I/O: no tools, and the reply is constrained to an
+    array of entry objects with ``keys`` (or to any JSON when keys are unknown).
+    """
+    schema = entries_schema(keys, types_by_key)
+    return InMemoryRunner(agent=Agent(
+        name="LogProcessorDirect",
+        model=model,
+        description="Converts log entries given in the prompt to JSON in one reply.",
+        instruction=DIRECT_INSTRUCTION,
+        output_schema=schema,
+        generate_content_config=None if schema else types.GenerateContentConfig(response_mime_type="application/json"),
+    ))
+
+
+CONFIG_PATH = "src/log/guardians/app/main/config/chunker_config.yaml"
+PARSE_PATTERN_CACHE = ".LogGuardians/parse_patterns.json"
+# The field names and types become the registry entry (and the direct-mode response schema)
+DESIGN_PROMPT = (
+    "Design the JSON schema for the logs. End your reply with a JSON object "
+    '{"schema_keys": [...], "field_types": {"<key>": "string|integer|number|boolean"}} '
+    "listing the field names in schema order and their types."
+)
+# Generated patterns must match at least this share of the sample's entries
+MIN_PATTERN_MATCH_RATE = 0.9
+
+
+def _response_text(events) -> str:
+    """Returns the text of the agent's final turn."""
+    last_turn = events[-1]
+    if hasattr(last_turn, 'content') and last_turn.content and last_turn.content.parts:
+        return last_turn.content.parts[0].text or ""
+    return str(last_turn)
+
+
+async def _resolve_parse_pattern(config) -> str:
+    """
+    Returns the active profile's parse pattern.
+
+    Uses `parse_pattern` from the config when present. Otherwise the schema
+    design step is asked once for a named-group regex, which is validated on
+    the sample and cached in `.LogGuardians/parse_patterns.json`.
+    """
+    profile_name = config['active_profile']
+    profile = config['log_profiles'][profile_name]
+    if profile.get('parse_pattern'):
+        return profile['parse_pattern']
+
+    cache = {}
+    if os.path.exists(PARSE_PATTERN_CACHE):
+        with open(PARSE_PATTERN_CACHE, 'r') as f:
+            cache = json.load(f)
+    cached = cache.get(profile_name)
+    if cached and cached.get('log_start_regex') == profile['log_start_regex']:
+        return cached['parse_pattern']
+
+    print(f"🧬 No parse_pattern for profile '{profile_name}', asking the schema designer for one...")
+    events = await timed_run(
+        runner,
+        "Design the JSON schema for the logs. Then reply with ONLY a JSON object of the form "
+        '{"parse_pattern": "<regex>"} where <regex> is a Python regular expression that matches '
+        "the first line of one log entry, with one named group (?P<name>...) per schema field in "
+        "schema order and a final `message` group holding the exact free text."
+    )
+    response = extract_json(_response_text(events))
+    parse_pattern = response.get('parse_pattern') if isinstance(response, dict) else None
+    if not parse_pattern:
+        raise ValueError("Schema designer did not return a parse_pattern")
+
+    sample = structure_architect_tool(CONFIG_PATH).get('sample_content', '')
+    rate = match_rate(sample.splitlines(), compile_parse_pattern(parse_pattern),
+                      re.compile(profile['log_start_regex']))
+    if rate < MIN_PATTERN_MATCH_RATE:
+        raise ValueError(f"Generated parse_pattern only matches {rate:.0%} of the sample entries")
+
+    cache[profile_name] = {'log_start_regex': profile['log_start_regex'], 'parse_pattern': parse_pattern}
+    os.makedirs(os.path.dirname(PARSE_PATTERN_CACHE), exist_ok=True)
+    with open(PARSE_PATTERN_CACHE, 'w') as f:
+        json.dump(cache, f, indent=2)
+    return parse_pattern
+
+
+async def _convert_unmatched(result: Dict[str, Any], session_id: str, cache: ResultCache) -> str:
+    """Asks the LLM to convert only the entries the parse pattern missed, then saves the chunk."""
+    keys = result['schema_keys']
+    records = result['records']
+    unmatched = result['unmatched']
+    entries_text = "\n".join(f"<<<ENTRY {i}>>>\n{raw}" for i, (_, raw) in enumerate(unmatched))
+
+    cache_key = ResultCache.make_key(entries_text, agent.instruction, model.model, keys)
+    converted = cache.get(cache_key)
+    if converted is None:
+        events = await timed_run(
+            runner,
+            f"Convert the following {len(unmatched)} log entries to JSON objects using exactly these keys "
+            f"in this order: {keys}. Do not call any tools. Reply with ONLY a JSON array containing one "
+            f"object per entry, in the same order.\n\n{entries_text}",
+            session_id=session_id,
+        )
+        converted = extract_json(_response_text(events))
+        if not isinstance(converted, list) or len(converted) != len(unmatched):
+            # Keep the raw text rather than drop entries the model could not convert
+            print(f"⚠️  LLM fallback failed for {os.path.basename(result['file'])}; keeping raw messages.")
+            converted = [{k: (raw if k == MESSAGE_KEY else None) for k in keys} for _, raw in unmatched]
+        else:
+            cache.put(cache_key, converted)
+
+    for (position, _), record in zip(unmatched, converted):
+        records[position] = record
+    return save_json_tool(records, result['file'], keys)
+
+
+def _chunk_tokens(file_path: str) -> int:
+    """Estimated prompt tokens of a chunk, sized without copying indexed chunks."""
+    view = read_chunk_view(file_path)
+    return estimate_tokens(view if view is not None else read_file_tool(file_path))
+
+
+class ChunkConverter:
+    """
+    Converts one chunk at a time into structured JSON.
+
+    Holds the per-run state (designed schema or parse pattern, sessions,
+    cache, context meter) so the batch `run_conversion` stage and the
+    streaming pipeline share one implementation.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.mode = config.get('conversion_mode', 'llm')
+        self.io_mode = config.get('agent_io_mode', 'tools')
+        if self.io_mode not in AGENT_IO_MODES:
+            raise ValueError(f"Unknown agent_io_mode '{self.io_mode}'. Expected one of: {', '.join(AGENT_IO_MODES)}")
+        self.profile = config['log_profiles'][config['active_profile']]
+        self.cache = ResultCache.from_config(config, "converter")
+        self.sessions = SessionStrategy.from_config(runner, "converter", config)
+        self.meter = ContextMeter("converter")
+        self.registry = SchemaRegistry.from_config(config)
+        self.registry_key = None
+        self.schema_text = None
+        self.schema_keys = None
+        self.field_types = None
+        self.direct_runner = None
+        self.direct_sessions = None
+        self.parse_pattern = None
+        self.parse_workers = int(config.get('parse_workers', 0)) or os.cpu_count() or 1
+        self.batch_budget = int(config.get('batch_token_budget', 0))
+        # Per-entry template ids and params, written next to the template table
+        mining = config.get('template_mining_enabled', False) or config.get('detector_prompt_mode') == 'templates'
+        self.miner = TemplateMiner.shared(config) if mining else None
+        self._pool = None
+
+    async def prepare(self):
+        """Resolves the parse pattern (regex mode) or designs the schema (LLM mode)."""
+        if self.mode == 'regex':
+            self.parse_pattern = await _resolve_parse_pattern(self.config)
+            return
+
+        # Reused across runs while the profile, its start regex and the sample's format are unchanged
+        sample = structure_architect_tool(CONFIG_PATH)
+        if "error" in sample:
+            raise ValueError(f"Could not read the sample log: {sample['error']}")
+        self.registry_key = registry_key(
+            self.config['active_profile'], sample['regex_pattern'],
+            sample_fingerprint(sample['sample_content'], sample['regex_pattern']),
+        )
+        design = self.registry.lookup(self.registry_key)
+        if design is None:
+            design_events = await timed_run(runner, DESIGN_PROMPT)
+            schema_text = _response_text(design_events)
+            design = self.registry.register(
+                self.registry_key, schema_text, schema_keys(schema_text), field_types(schema_text), model.model
+            )
+            print(f"📒 Registered schema revision {design['revision']} in {self.registry.path}.")
+        else:
+            print(f"📒 Reusing schema revision {design['revision']} from {self.registry.path}.")
+        self.schema_text = design['schema_text']
+        self.schema_keys = design['keys']
+        self.field_types = design['field_types']
+
+        if self.io_mode == 'direct':
+            if self.schema_keys is None:
+                print("⚠️  No field names found in the schema design; replies are constrained to JSON only.")
+            self.direct_runner = _direct_runner(self.schema_keys, self.field_types)
+            self.direct_sessions = SessionStrategy.from_config(self.direct_runner, "converter", self.config)
+
+    def parse_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+        return self._pool
 
-async def run_conversion():
-    """Runs the JSON conversion pipeline."""
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    async def convert(self, slot: int, file_path: str, index: int, parsed: Dict[str, Any] = None) -> str:
+        """
+        Converts one chunk and returns the path of its JSON output.
+
+        In regex mode `parsed` may carry an already computed
+        `parse_log_file_with_pattern` result.
+        """
+        output_path = await self._convert(slot, file_path, index, parsed)
+        self.assign_templates([output_path])
+        return output_path
+
+    def assign_templates(self, json_paths: List[str]):
+        """Mines converted chunks and saves each entry's template id and params."""
+        if self.miner is None:
+            return
+        for json_path in json_paths:
+            save_assignments(self.config, json_path, self.miner)
+
+    async def _convert(self, slot: int, file_path: str, index: int, parsed: Dict[str, Any] = None) -> str:
+        if self.mode == 'regex':
+            if parsed is None:
+                parsed = await asyncio.get_running_loop().run_in_executor(
+                    self.parse_pool(), parse_log_file_with_pattern,
+                    file_path, self.parse_pattern, self.profile['log_start_regex'],
+                )
+                tracer.count("bytes_read", parsed['bytes_read'])
+                tracer.count("bytes_written", parsed['bytes_written'])
+            if parsed['unmatched']:
+                session_id = await self.sessions.acquire(slot, index)
+                try:
+                    await _convert_unmatched(parsed, session_id, self.cache)
+                finally:
+                    await self.sessions.release(session_id)
+            return json_output_path(file_path)
+
+        print(f"Processing file {index+1}: {os.path.basename(file_path)}")
+        output_path = json_output_path(file_path)
+        text = read_file_tool(file_path)
+        cache_key = self._cache_key(text)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            save_json_tool(cached, file_path, self.schema_keys)
+            return output_path
+
+        if os.path.exists(output_path):
+            os.remove(output_path)  # so a stale output can't pass for this run's result
+
+        if self.io_mode == 'direct':
+            return await self._convert_direct(slot, file_path, index, text, cache_key)
+
+        # Chunks don't share the design session, so carry the schema over explicitly
+        session_id = await self.sessions.acquire(slot, index)
+        try:
+            events = await timed_run(
+                runner,
+                f"Use this JSON schema:\n{self.schema_text}\n\n"
+                f"Process this log file: {file_path}. Read it, parse it using the schema, and save it.",
+                session_id=session_id, chunk=index,
+            )
+            self.meter.record(index, session_id, events)
+        finally:
+            await self.sessions.release(session_id)
+        if not os.path.exists(output_path):
+            raise RuntimeError("agent finished without saving the JSON output")
+        entries = read_records(output_path)
+        self._check_fit(entries)
+        self.cache.put(cache_key, entries)
+        return output_path
+
+    async def _convert_direct(self, slot: int, file_path: str, index: int, text: str, cache_key: str) -> str:
+        """One schema-constrained turn with the chunk in the prompt; the entries are saved here."""
+        name = os.path.basename(file_path)
+        session_id = await self.direct_sessions.acquire(slot, index)
+        try:
+            events = await timed_run(
+                self.direct_runner,
+                f"Use this JSON schema:\n{self.schema_text}\n\n"
+                f"Convert the log file '{name}' below to the JSON array of its entries.\n\n"
+                f"<<<FILE {name}>>>\n{text}",
+                session_id=session_id, chunk=index,
+            )
+            self.meter.record(index, session_id, events)
+        finally:
+            await self.direct_sessions.release(session_id)
+
+        entries = extract_json(_response_text(events))
+        if not isinstance(entries, list):
+            raise RuntimeError("model reply is not a JSON array of entries")
+        saved = save_json_tool(entries, file_path, self.schema_keys)
+        if isinstance(saved, dict):
+            raise RuntimeError(f"could not save the converted entries: {saved['error']}")
+        self._check_fit(entries)
+        self.cache.put(cache_key, entries)
+        return json_output_path(file_path)
+
+    def _check_fit(self, entries: List[Any]):
+        """Counts converted entries that do not fit the registered schema."""
+        if self.schema_keys and not self.field_types:
+            # The design named no types: the first converted chunk sets them
+            self.field_types = infer_field_types(entries, self.schema_keys)
+            self.registry.set_field_types(self.registry_key, self.field_types)
+        self.registry.check(entries, self.schema_keys, self.field_types)
+
+    def _cache_key(self, text: str) -> str:
+        if self.io_mode == 'direct':
+            return ResultCache.make_key(text, DIRECT_INSTRUCTION, model.model, self.schema_text)
+        return ResultCache.make_key(text, agent.instruction, model.model, self.schema_text)
+
+    def batch_token_budget(self) -> int:
+        """Tokens left for chunk content per batched request, after the fixed prompt."""
+        overhead = estimate_tokens(agent.instruction) + estimate_tokens(self.schema_text or "")
+        return max(1, self.batch_budget - overhead)
+
+    async def convert_batch(self, slot: int, files: List[str], index: int) -> List[str]:
+        """
+        Converts several chunks with one LLM request and returns their JSON
+        output paths.
+
+        The model replies with one entry array per file name, which is saved
+        per chunk with `save_json_tool`, so the output layout is the same as
+        for `convert`. A chunk missing from the reply, or whose entries cannot be
+        saved, is converted on its own.
+        """
+        outputs = {}
+        texts = {}
+        for file_path in files:
+            text = read_file_tool(file_path)
+            cached = self.cache.get(self._cache_key(text))
+            if cached is not None:
+                save_json_tool(cached, file_path, self.schema_keys)
+                outputs[file_path] = json_output_path(file_path)
+            else:
+                texts[file_path] = text
+
+        if texts:
+            names = ", ".join(os.path.basename(p) for p in texts)
+            print(f"Processing batch {index+1} ({len(texts)} files): {names}")
+            blocks = "\n".join(f"<<<FILE {os.path.basename(p)}>>>\n{text}" for p, text in texts.items())
+            session_id = await self.sessions.acquire(slot, index)
+            try:
+                events = await timed_run(
+                    runner,
+                    f"Use this JSON schema:\n{self.schema_text}\n\n"
+                    f"Convert each of the following {len(texts)} log files to JSON using the schema. "
+                    "Do not call any tools. Reply with ONLY a JSON object mapping each file name to the "
+                    f"JSON array of that file's entries, in order.\n\n{blocks}",
+                    session_id=session_id, chunk=index,
+                )
+                self.meter.record(index, session_id, events)
+            finally:
+                await self.sessions.release(session_id)
+
+            converted = extract_json(_response_text(events))
+            if not isinstance(converted, dict):
+                converted = {}
+
+            for file_path, text in texts.items():
+                entries = converted.get(os.path.basename(file_path))
+                saved = save_json_tool(entries, file_path, self.schema_keys) if isinstance(entries, list) else None
+                if isinstance(saved, str):
+                    self._check_fit(entries)
+                    self.cache.put(self._cache_key(text), entries)
+                    outputs[file_path] = json_output_path(file_path)
+                else:
+                    print(f"⚠️  {os.path.basename(file_path)} missing from the batched reply or unsaved; converting it alone.")
+                    outputs[file_path] = await self._convert(slot, file_path, index)
+
+        self.assign_templates(list(outputs.values()))
+        return [outputs[file_path] for file_path in files]
+
+    def summary(self):
+        print(self.meter.summary())
+        print(self.cache.stats())
+        if self.miner is not None:
+            self.miner.save()
+            print(f"🧬 {len(self.miner.templates)} message templates in {self.miner.table_path}")
+        if self.registry_key is not None and self.registry.checked:
+            checked, misfits = self.registry.checked, self.registry.misfits
+            print(f"📒 {misfits}/{checked} converted entries did not fit the registered schema.")
+            if self.registry.record_fit(self.registry_key):
+                print("⚠️  The schema no longer fits the logs; it will be redesigned on the next run.")
+
+
+async def _run_regex_conversion(converter: ChunkConverter, files: List[str]):
+    """Converts chunks locally with the profile's parse pattern across a process pool."""
+    workers = converter.parse_workers
+
+    print(f"\nStep 3: Parsing {len(files)} files with {workers} workers...")
+    results = list(converter.parse_pool().map(
+        parse_log_file_with_pattern, files,
+        repeat(converter.parse_pattern), repeat(converter.profile['log_start_regex']),
+        chunksize=max(1, len(files) // (workers * 4)),
+    ))
+
+    tracer.count("bytes_read", sum(r['bytes_read'] for r in results))
+    tracer.count("bytes_written", sum(r['bytes_written'] for r in results))
+    fallbacks = [r for r in results if r['unmatched']]
+    print(f"✅ Parsed {len(results) - len(fallbacks)} files locally.")
+    converter.assign_templates([json_output_path(r['file']) for r in results if not r['unmatched']])
+    failures = {}
+    if fallbacks:
+        unmatched_total = sum(len(r['unmatched']) for r in fallbacks)
+        print(f"🤖 Sending {unmatched_total} unmatched entries from {len(fallbacks)} files to the LLM...")
+        _, failures = await run_bounded(
+            fallbacks,
+            lambda slot, result, i: converter.convert(slot, result['file'], i, parsed=result),
+            int(converter.config.get('agent_concurrency', 1)),
+            retry_config,
+        )
+        _report_failures([r['file'] for r in fallbacks], failures)
+    return failures
+
+
+def _report_failures(files: List[str], failures: Dict[int, str]):
+    """Prints the chunks that still failed after all retries."""
+    if not failures:
+        print(f"✅ All {len(files)} files converted.")
+        return
+    print(f"⚠️  {len(failures)}/{len(files)} files failed after retries:")
+    for index in sorted(failures):
+        print(f"  - {os.path.basename(files[index])}: {failures[index]}")
+
+
+@tracer.traced("conversion")
+async def run_conversion(files: List[str] = None):
+    """
+    Runs the JSON conversion pipeline.
+
+    Chunks are processed by a pool of `agent_concurrency` workers. Pass
+    `files` to convert only those chunks (e.g. new chunks in follow mode)
+    instead of every chunk of the configured input. Returns a dict of chunk
+    index -> error for chunks that failed after all retries.
+    """
     print("--- JSON Conversion Started ---")
+    config = load_config(CONFIG_PATH)
+    converter = ChunkConverter(config)
     try:
-        # 1. Design Schema (Warm-up)
-        print("\nStep 1: Designing Schema...")
-        await runner.run_debug("Design the JSON schema for the logs.")
+        # 1. Design Schema (Warm-up) or resolve the parse pattern
+        if converter.mode == 'regex':
+            print("\nStep 1: Using the regex parser engine (no LLM schema turn needed)...")
+        else:
+            print("\nStep 1: Designing Schema...")
+        await converter.prepare()
 
         # 2. Get File List (Directly in Python for efficiency)
         print("\nStep 2: Getting File List...")
-        files = get_log_files_tool()
+        if files is None:
+            files = get_log_files_tool()
         print(f"Found {len(files)} files.")
+        duplicates = NearDuplicates.open(chunk_output_dir(config)) if config.get('dedup_enabled', False) else None
+        if duplicates is not None and converter.mode != 'regex':
+            # Members take their representative's verdict, so the LLM never needs their JSON
+            total = len(files)
+            files, _ = duplicates.split(files)
+            print(f"🧬 Converting {len(files)} chunks; {total - len(files)} near-duplicates are covered by their representatives.")
 
-        # 3. Loop through files
-        print("\nStep 3: Processing Files...")
-        for i, file_path in enumerate(files):
-            print(f"Processing file {i+1}/{len(files)}: {os.path.basename(file_path)}")
-
-            # Invoke Agent for this specific file
-            await runner.run_debug(
-                f"Process this log file: {file_path}. Read it, parse it using the schema, and save it."
+        # 3. Fan out over files with a bounded worker pool
+        if converter.mode == 'regex':
+            failures = await _run_regex_conversion(converter, files)
+        elif converter.batch_budget > 0:
+            concurrency = int(config.get('agent_concurrency', 1))
+            budget = converter.batch_token_budget()
+            print(f"\nStep 3: Processing Files in batches of up to {budget} chunk tokens ({concurrency} concurrent)...")
+            _, failures = await run_batched(
+                files, [_chunk_tokens(f) for f in files], budget,
+                converter.convert_batch, concurrency, retry_config,
             )
+            _report_failures(files, failures)
+        else:
+            concurrency = int(config.get('agent_concurrency', 1))
+            print(f"\nStep 3: Processing Files ({concurrency} concurrent)...")
+            _, failures = await run_bounded(files, converter.convert, concurrency, retry_config)
+            _report_failures(files, failures)
 
-            # Break after processing 5 files for testing
-            if i >=5:
-                break
-
+        converter.summary()
+        return failures
     except Exception as e:
         print(f"\nAn error occurred: {e}")
         
         traceback.print_exc()
         raise
+    finally:
+        converter.close()
 
 async def main():
     """Entry point when running as standalone script."""
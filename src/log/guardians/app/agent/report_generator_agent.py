@@ -11,7 +11,14 @@ from google.adk.agents import Agent
 from google.adk.models.google_llm import Gemini
 from google.adk.runners import InMemoryRunner
 from google.genai import types
-from src.log.guardians.app.agent.tools import read_json_file_tool, get_json_files_tool
+from src.log.guardians.app.agent.tools import read_json_file_tool, get_json_files_tool, log_store
+from src.log.guardians.app.features.chunking.chunker import chunk_output_dir, load_config
+from src.log.guardians.app.features.correlation.entity_index import EntityIndex
+from src.log.guardians.app.features.reporting.anomaly_index import INDEX_PATH, AnomalyIndex
+from src.log.guardians.app.utils.agent_sessions import SessionStrategy
+from src.log.guardians.app.utils.async_pool import run_bounded
+from src.log.guardians.app.utils.metrics import timed_run, tracer
+from src.log.guardians.app.utils.token_budget import estimate_tokens
 
 load_dotenv()
 
@@ -37,7 +44,10 @@ agent = Agent(
     You are an expert Security Analyst. Your goal is to generate a **Consolidated Security Report** based on a list of detected anomalies.
 
     **Input Data**:
-    - You will receive a JSON object containing a list of anomalies from multiple log files.
+    - You will receive either deduplicated anomaly groups (one JSON object per line, with severity,
+      normalized pattern, occurrence count, near-duplicate chunks sharing them, affected entities
+      and examples) or partial findings
+      summarizing such groups, plus the entities shared by several groups.
 
     **Your Task**:
     1.  **Analyze the Aggregated Data**:
@@ -62,67 +72,254 @@ agent = Agent(
 
 runner = InMemoryRunner(agent=agent)
 
+summarizer = Agent(
+    name="ReportSummarizer",
+    model=model,
+    description="An AI agent that condenses batches of anomaly groups into partial findings.",
+    instruction="""
+    You are an expert Security Analyst preparing input for a consolidated security report.
+
+    You will receive either a batch of deduplicated anomaly groups (one JSON object per line) or
+    several earlier Partial Findings to merge.
+
+    **Your Task**:
+    - Write **Partial Findings** in Markdown: one bullet per distinct issue, most severe first.
+    - For every issue keep the severity, the total occurrence count, the near-duplicate chunks, the affected entities
+      (IPs, nodes, users) and the group ids (e.g. G12) it covers.
+    - Merge groups or findings that describe the same underlying issue, adding up their counts.
+    - Note patterns across issues (the same IP or node in several issues).
+    - Be concise. Do not write an executive summary or recommendations.
+
+    **Output Format**:
+    - Return ONLY the Markdown content.
+    """,
+    tools=[]
+)
+
+summarizer_runner = InMemoryRunner(agent=summarizer)
+
+CONFIG_PATH = "src/log/guardians/app/main/config/chunker_config.yaml"
+
+
+def _load_anomaly_files() -> List[Dict[str, Any]]:
+    """Reads every saved anomaly report. Returns None if there are none."""
+    store = log_store()
+    if store is not None:
+        # One query instead of opening every report
+        print(f"Step 1: Reading anomalies from the log store {store.path}...")
+        anomalies = store.anomalies()
+        if anomalies:
+            print("\nStep 2: Aggregating data...")
+            return anomalies
+        print("No anomalies in the log store, falling back to the anomaly files.")
+
+    # 1. Get List of Anomaly Files
+    anomaly_dir = ".LogGuardians/output_anomalies"
+    print(f"Step 1: Reading anomaly files from {anomaly_dir}...")
+
+    # We can reuse get_json_files_tool by passing the directory
+    anomaly_files = get_json_files_tool(anomaly_dir)
+
+    if not anomaly_files:
+        print("No anomaly files found. System appears healthy.")
+        return None
+
+    print(f"Found {len(anomaly_files)} anomaly reports.")
+
+    # 2. Aggregate Data
+    print("\nStep 2: Aggregating data...")
+    aggregated_anomalies = []
+    duplicates = clean = 0
+
+    for file_path in anomaly_files:
+        try:
+            data = read_json_file_tool(file_path)
+            if "duplicate_of" in data:
+                # Counted through the representative's cluster_size
+                duplicates += 1
+                continue
+            if data.get("verdict") == "clean":
+                # Explicit verdict for a chunk the pre-filter kept from the LLM
+                clean += 1
+                continue
+            if "anomalies" in data:
+                # Add filename context to each anomaly if not present
+                for anomaly in data["anomalies"]:
+                    anomaly["source_file"] = os.path.basename(file_path)
+                    if data.get("cluster_size"):
+                        anomaly["cluster_size"] = data["cluster_size"]
+                aggregated_anomalies.extend(data["anomalies"])
+        except Exception as e:
+            print(f"Error reading {file_path}: {e}")
+    if duplicates:
+        print(f"🧬 Skipped {duplicates} near-duplicate reports; their representatives count them.")
+    if clean:
+        print(f"🧮 {clean} reports are clean verdicts from the pre-filter.")
+    if not aggregated_anomalies:
+        print("No anomalies in the reports. System appears healthy.")
+        return None
+    return aggregated_anomalies
+
 
-async def run_report_generation():
-    """Runs the report generation pipeline."""
+def _response_text(events) -> str:
+    last_turn = events[-1]
+    if hasattr(last_turn, 'content') and last_turn.content and last_turn.content.parts:
+        return last_turn.content.parts[0].text or ""
+    return str(last_turn)
+
+
+def _pack(texts: List[str], budget: int, min_items: int = 1) -> List[List[str]]:
+    """
+    Packs texts in order into batches of at most ``budget`` estimated tokens.
+    Every batch takes at least ``min_items`` texts, so merging always shrinks
+    the number of texts even when some of them exceed the budget alone.
+    """
+    batches, batch, used = [], [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if batch and len(batch) >= min_items and used + tokens > budget:
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append(text)
+        used += tokens
+    if batch:
+        if len(batch) < min_items and batches:
+            batches[-1].extend(batch)
+        else:
+            batches.append(batch)
+    return batches
+
+
+class _Summarizer:
+    """Runs one summarization level: each batch of texts becomes one partial finding."""
+
+    def __init__(self, stage: str, prompt: str):
+        self.sessions = SessionStrategy(summarizer_runner, stage)
+        self.prompt = prompt
+
+    async def summarize(self, slot: int, batch: List[str], index: int) -> str:
+        session_id = await self.sessions.acquire(slot, index)
+        try:
+            events = await timed_run(
+                summarizer_runner, self.prompt + "\n\n" + "\n".join(batch),
+                session_id=session_id, chunk=index,
+            )
+        finally:
+            await self.sessions.release(session_id)
+        return _response_text(events)
+
+
+async def _map_reduce(group_lines: List[str], budget: int, concurrency: int) -> List[str]:
+    """
+    Summarizes groups batch by batch in parallel, then merges the partial
+    findings level by level until they fit one batch. A batch that still
+    fails after retries is passed on as its raw text, so nothing is dropped.
+    """
+    texts = group_lines
+    level = 0
+    prompt = (
+        "Summarize these deduplicated anomaly groups (one JSON object per line) into Partial Findings."
+    )
+    while len(texts) > 1 and sum(estimate_tokens(t) for t in texts) > budget:
+        batches = _pack(texts, budget, min_items=1 if level == 0 else 2)
+        print(f"  Level {level}: {len(texts)} inputs -> {len(batches)} summaries")
+        worker = _Summarizer(f"report_level_{level}", prompt)
+        results, failures = await run_bounded(batches, worker.summarize, concurrency, retry_config)
+        for index, error in failures.items():
+            print(f"  ⚠️  Summary {index + 1} failed ({error}); passing its input on unsummarized")
+        texts = [
+            result if index not in failures else "\n".join(batches[index])
+            for index, result in enumerate(results)
+        ]
+        level += 1
+        prompt = "Merge these Partial Findings (separated by ---) into one set of Partial Findings."
+        texts = texts if len(texts) == 1 else [f"---\n{t}" for t in texts]
+    return texts
+
+
+@tracer.traced("report")
+async def run_report_generation(aggregated_anomalies: List[Dict[str, Any]] = None):
+    """
+    Runs the report generation pipeline.
+
+    Pass `aggregated_anomalies` (each tagged with its `source_file`) to report
+    on anomalies collected in memory, e.g. by the streaming pipeline, instead
+    of reading them back from `.LogGuardians/output_anomalies`.
+
+    Anomalies are first deduplicated into groups (`AnomalyIndex`). Groups are
+    summarized in batches of up to `report_batch_tokens` estimated tokens by
+    `agent_concurrency` parallel calls, and the partial findings are merged
+    level by level until they fit one prompt, so the final prompt stays
+    bounded however many anomaly files there are.
+    """
     print("=" * 60)
     print("📊 REPORT GENERATOR AGENT")
     print("=" * 60)
     print("\nInitializing report generation...\n")
 
     try:
-        # 1. Get List of Anomaly Files
-        anomaly_dir = ".LogGuardians/output_anomalies"
-        print(f"Step 1: Reading anomaly files from {anomaly_dir}...")
-
-        # We can reuse get_json_files_tool by passing the directory
-        anomaly_files = get_json_files_tool(anomaly_dir)
-
-        if not anomaly_files:
-            print("No anomaly files found. System appears healthy.")
+        if aggregated_anomalies is None:
+            aggregated_anomalies = _load_anomaly_files()
+            if aggregated_anomalies is None:
+                return
+        elif not aggregated_anomalies:
+            print("No anomalies reported. System appears healthy.")
             return
 
-        print(f"Found {len(anomaly_files)} anomaly reports.")
-
-        # 2. Aggregate Data
-        print("\nStep 2: Aggregating data...")
-        aggregated_anomalies = []
-
-        for file_path in anomaly_files:
-            try:
-                data = read_json_file_tool(file_path)
-                if "anomalies" in data:
-                    # Add filename context to each anomaly if not present
-                    for anomaly in data["anomalies"]:
-                        anomaly["source_file"] = os.path.basename(file_path)
-                    aggregated_anomalies.extend(data["anomalies"])
-            except Exception as e:
-                print(f"Error reading {file_path}: {e}")
-
         print(f"Total anomalies found: {len(aggregated_anomalies)}")
 
-        # 3. Generate Report
-        print("\nStep 3: Generating consolidated report...")
+        # 3. Deduplicate locally
+        config = load_config(CONFIG_PATH)
+        index = AnomalyIndex(int(config.get('report_examples_per_group', 3)))
+        for anomaly in aggregated_anomalies:
+            index.add(anomaly)
+        groups = index.groups()
+        index_path = index.save(INDEX_PATH)
+        print(f"\nStep 3: Deduplicated {index.total} anomalies into {len(groups)} groups -> {index_path}")
 
-        # Prepare context for the agent
-        context_data = json.dumps(aggregated_anomalies, indent=2)
+        # 4. Summarize groups in bounded batches, merging partial findings hierarchically
+        budget = int(config.get('report_batch_tokens', 8000))
+        concurrency = int(config.get('agent_concurrency', 1))
+        group_lines = [json.dumps(group, separators=(",", ":")) for group in groups]
+        summaries = await _map_reduce(group_lines, budget, concurrency)
 
-        # Run the agent
-        response = await runner.run_debug(
+        # 5. Generate Report
+        print("\nStep 4: Generating consolidated report...")
+        shared = index.shared_entities(groups)
+        context_data = (
+            f"{index.total} anomalies deduplicated into {len(groups)} groups.\n\n"
+            + ("\n".join(summaries) if summaries else "No groups.")
+            + "\n\nEntities shared by several groups:\n"
+            + ("\n".join(json.dumps(entity, separators=(",", ":")) for entity in shared) or "None")
+        )
+        entities = EntityIndex.open(chunk_output_dir(config)) if config.get('entity_index_enabled', False) else None
+        if entities is not None:
+            correlations = entities.correlations(int(config.get('entity_index_correlations', 20)))
+            print(f"🔎 Adding {len(correlations)} cross-chunk correlations from the entity index")
+            context_data += "\n\nCross-chunk correlations from the entity index (whole log, not only anomalies):\n" + (
+                "\n".join(f"- {line}" for line in correlations) or "None"
+            )
+        store = log_store()
+        if store is not None:
+            levels = store.count_by("level")
+            hosts = store.count_by("host", int(config.get('log_store_report_hosts', 10)))
+            print("💽 Adding entry counts by level and host from the log store")
+            context_data += "\n\nStructured entries by level (whole log):\n" + (
+                ", ".join(f"{row['level']}: {row['count']}" for row in levels if row['level']) or "No levels"
+            ) + "\nBusiest hosts/nodes (entries):\n" + (
+                ", ".join(f"{row['host']}: {row['count']}" for row in hosts if row['host']) or "No hosts"
+            )
+        response = await timed_run(
+            runner,
             f"Here is the aggregated anomaly data:\n\n{context_data}\n\nGenerate the Consolidated Security Report."
         )
+        report_content = _response_text(response)
 
-        # Extract response
-        last_turn = response[-1]
-        if hasattr(last_turn, 'content') and last_turn.content and last_turn.content.parts:
-            report_content = last_turn.content.parts[0].text
-        else:
-            report_content = str(last_turn)
-
-        # 4. Save Report
+        # 6. Save Report
         output_file = "FINAL_ANOMALY_REPORT.md"
         with open(output_file, "w") as f:
             f.write(report_content)
+            tracer.count("bytes_written", f.tell())
 
         print(f"\n✅ Report saved to: {os.path.abspath(output_file)}")
         print("=" * 60)
@@ -1,11 +1,23 @@
 import subprocess
 import os
+import re
 import yaml
 import json
 from typing import Dict, Any, List
 from collections import Counter
+from functools import lru_cache
+from itertools import islice
 from src.log.guardians.app.main.main import load_config, chunk_log_file
-from src.log.guardians.app.utils.json_cleaner import clean_json_content
+from src.log.guardians.app.features.chunking.chunk_store import list_chunks, read_chunk_view
+from src.log.guardians.app.features.chunking.chunker import chunk_output_dir
+from src.log.guardians.app.features.chunking.compressed import open_log_text
+from src.log.guardians.app.features.parsing.parser_engine import compile_parse_pattern, parse_chunk_text, schema_keys
+from src.log.guardians.app.features.parsing.record_io import (
+    RECORD_FORMATS, as_entries, is_records_file, read_records, strip_record_suffix, write_records,
+)
+from src.log.guardians.app.features.storage.log_store import LogStore
+from src.log.guardians.app.utils.json_cleaner import extract_json
+from src.log.guardians.app.utils.metrics import tracer
 
 def run_log_generator() -> str:
     """Runs the main log generation script to create fresh logs."""
@@ -30,11 +42,13 @@ def structure_architect_tool(config_path: str = "src/log/guardians/app/main/conf
         sample_log_path = config.get('input_log_file')
         regex_pattern = config['log_profiles'][active_profile]['log_start_regex']
 
-        with open(sample_log_path, 'r', errors='replace') as f:
-            sample_lines = [next(f) for _ in range(20)]
+        # Shorter files are used whole
+        with open_log_text(sample_log_path) as f:
+            sample_lines = list(islice(f, 20))
 
         return {
             "regex_pattern": regex_pattern,
+            "parse_pattern": config['log_profiles'][active_profile].get('parse_pattern'),
             "sample_content": "".join(sample_lines),
             "profile_description": config['log_profiles'][active_profile]['description']
         }
@@ -49,13 +63,14 @@ def get_log_files_tool(config_path: str = "src/log/guardians/app/main/config/chu
     with open(config_path, 'r') as f:
         config = yaml.safe_load(f)
 
-    active_profile = config.get('active_profile')
-    log_file_name = config.get('input_log_file').split('/')[-1].replace('.log', '')
+    # Build path: {output_chunk_dir}/{profile}/{log_file_name}/
+    abs_log_dir = os.path.abspath(chunk_output_dir(config))
 
-    # Build path: .LogGuardians/output/logs/{profile}/{log_file_name}/
-    log_dir = f".LogGuardians/output/logs/{active_profile}/{log_file_name}"
+    # Packed stores list their chunks from the index, no directory walk needed
+    indexed_chunks = list_chunks(abs_log_dir)
+    if indexed_chunks is not None:
+        return indexed_chunks
 
-    abs_log_dir = os.path.abspath(log_dir)
     log_files = []
     for root, _, files in os.walk(abs_log_dir):
         for file in files:
@@ -66,84 +81,162 @@ def get_log_files_tool(config_path: str = "src/log/guardians/app/main/config/chu
 def read_file_tool(file_path: str) -> str:
     """Reads the content of a specific log file."""
     try:
+        if not os.path.exists(file_path):
+            # Chunks from a segment/reference store are served from an mmap slice
+            view = read_chunk_view(file_path)
+            if view is not None:
+                tracer.count("bytes_read", len(view))
+                return str(view, 'utf-8', errors='replace')
         with open(file_path, 'r', errors='replace') as f:
-            return f.read()
+            content = f.read()
+        tracer.count("bytes_read", len(content))
+        return content
     except Exception as e:
         return f"Error reading file: {str(e)}"
 
 
+@lru_cache(maxsize=None)
+def structured_format(config_path: str = "src/log/guardians/app/main/config/chunker_config.yaml") -> str:
+    """The configured on-disk format of converted chunks (see `record_io`)."""
+    config = {}
+    if os.path.exists(config_path):
+        with open(config_path, 'r') as f:
+            config = yaml.safe_load(f) or {}
+    fmt = config.get('structured_format', 'json')
+    if fmt not in RECORD_FORMATS:
+        raise ValueError(f"Unknown structured_format '{fmt}'. Expected one of: {', '.join(RECORD_FORMATS)}")
+    return fmt
+
+
+@lru_cache(maxsize=None)
+def log_store(config_path: str = "src/log/guardians/app/main/config/chunker_config.yaml"):
+    """The SQLite store the save tools mirror into, or None unless `log_store_enabled`."""
+    if not os.path.exists(config_path):
+        return None
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f) or {}
+    return LogStore.from_config(config)
+
+
+def json_output_path(original_file_path: str) -> str:
+    """Returns where `save_json_tool` writes the JSON for a log chunk."""
+    filename = os.path.basename(original_file_path).replace(".log", RECORD_FORMATS[structured_format()])
+    return os.path.join(os.path.abspath(".LogGuardians/output_json_structured_logs"), filename)
+
+
 def save_json_tool(data: list, original_file_path: str, schema_keys: list = None) -> str:
     """Saves the structured JSON data."""
 
-    filename = os.path.basename(original_file_path).replace(".log", ".json")
-    output_dir = os.path.abspath(".LogGuardians/output_json_structured_logs")
-    os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, filename)
+    output_path = json_output_path(original_file_path)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
     try:
         if isinstance(data, str):
-            cleaned_data = clean_json_content(data)
-            data = json.loads(cleaned_data)
-            
-        final_data = data
-        if schema_keys:
-            # Enforce dynamic key order
-            ordered_data = []
-            for entry in data:
-                ordered_entry = {k: entry.get(k) for k in schema_keys if k in entry}
-                # Add any other keys that might be present
-                for k, v in entry.items():
-                    if k not in schema_keys:
-                        ordered_entry[k] = v
-                ordered_data.append(ordered_entry)
-            final_data = ordered_data
-
-        with open(output_path, 'w') as f:
-            json.dump(final_data, f, indent=2)
+            data = extract_json(data)
+            if data is None:
+                return {"error": "No JSON found in data"}
+        data = as_entries(data)
+
+        # Entries are reordered to schema_keys only where their key order differs
+        tracer.count("bytes_written", write_records(output_path, data, schema_keys))
+        store = log_store()
+        if store is not None:
+            store.write_entries(strip_record_suffix(os.path.basename(output_path)), data)
         return f"Saved to {output_path}"
     except Exception as e:
         return {"error": str(e)}
 
+def parse_log_file_with_pattern(file_path: str, parse_pattern: str, log_start_regex: str) -> Dict[str, Any]:
+    """
+    Converts a log chunk locally with the profile's named-group parse pattern.
+
+    Fully matched chunks are saved with `save_json_tool` straight away. If some
+    entries do not match, nothing is saved and the partial records plus the
+    unmatched entries are returned so the caller can resolve them.
+    """
+    parse_re = compile_parse_pattern(parse_pattern)
+    keys = schema_keys(parse_re)
+    text = read_file_tool(file_path)
+    records, unmatched = parse_chunk_text(text, parse_re, re.compile(log_start_regex))
+
+    # Runs in worker processes, so I/O is reported back for the parent's metrics
+    result = {"file": file_path, "schema_keys": keys, "unmatched": unmatched, "saved": None,
+              "bytes_read": len(text), "bytes_written": 0}
+    if unmatched:
+        result["records"] = records
+    else:
+        result["saved"] = save_json_tool(records, file_path, keys)
+        result["bytes_written"] = os.path.getsize(json_output_path(file_path))
+    return result
+
 def read_json_file_tool(file_path: str) -> Dict[str, Any]:
     """Reads a specific JSON file and returns its content."""
 
     try:
-        with open(file_path, 'r') as f:
-            return json.load(f)
+        store = log_store()
+        if store is not None and not os.path.exists(file_path):
+            # Chunks whose file is gone are served from the log store
+            entries = store.entries(strip_record_suffix(os.path.basename(file_path)))
+            if entries is not None:
+                return entries
+        data = read_records(file_path)
+        tracer.count("bytes_read", os.path.getsize(file_path))
+        return data
     except Exception as e:
         return {"error": f"Error reading file: {str(e)}"}
 
+def query_log_store_tool(level: str = None, host: str = None, start: str = None, end: str = None,
+                         chunk: str = None, contains: str = None, limit: int = 100) -> Dict[str, Any]:
+    """
+    Queries the structured entries of every chunk at once. All filters are
+    optional: level (e.g. ERROR), host or node name, start/end time in the
+    log's timestamp format (end excluded), chunk (e.g. chunk_0007) and a
+    substring of the message.
+    """
+    store = log_store()
+    if store is None:
+        return {"error": "The log store is disabled (log_store_enabled: false)"}
+    try:
+        filters = dict(level=level, host=host, start=start, end=end, chunk=chunk, contains=contains)
+        entries = store.query(limit=limit, **filters)
+        return {"entries": entries, "by_chunk": store.count_by("chunk", **filters)}
+    except Exception as e:
+        return {"error": f"Error querying log store: {str(e)}"}
+
 def get_json_files_tool(json_dir: str = ".LogGuardians/output_json_structured_logs") -> List[str]:
     """Returns a list of all JSON files in the directory."""
     abs_dir = os.path.abspath(json_dir)
     json_files = []
     for root, _, files in os.walk(abs_dir):
         for file in files:
-            if file.endswith(".json"):
+            if is_records_file(file):
                 json_files.append(os.path.join(root, file))
     return sorted(json_files)
 
+def anomaly_output_path(original_filename: str) -> str:
+    """Returns where `save_anomaly_json_tool` writes the report for a JSON file."""
+    # Construct filename: chunk_0000_anomaly.json
+    base_name = strip_record_suffix(os.path.basename(original_filename))
+    return os.path.join(os.path.abspath(".LogGuardians/output_anomalies"), f"{base_name}_anomaly.json")
+
+
 def save_anomaly_json_tool(data: Dict[str, Any], original_filename: str) -> str:
     """Saves the anomaly report to a JSON file."""
     from datetime import datetime
 
     # Create output directory
-    output_dir = os.path.abspath(".LogGuardians/output_anomalies")
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Construct filename: chunk_0000_anomaly.json
-    base_name = os.path.basename(original_filename).replace(".json", "")
-    filename = f"{base_name}_anomaly.json"
-    output_path = os.path.join(output_dir, filename)
+    output_path = anomaly_output_path(original_filename)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
     # Add metadata
     # Add metadata
     try:
         if isinstance(data, str):
-            cleaned_data = clean_json_content(data)
-            data = json.loads(cleaned_data)
+            data = extract_json(data)
     except Exception as e:
         return {"error": f"Error parsing anomaly JSON: {str(e)}"}
+    if not isinstance(data, dict):
+        return {"error": "Error parsing anomaly JSON: no JSON object found"}
 
     data["file"] = original_filename
     data["timestamp_analyzed"] = datetime.now().isoformat()
@@ -151,6 +244,10 @@ def save_anomaly_json_tool(data: Dict[str, Any], original_filename: str) -> str:
     try:
         with open(output_path, 'w') as f:
             json.dump(data, f, indent=2)
+            tracer.count("bytes_written", f.tell())
+        store = log_store()
+        if store is not None:
+            store.write_anomalies(os.path.basename(output_path)[:-len("_anomaly.json")], data)
         return f"Saved anomaly report to {output_path}"
     except Exception as e:
         return {"error": f"Error saving anomaly file: {str(e)}"}
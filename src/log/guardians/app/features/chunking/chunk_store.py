@@ -0,0 +1,249 @@
+"""
+Packed chunk storage.
+
+Instead of one ``chunk_NNNN.log`` file per chunk, the chunker can keep every
+chunk in a single data file and describe them with a compact binary index:
+
+* ``segment`` mode writes one packed ``chunks.seg`` file next to the index.
+* ``reference`` mode writes no chunk data at all; the index points straight
+  into the original input log.
+
+Chunks keep their familiar virtual paths (``<output_dir>/chunk_NNNN.log``) so
+the rest of the pipeline addresses them exactly as before. ``read_chunk_view``
+serves a chunk as a zero-copy ``memoryview`` slice of an mmap of the data file.
+
+The ``files`` store has no index; its chunk records are written to a small
+JSON manifest instead (``write_manifest``).
+"""
+
+import json
+import math
+import mmap
+import os
+import re
+import struct
+from typing import List, NamedTuple, Optional, Tuple
+
+INDEX_FILE = "chunks.idx"
+SEGMENT_FILE = "chunks.seg"
+MANIFEST_FILE = "chunks.manifest.json"
+
+STORE_MODES = ("files", "segment", "reference")
+
+# magic, version, length of the data path that follows the header
+_HEADER = struct.Struct("<4sHH")
+_MAGIC = b"LGCI"
+_VERSION = 2
+# chunk_id, byte offset, byte length, entry count, first line, last line,
+# then (version 2) first and last entry time in seconds, NaN if unknown
+_RECORDS = {
+    1: struct.Struct("<IQQIQQ"),
+    2: struct.Struct("<IQQIQQdd"),
+}
+_RECORD = _RECORDS[_VERSION]
+
+_CHUNK_NAME = re.compile(r"^chunk_(\d+)\.log$")
+
+# Open mmaps and parsed indexes, invalidated when the file changes on disk
+_MMAPS = {}
+_INDEXES = {}
+
+
+class ChunkRecord(NamedTuple):
+    chunk_id: int
+    offset: int
+    length: int
+    entries: int
+    first_line: int
+    last_line: int
+    start_time: float = math.nan
+    end_time: float = math.nan
+
+
+def chunk_path(output_dir: str, chunk_id: int) -> str:
+    """Returns the (possibly virtual) path used to address a chunk."""
+    return os.path.join(output_dir, f"chunk_{chunk_id:04d}.log")
+
+
+def write_index(output_dir: str, data_path: str, records: List[ChunkRecord]) -> str:
+    """
+    Writes the chunk index for ``output_dir``.
+
+    ``data_path`` is stored relative to ``output_dir`` when it lives inside
+    it (segment mode) and absolute otherwise (reference mode).
+    """
+    abs_dir = os.path.abspath(output_dir)
+    abs_data = os.path.abspath(data_path)
+    if os.path.dirname(abs_data) == abs_dir:
+        stored_path = os.path.basename(abs_data)
+    else:
+        stored_path = abs_data
+    encoded_path = stored_path.encode("utf-8")
+
+    index_path = os.path.join(output_dir, INDEX_FILE)
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, len(encoded_path)))
+        f.write(encoded_path)
+        for record in sorted(records):
+            f.write(_RECORD.pack(*record))
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+def append_index_record(output_dir: str, record: ChunkRecord):
+    """
+    Appends one record to an index started with ``write_index``.
+
+    Used while streaming, where chunks must be readable as soon as they are
+    written. Records must be appended in chunk_id order.
+    """
+    with open(os.path.join(output_dir, INDEX_FILE), "ab") as f:
+        f.write(_RECORD.pack(*record))
+
+
+def read_index(output_dir: str) -> Optional[Tuple[str, List[ChunkRecord]]]:
+    """
+    Loads the chunk index for ``output_dir``.
+
+    Cached per (inode, size, mtime), like ``_get_mmap``, so an index
+    rewritten in place or onto a reused inode is read again. An index that
+    only grew since the last call (``append_index_record``) is extended by
+    reading just the new records; it counts as grown only if its header,
+    first record and last cached record are unchanged on disk.
+
+    Returns:
+        (absolute data path, records sorted by chunk_id), or None if the
+        directory has no index.
+    """
+    index_path = os.path.join(output_dir, INDEX_FILE)
+    try:
+        stat = os.stat(index_path)
+    except FileNotFoundError:
+        return None
+
+    cache_key = os.path.abspath(index_path)
+    cached = _INDEXES.get(cache_key)
+    if cached:
+        (ino, size, mtime_ns, record, head, last), (data_path, records) = cached
+        if (ino, size, mtime_ns) == (stat.st_ino, stat.st_size, stat.st_mtime_ns):
+            return cached[1]
+        if ino == stat.st_ino and stat.st_size > size:
+            with open(index_path, "rb") as f:
+                appended = f.read(len(head)) == head
+                if appended and last:
+                    f.seek(size - len(last))
+                    appended = f.read(len(last)) == last
+                if appended:
+                    f.seek(size)
+                    tail = f.read(stat.st_size - size)
+            if appended:
+                whole = len(tail) - len(tail) % record.size
+                records.extend(ChunkRecord(*fields) for fields in record.iter_unpack(tail[:whole]))
+                if whole:
+                    last = tail[whole - record.size:whole]
+                _INDEXES[cache_key] = ((ino, size + whole, stat.st_mtime_ns, record, head, last), (data_path, records))
+                return data_path, records
+
+    with open(index_path, "rb") as f:
+        buf = f.read()
+    magic, version, path_len = _HEADER.unpack_from(buf, 0)
+    if magic != _MAGIC or version not in _RECORDS:
+        raise ValueError(f"Unsupported chunk index format in {index_path}")
+    record = _RECORDS[version]
+    pos = _HEADER.size
+    stored_path = buf[pos:pos + path_len].decode("utf-8")
+    pos += path_len
+    whole = len(buf) - (len(buf) - pos) % record.size
+    # Version 1 records have no times; ChunkRecord fills them with NaN
+    records = [ChunkRecord(*fields) for fields in record.iter_unpack(buf[pos:whole])]
+
+    data_path = os.path.join(os.path.dirname(cache_key), stored_path)
+    result = (data_path, records)
+    # Header and first record, and the last record, to tell appends from rewrites
+    head = buf[:min(pos + record.size, whole)]
+    last = buf[whole - record.size:whole] if whole > pos else b""
+    _INDEXES[cache_key] = ((stat.st_ino, whole, stat.st_mtime_ns, record, head, last), result)
+    return result
+
+
+def write_manifest(output_dir: str, records: List[ChunkRecord]) -> str:
+    """Writes the chunk records of a ``files`` store as JSON (unknown times as null)."""
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    entries = []
+    for record in sorted(records):
+        entry = record._asdict()
+        for key in ("start_time", "end_time"):
+            if math.isnan(entry[key]):
+                entry[key] = None
+        entries.append(entry)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"chunks": entries}, f)
+    os.replace(tmp_path, manifest_path)
+    return manifest_path
+
+
+def list_chunks(output_dir: str) -> Optional[List[str]]:
+    """Returns the virtual chunk paths of an indexed directory, or None."""
+    index = read_index(output_dir)
+    if index is None:
+        return None
+    return [chunk_path(output_dir, record.chunk_id) for record in index[1]]
+
+
+def resolve_chunk(file_path: str) -> Optional[Tuple[str, ChunkRecord]]:
+    """Maps a virtual chunk path to (data path, record), or None if not indexed."""
+    match = _CHUNK_NAME.match(os.path.basename(file_path))
+    if not match:
+        return None
+    index = read_index(os.path.dirname(file_path) or ".")
+    if index is None:
+        return None
+    data_path, records = index
+    chunk_id = int(match.group(1))
+    # Chunk ids are dense and sorted, so try direct addressing first
+    if chunk_id < len(records) and records[chunk_id].chunk_id == chunk_id:
+        return data_path, records[chunk_id]
+    for record in records:
+        if record.chunk_id == chunk_id:
+            return data_path, record
+    return None
+
+
+def _get_mmap(data_path: str) -> mmap.mmap:
+    """Returns a shared read-only mmap of ``data_path``, remapping if it changed."""
+    stat = os.stat(data_path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _MMAPS.get(data_path)
+    if cached and cached[0] == key:
+        return cached[1]
+    with open(data_path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _MMAPS[data_path] = (key, mm)
+    return mm
+
+
+def read_chunk_view(file_path: str) -> Optional[memoryview]:
+    """
+    Returns a zero-copy view of an indexed chunk's bytes, or None if
+    ``file_path`` is not an indexed chunk.
+    """
+    resolved = resolve_chunk(file_path)
+    if resolved is None:
+        return None
+    data_path, record = resolved
+    if record.length == 0:
+        return memoryview(b"")
+    mm = _get_mmap(data_path)
+    return memoryview(mm)[record.offset:record.offset + record.length]
+
+
+def remove_store(output_dir: str) -> None:
+    """Deletes the index, manifest and any segment files in ``output_dir``."""
+    for name in os.listdir(output_dir):
+        if name in (INDEX_FILE, MANIFEST_FILE) or name.startswith(SEGMENT_FILE):
+            try:
+                os.remove(os.path.join(output_dir, name))
+            except OSError:
+                pass
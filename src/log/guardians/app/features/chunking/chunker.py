@@ -1,9 +1,37 @@
+import math
 import os
 import re
 import yaml
+import shutil
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 from datetime import datetime
 
+from src.log.guardians.app.features.chunking.chunk_store import (
+    SEGMENT_FILE, STORE_MODES, ChunkRecord, append_index_record, chunk_path, remove_store,
+    write_index, write_manifest,
+)
+from src.log.guardians.app.features.chunking.compressed import (
+    is_compressed, open_log, strip_compression_suffix,
+)
+from src.log.guardians.app.features.chunking.timestamps import TimestampParser
+from src.log.guardians.app.features.correlation.entity_index import build_entity_index, remove_entity_index
+from src.log.guardians.app.features.dedup.near_duplicates import build_near_duplicates, remove_near_duplicates
+from src.log.guardians.app.features.storage.log_store import LogStore
+from src.log.guardians.app.utils.metrics import tracer
+from src.log.guardians.app.utils.token_budget import CHARS_PER_TOKEN
+
+# Below this many bytes per shard, parallel chunking costs more than it saves
+MIN_SHARD_BYTES = 8 * 1024 * 1024
+
+CHUNK_MODES = ("entries", "time", "size")
+SIZE_UNITS = ("tokens", "bytes")
+# Size mode: a chunk this full closes rather than overshoot its target
+MIN_FILL = 0.5
+# Size mode: hard cap as a multiple of the target when chunk_max_size is unset
+DEFAULT_CAP_FACTOR = 2
+
 def load_config(config_path='config/chunker_config.yaml'):
     """Loads the YAML configuration file."""
     try:
@@ -32,20 +60,479 @@ def write_chunk_to_file(lines, output_dir, chunk_num):
         return None
 
 
-def chunk_log_file(config):
+def chunk_output_dir(config):
+    """Returns the directory chunks of the configured input are written to."""
+    input_basename = os.path.splitext(os.path.basename(strip_compression_suffix(config['input_log_file'])))[0]
+    return os.path.join(config['output_chunk_dir'], config['active_profile'], input_basename)
+
+
+def _iter_lines(f, start, end):
+    """
+    Yields (offset, raw_line) for every line that starts inside [start, end).
+
+    The file must be opened in binary mode so offsets are exact byte positions.
+    Offsets of a compressed input count decompressed bytes, and such a
+    stream can only be read from ``start`` 0.
+    """
+    if start:
+        f.seek(start)
+    pos = start
+    while end is None or pos < end:
+        raw = f.readline()
+        if not raw:
+            break
+        yield pos, raw
+        pos += len(raw)
+
+
+def _decode_line(raw):
+    """Decodes a raw line the same way text mode with errors='ignore' would."""
+    line = raw.decode('utf-8', errors='ignore')
+    if line.endswith('\r\n'):
+        line = line[:-2] + '\n'
+    return line
+
+
+def _iter_entries(f, start, end, start_pattern, line_base):
+    """
+    Groups the lines starting inside [start, end) into log entries.
+
+    Yields [first_line, last_line, start_offset, end_offset, lines] per entry,
+    where an entry is a start line plus its continuation lines. Lines before
+    the first start line are skipped.
+    """
+    entry = None
+    for lineno, (offset, raw) in enumerate(_iter_lines(f, start, end), start=line_base + 1):
+        line = _decode_line(raw)
+        if start_pattern.match(line):
+            if entry is not None:
+                yield entry
+            entry = [lineno, lineno, offset, offset + len(raw), [line]]
+        elif entry is not None:
+            # Continuation line (stacktrace, wrapped line, etc.)
+            entry[1] = lineno
+            entry[3] = offset + len(raw)
+            entry[4].append(line)
+    if entry is not None:
+        yield entry
+
+
+def _find_shard_boundaries(input_file, start_pattern, num_shards):
+    """
+    Splits the file into roughly equal byte ranges and snaps every interior
+    boundary forward to the next line matching the profile's start regex, so
+    no log entry (or its continuation lines) is split across two shards.
+    """
+    size = os.path.getsize(input_file)
+    boundaries = [0]
+    with open(input_file, 'rb') as f:
+        for i in range(1, num_shards):
+            target = size * i // num_shards
+            if target <= boundaries[-1]:
+                continue
+            # Skip the (possibly partial) line containing target-1
+            f.seek(target - 1)
+            f.readline()
+            pos = f.tell()
+            for offset, raw in _iter_lines(f, pos, None):
+                if start_pattern.match(_decode_line(raw)):
+                    pos = offset
+                    break
+            else:
+                pos = size
+            if boundaries[-1] < pos < size:
+                boundaries.append(pos)
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def _count_shard(args):
+    """Counts (entries, lines) in one byte range. Runs in a worker process."""
+    input_file, start, end, log_start_regex = args
+    start_pattern = re.compile(log_start_regex)
+    entries = 0
+    lines = 0
+    with open(input_file, 'rb') as f:
+        for _, raw in _iter_lines(f, start, end):
+            lines += 1
+            if start_pattern.match(_decode_line(raw)):
+                entries += 1
+    return entries, lines
+
+
+class _ChunkSink:
+    """Writes finished chunks to the configured store and collects their index records."""
+
+    def __init__(self, store, output_dir, segment_name=SEGMENT_FILE, on_chunk=None, input_file=None):
+        self.store = store
+        self.output_dir = output_dir
+        self.segment_path = os.path.join(output_dir, segment_name)
+        self.records = []
+        self._segment = None
+        # Streaming: make every chunk readable, then report it, as soon as it is written
+        self.on_chunk = on_chunk
+        if on_chunk is not None and store != 'files':
+            write_index(output_dir, self.segment_path if store == 'segment' else input_file, [])
+
+    def emit(self, piece):
+        if self.store == 'files':
+            if not write_chunk_to_file(piece['lines'], self.output_dir, piece['chunk_num']):
+                return
+            offset, length = 0, piece['end'] - piece['start']
+        elif self.store == 'segment':
+            if self._segment is None:
+                self._segment = open(self.segment_path, 'ab', buffering=1024 * 1024)
+            data = ''.join(piece['lines']).encode('utf-8')
+            offset, length = self._segment.tell(), len(data)
+            self._segment.write(data)
+        else:  # reference: the chunk is a byte range of the input file itself
+            offset, length = piece['start'], piece['end'] - piece['start']
+
+        record = ChunkRecord(
+            piece['chunk_num'], offset, length, piece['entries'],
+            piece['first_line'], piece['last_line'],
+            piece.get('start_time', math.nan), piece.get('end_time', math.nan),
+        )
+        self.records.append(record)
+
+        if self.on_chunk is not None:
+            if self.store != 'files':
+                if self._segment is not None:
+                    self._segment.flush()
+                append_index_record(self.output_dir, record)
+            self.on_chunk(chunk_path(self.output_dir, piece['chunk_num']))
+
+    def close(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+
+class _TimeWindows:
+    """
+    Assigns entries to time-window chunks.
+
+    Time is cut into aligned buckets of ``window`` seconds. In fixed mode every
+    bucket holding entries is one chunk. In adaptive mode quiet buckets are
+    merged: a chunk only closes at a bucket boundary once it holds
+    ``max_entries`` entries or spans ``max_span`` seconds, so bursts keep
+    their own window while quiet stretches don't produce a chunk each.
+
+    Entries whose timestamp can't be parsed, or that step back in time, stay
+    in the current chunk.
+    """
+
+    def __init__(self, parser, window, adaptive=False, max_entries=500, max_span=3600):
+        self.parser = parser
+        self.window = float(window)
+        self.adaptive = adaptive
+        self.max_entries = max_entries
+        self.max_span = float(max_span)
+        self.chunk_num = -1
+        self.entries = 0
+        self.bucket = None        # latest bucket seen in the current chunk
+        self.first_bucket = None  # bucket the current chunk started in
+
+    def assign(self, line):
+        """Returns (chunk number, timestamp or None) for an entry's first line."""
+        ts = self.parser(line)
+        bucket = math.floor(ts / self.window) if ts is not None else None
+
+        if self.chunk_num < 0:
+            self._start(bucket)
+        elif bucket is not None:
+            if self.bucket is None:
+                self.bucket = self.first_bucket = bucket
+            elif bucket > self.bucket:
+                full = self.entries >= self.max_entries
+                too_long = (bucket - self.first_bucket) * self.window >= self.max_span
+                if not self.adaptive or full or too_long:
+                    self._start(bucket)
+                else:
+                    self.bucket = bucket
+        self.entries += 1
+        return self.chunk_num, ts
+
+    def _start(self, bucket):
+        self.chunk_num += 1
+        self.entries = 0
+        self.bucket = self.first_bucket = bucket
+
+
+class _SizeWindows:
+    """
+    Assigns entries to chunks by size, closing chunks only at entry boundaries.
+
+    Sizes are bytes, or tokens estimated as bytes / CHARS_PER_TOKEN. An entry
+    joins the current chunk while the chunk stays within ``target``. Past the
+    target it still joins a chunk that is less than MIN_FILL full, as long as
+    ``cap`` is respected, so one large entry doesn't leave a tiny chunk
+    behind. An entry larger than ``cap`` on its own gets a chunk to itself.
+    """
+
+    def __init__(self, unit, target, cap=0):
+        self.unit = unit
+        self.target = target
+        self.cap = max(cap, target) if cap else target * DEFAULT_CAP_FACTOR
+        self.chunk_num = -1
+        self.size = 0
+
+    def measure(self, num_bytes):
+        return num_bytes if self.unit == 'bytes' else -(-num_bytes // CHARS_PER_TOKEN)
+
+    def assign(self, num_bytes):
+        """Returns the chunk number for an entry of ``num_bytes`` bytes."""
+        size = self.measure(num_bytes)
+        if self.chunk_num < 0:
+            self._start()
+        elif self.size + size > self.target:
+            if self.size >= self.target * MIN_FILL or self.size + size > self.cap:
+                self._start()
+        self.size += size
+        return self.chunk_num
+
+    def _start(self):
+        self.chunk_num += 1
+        self.size = 0
+
+
+def _chunk_shard(job):
+    """
+    Chunks one byte range whose first entry has global index ``entry_base``.
+
+    Chunk membership is purely a function of the global entry index
+    (``index // max_entries``), so every shard can number its chunks exactly
+    as a serial run would. Chunks that lie fully inside the shard are emitted
+    directly; pieces of chunks that straddle a shard boundary are returned so
+    the parent can stitch them together.
+
+    With ``windows`` set (serial runs only) chunks follow a ``_TimeWindows``
+    or ``_SizeWindows`` assigner instead, and every piece is a whole chunk.
+
+    Returns:
+        (records, partials) where records are the ChunkRecords emitted by this
+        shard and partials is a list of unfinished pieces in file order.
+    """
+    start_pattern = re.compile(job['log_start_regex'])
+    max_entries = job['max_entries']
+    sink = _ChunkSink(job['store'], job['output_dir'], job.get('segment_name', SEGMENT_FILE),
+                      job.get('on_chunk'), job['input_file'])
+    partials = []
+    piece = None
+    windows = job.get('windows')
+    ts = None
+
+    try:
+        with open_log(job['input_file'], job.get('decompress_workers', 1)) as f:
+            entry_index = job['entry_base']
+            entries = _iter_entries(f, job['start'], job['end'], start_pattern, job['line_base'])
+            for first_line, last_line, start, end, lines in entries:
+                if windows is None:
+                    chunk_num = entry_index // max_entries
+                elif isinstance(windows, _TimeWindows):
+                    chunk_num, ts = windows.assign(lines[0])
+                else:
+                    chunk_num = windows.assign(end - start)
+                if piece is None or piece['chunk_num'] != chunk_num:
+                    if piece is not None:
+                        # Flush the finished chunk as soon as the next one begins
+                        _flush_piece(piece, max_entries, windows is not None, sink, partials)
+                        print(f"🔹 New chunk started at line {first_line} (chunk {chunk_num})")
+                    elif entry_index == 0:
+                        print(f"🔸 First log entry detected at line {first_line}")
+                    piece = {
+                        'chunk_num': chunk_num, 'lines': [], 'first_entry': entry_index,
+                        'entries': 0, 'start': start, 'end': start,
+                        'first_line': first_line, 'last_line': first_line,
+                        'start_time': math.nan, 'end_time': math.nan,
+                    }
+                if ts is not None:
+                    piece['start_time'] = min(piece['start_time'], ts) if piece['entries'] else ts
+                    piece['end_time'] = max(piece['end_time'], ts) if piece['entries'] else ts
+                piece['entries'] += 1
+                entry_index += 1
+                piece['lines'].extend(lines)
+                piece['end'] = end
+                piece['last_line'] = last_line
+
+        if piece is not None:
+            _flush_piece(piece, max_entries, windows is not None, sink, partials, job['is_last_shard'])
+    finally:
+        sink.close()
+
+    return sink.records, partials
+
+
+def _flush_piece(piece, max_entries, is_whole, sink, partials, is_last=False):
+    """
+    Emits a piece if it is a whole chunk, otherwise keeps it for stitching.
+    ``is_whole`` marks pieces known to be complete (time and size windows);
+    ``is_last`` marks the input's final piece, which is complete only if it
+    also starts its chunk (it may continue a chunk begun in an earlier shard).
+    """
+    starts_chunk = piece['first_entry'] == piece['chunk_num'] * max_entries
+    if is_whole or (starts_chunk and (piece['entries'] == max_entries or is_last)):
+        sink.emit(piece)
+    else:
+        partials.append(piece)
+
+
+def _merge_pieces(pieces):
+    """Joins the per-shard pieces of one chunk (given in file order)."""
+    merged = dict(pieces[0], lines=[], entries=0)
+    for piece in pieces:
+        merged['lines'].extend(piece['lines'])
+        merged['entries'] += piece['entries']
+    merged['end'] = pieces[-1]['end']
+    merged['last_line'] = pieces[-1]['last_line']
+    return merged
+
+
+def _chunk_parallel(job, start_pattern, workers):
+    """
+    Byte-range sharded chunking across a process pool.
+
+    Pass 1 counts entries per shard so each shard knows its global entry
+    offset; pass 2 chunks every shard independently. The result is the same
+    chunk sequence and numbering as the serial path.
+    """
+    input_file = job['input_file']
+    output_dir = job['output_dir']
+    shards = _find_shard_boundaries(input_file, start_pattern, workers)
+    print(f"⚡ Parallel chunking with {workers} workers over {len(shards)} shards")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        counts = list(pool.map(
+            _count_shard, [(input_file, s, e, job['log_start_regex']) for s, e in shards]
+        ))
+
+        jobs = []
+        entry_base = 0
+        line_base = 0
+        for i, ((start, end), (entries, lines)) in enumerate(zip(shards, counts)):
+            jobs.append(dict(
+                job, start=start, end=end, entry_base=entry_base, line_base=line_base,
+                is_last_shard=i == len(shards) - 1,
+                segment_name=f"{SEGMENT_FILE}.part{i:04d}",
+            ))
+            entry_base += entries
+            line_base += lines
+
+        records = []
+        stitched = {}
+        segment_path = os.path.join(output_dir, SEGMENT_FILE)
+        with ExitStack() as stack:
+            segment = None
+            if job['store'] == 'segment':
+                segment = stack.enter_context(open(segment_path, 'wb'))
+            for shard_job, (shard_records, shard_partials) in zip(jobs, pool.map(_chunk_shard, jobs)):
+                if segment is not None:
+                    # Append this shard's part file and rebase its offsets
+                    part_path = os.path.join(output_dir, shard_job['segment_name'])
+                    base = segment.tell()
+                    if os.path.exists(part_path):
+                        with open(part_path, 'rb') as part:
+                            shutil.copyfileobj(part, segment, 1024 * 1024)
+                        os.remove(part_path)
+                    shard_records = [r._replace(offset=r.offset + base) for r in shard_records]
+                records.extend(shard_records)
+                for piece in shard_partials:
+                    stitched.setdefault(piece['chunk_num'], []).append(piece)
+
+    sink = _ChunkSink(job['store'], output_dir)
+    try:
+        for chunk_num in sorted(stitched):
+            sink.emit(_merge_pieces(stitched[chunk_num]))
+    finally:
+        sink.close()
+
+    return records + sink.records
+
+
+def _report_chunk_sizes(records, unit, size_windows=None):
+    """Prints the chunk size distribution (percentiles and a log2 histogram)."""
+    if not records:
+        return
+    sizes = sorted(
+        r.length if unit == 'bytes' else -(-r.length // CHARS_PER_TOKEN) for r in records
+    )
+
+    def percentile(p):
+        return sizes[min(len(sizes) - 1, int(p / 100 * len(sizes)))]
+
+    print(
+        f"📏 Chunk sizes ({unit}): min {sizes[0]}, p50 {percentile(50)}, p90 {percentile(90)}, "
+        f"p99 {percentile(99)}, max {sizes[-1]}, mean {sum(sizes) / len(sizes):.0f}"
+    )
+    if size_windows is not None:
+        over_target = sum(1 for size in sizes if size > size_windows.target)
+        over_cap = sum(1 for size in sizes if size > size_windows.cap)
+        print(f"   Over target: {over_target}, over cap: {over_cap} (single entries larger than the cap)")
+
+    buckets = {}
+    for size in sizes:
+        bucket = max(size, 1).bit_length() - 1
+        buckets[bucket] = buckets.get(bucket, 0) + 1
+    widest = max(buckets.values())
+    for bucket in range(min(buckets), max(buckets) + 1):
+        count = buckets.get(bucket, 0)
+        bar = "█" * max(1 if count else 0, round(count / widest * 30))
+        print(f"   {2 ** bucket:>9} - {2 ** (bucket + 1) - 1:<9} {count:>6} {bar}".rstrip())
+
+
+@tracer.traced("chunking")
+def chunk_log_file(config, on_chunk=None):
     """
     Reads the large log file and splits it into chunks based on
     the rules in the config.
+
+    Set ``chunk_workers`` in the config to shard the file into byte ranges and
+    chunk them in a process pool (0 means one worker per CPU). Output is
+    identical to a serial run.
+
+    ``chunk_mode`` selects how entries are grouped: ``entries`` (every
+    ``max_entries_per_chunk`` entries), ``time`` (one chunk per
+    ``chunk_window_seconds`` window of the profile's parsed timestamps; with
+    ``chunk_window_adaptive`` quiet windows are merged up to
+    ``max_entries_per_chunk`` entries or ``chunk_window_max_seconds``) or
+    ``size`` (chunks of about ``chunk_target_size`` ``chunk_size_unit``, never
+    above ``chunk_max_size`` except for a single oversized entry). Time and
+    size mode always chunk serially. The chunk size distribution is reported
+    at the end.
+
+    ``chunk_store`` selects how chunks are persisted: ``files`` (one
+    chunk_NNNN.log per chunk), ``segment`` (one packed segment file plus an
+    index) or ``reference`` (an index into the input file, no copies).
+
+    ``.gz``, ``.bz2``, ``.xz`` and ``.zst`` inputs are decompressed on the fly
+    (multi-member files by ``decompress_workers`` threads) and chunked
+    serially; the ``reference`` store falls back to ``segment`` for them.
+
+    With ``entity_index_enabled`` the chunks are indexed by entity at the end
+    (see ``entity_index``) and with ``dedup_enabled`` they are then clustered
+    into near-duplicates (see ``near_duplicates``), unless streaming: streamed
+    chunks are analyzed before either could be built.
+
+    If ``on_chunk`` is given it is called with each chunk's path as soon as
+    that chunk is written and readable, so later stages can start before
+    chunking finishes. Streaming always chunks serially to keep chunk order.
     """
     # --- 1. Get settings from config ---
     try:
         input_file = config['input_log_file']
-        base_output_dir = config['output_chunk_dir']
         active_profile_name = config['active_profile']
-        input_basename = os.path.splitext(os.path.basename(input_file))[0]
-        output_dir = os.path.join(base_output_dir, active_profile_name, input_basename)
+        output_dir = chunk_output_dir(config)
         max_entries = int(config.get('max_entries_per_chunk', 500))
-
+        workers = int(config.get('chunk_workers', 1)) or os.cpu_count() or 1
+        store = config.get('chunk_store', 'files')
+        if store not in STORE_MODES:
+            print(f"❌ ERROR: Unknown chunk_store '{store}'. Expected one of: {', '.join(STORE_MODES)}")
+            sys.exit(1)
+        decompress_workers = int(config.get('decompress_workers', 0))
+        chunk_mode = config.get('chunk_mode', 'entries')
+        if chunk_mode not in CHUNK_MODES:
+            print(f"❌ ERROR: Unknown chunk_mode '{chunk_mode}'. Expected one of: {', '.join(CHUNK_MODES)}")
+            sys.exit(1)
 
         if active_profile_name not in config['log_profiles']:
             print(f"❌ ERROR: Active profile '{active_profile_name}' not found in 'log_profiles' section.")
@@ -59,6 +546,37 @@ def chunk_log_file(config):
 
         print(f"ℹ️  Active profile: '{active_profile_name}' ({profile.get('description', 'No description')})")
 
+        windows = None
+        if chunk_mode == 'time':
+            try:
+                timestamp_parser = TimestampParser.from_profile(profile)
+            except (ValueError, re.error) as e:
+                print(f"❌ ERROR: Invalid timestamp settings in profile '{active_profile_name}': {e}")
+                sys.exit(1)
+            if timestamp_parser is None:
+                print(f"❌ ERROR: chunk_mode 'time' needs a 'timestamp_format' in profile '{active_profile_name}'.")
+                sys.exit(1)
+            window = float(config.get('chunk_window_seconds', 60))
+            windows = _TimeWindows(
+                timestamp_parser, window,
+                bool(config.get('chunk_window_adaptive', False)), max_entries,
+                float(config.get('chunk_window_max_seconds', 3600)),
+            )
+            mode = "adaptive" if windows.adaptive else "fixed"
+            print(f"⏱️  Time-window chunking: {window:g}s windows ({mode})")
+
+        size_unit = config.get('chunk_size_unit', 'tokens')
+        if size_unit not in SIZE_UNITS:
+            print(f"❌ ERROR: Unknown chunk_size_unit '{size_unit}'. Expected one of: {', '.join(SIZE_UNITS)}")
+            sys.exit(1)
+        if chunk_mode == 'size':
+            target = int(config.get('chunk_target_size', 2000))
+            if target <= 0:
+                print("❌ ERROR: chunk_mode 'size' needs a positive chunk_target_size.")
+                sys.exit(1)
+            windows = _SizeWindows(size_unit, target, int(config.get('chunk_max_size', 0)))
+            print(f"📐 Size-based chunking: target {target} {size_unit}, hard cap {windows.cap} {size_unit}")
+
     except KeyError as e:
         print(f"❌ ERROR: Config file is missing required key: {e}")
         sys.exit(1)
@@ -83,54 +601,67 @@ def chunk_log_file(config):
                     os.remove(os.path.join(output_dir, f))
                 except Exception:
                     pass
+        remove_store(output_dir)
+        remove_entity_index(output_dir)
+        remove_near_duplicates(output_dir)
+    # The log store keeps this input's rows under its own scope; drop the old run's
+    log_store = LogStore.from_config(config)
+    if log_store is not None:
+        log_store.clear()
+        log_store.close()
 
     # --- 3. Process the file (memory-efficient) ---
     if not os.path.isfile(input_file):
         print(f"❌ ERROR: Input log file not found at {input_file}")
         sys.exit(1)
 
+    compressed = is_compressed(input_file)
+    if compressed and store == 'reference':
+        # Offsets into the decompressed stream can't be served from the compressed file
+        print("ℹ️  Compressed input can't be referenced in place; using the 'segment' store")
+        store = 'segment'
+
     print(f"🚀 Starting to process {input_file}...")
-    chunk_num = 0
-    entry_count = 0
-    current_chunk_lines = []
-    chunk_files_created = []
+
+    job = {
+        'input_file': input_file, 'start': 0, 'end': None,
+        'log_start_regex': log_start_regex, 'max_entries': max_entries,
+        'entry_base': 0, 'line_base': 0, 'output_dir': output_dir,
+        'is_last_shard': True, 'store': store, 'on_chunk': on_chunk,
+        'windows': windows, 'decompress_workers': decompress_workers,
+    }
 
     try:
-        with open(input_file, 'r', encoding='utf-8', errors='ignore') as f:
-            for lineno, line in enumerate(f, start=1):
-                if start_pattern.match(line):
-                    # This line is the start of a new log entry.
-                    # If current entry_count already at max, flush the chunk.
-                    if entry_count >= max_entries:
-                        path = write_chunk_to_file(current_chunk_lines, output_dir, chunk_num)
-                        if path:
-                            chunk_files_created.append(path)
-                        chunk_num += 1
-                        current_chunk_lines = [line]
-                        entry_count = 1
-                        print(f"🔹 New chunk started at line {lineno} (chunk {chunk_num})")
-                    else:
-                        # New entry but not exceeding chunk size: append as new entry
-                        current_chunk_lines.append(line)
-                        entry_count += 1
-                        # For first matched line after startup, show debug
-                        if entry_count == 1 and len(current_chunk_lines) == 1:
-                            print(f"🔸 First log entry detected at line {lineno}")
-                else:
-                    # Continuation line (stacktrace, wrapped line, etc.)
-                    if current_chunk_lines:
-                        current_chunk_lines.append(line)
-                    else:
-                        # line that doesn't match and we haven't started a chunk yet;
-                        # optionally write it to an "orphan" chunk or ignore
-                        # We'll start collecting only once we see the first matching start line.
-                        continue
-
-            # --- 4. Write the final remaining chunk ---
-            if current_chunk_lines:
-                path = write_chunk_to_file(current_chunk_lines, output_dir, chunk_num)
-                if path:
-                    chunk_files_created.append(path)
+        # Small files are not worth the process pool start-up cost
+        file_size = os.path.getsize(input_file)
+        if (workers > 1 and file_size >= MIN_SHARD_BYTES * 2 and on_chunk is None and windows is None
+                and not compressed):
+            workers = min(workers, max(1, file_size // MIN_SHARD_BYTES))
+            records = _chunk_parallel(job, start_pattern, workers)
+        else:
+            records, _ = _chunk_shard(job)
+
+        records.sort()
+        if store != 'files':
+            if store == 'segment':
+                data_path = os.path.join(output_dir, SEGMENT_FILE)
+                open(data_path, 'ab').close()
+            else:
+                data_path = input_file
+            index_path = write_index(output_dir, data_path, records)
+            print(f"🗂️  Indexed {len(records)} chunks -> {index_path} (store: {store})")
+        else:
+            write_manifest(output_dir, records)
+        chunk_files_created = [chunk_path(output_dir, r.chunk_id) for r in records]
+        if config.get('entity_index_enabled', False) and on_chunk is None:
+            index_path = build_entity_index(output_dir, records, profile, workers)
+            print(f"🔎 Indexed entities (IPs, hosts, users, PIDs, request ids) -> {index_path}")
+        if config.get('dedup_enabled', False) and on_chunk is None:
+            clusters_path, representatives, count = build_near_duplicates(output_dir, records, config)
+            print(f"🧬 Near-duplicates: {count} chunks in {representatives} clusters -> {clusters_path}")
+        tracer.count("bytes_read", file_size)
+        if store != 'reference':
+            tracer.count("bytes_written", sum(r.length for r in records))
 
     except Exception as e:
         print(f"❌ An unexpected error occurred: {e}")
@@ -139,8 +670,6 @@ def chunk_log_file(config):
     print("\n🎉 --- Chunking Complete! ---")
     print(f"Total chunk files created: {len(chunk_files_created)}")
     print(f"Chunks saved in: {os.path.abspath(output_dir)}")
+    _report_chunk_sizes(records, size_unit, windows if isinstance(windows, _SizeWindows) else None)
 
     return chunk_files_created
-
-
-
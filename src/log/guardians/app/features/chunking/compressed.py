@@ -0,0 +1,271 @@
+"""
+Transparent reading of compressed log files.
+
+``open_log`` opens ``.gz``, ``.bz2``, ``.xz`` and ``.zst`` inputs (by file
+suffix) as a buffered binary stream of the decompressed bytes, so callers
+read them exactly like plain logs. Nothing is extracted to disk.
+
+Files made of several independent members (``pigz``/``bgzip`` gzip,
+``pbzip2`` bzip2, concatenated xz streams, ``pzstd`` zstd frames) are
+decompressed by a thread pool, a few groups of members ahead of the reader;
+the decompressors release the GIL, so this scales with cores. Member starts
+are found by their magic bytes (bgzip blocks and zstd frames are walked
+exactly). Every group must decode to the end of its last member, so a
+false boundary is reported as an error instead of producing wrong data.
+Single-member files, and members too large to hold in memory, are
+streamed by one decompressor.
+
+``.zst`` support needs the optional ``zstandard`` package.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import mmap
+import os
+import re
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+# Buffer between the decompressor and line reading
+READ_BUFFER_BYTES = 4 * 1024 * 1024
+# Members are grouped into tasks of about this many compressed bytes
+TASK_BYTES = 1024 * 1024
+# Files with a member above this size are not decompressed in parallel
+MAX_MEMBER_BYTES = 32 * 1024 * 1024
+# Compressed bytes decoded to confirm a member start found by magic bytes
+_PROBE_BYTES = 64 * 1024
+
+_ZSTD_MAGIC = 0xFD2FB528
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("Reading .zst input needs the 'zstandard' package (pip install zstandard)")
+    return zstandard
+
+
+class _Codec:
+    def __init__(self, name: str, opener, decompressor, member_pattern: bytes):
+        self.name = name
+        self.open = opener
+        self.decompressor = decompressor
+        self.member_re = re.compile(member_pattern, re.DOTALL)
+
+
+def _open_zstd(path: str):
+    return _zstd().ZstdDecompressor().stream_reader(
+        open(path, 'rb'), read_size=READ_BUFFER_BYTES, read_across_frames=True, closefd=True,
+    )
+
+
+CODECS = {
+    ".gz": _Codec("gzip", lambda path: gzip.open(path, 'rb'),
+                  lambda: zlib.decompressobj(wbits=31), rb"\x1f\x8b\x08"),
+    ".bz2": _Codec("bzip2", lambda path: bz2.open(path, 'rb'),
+                   bz2.BZ2Decompressor, rb"BZh[1-9]1AY&SY"),
+    ".xz": _Codec("xz", lambda path: lzma.open(path, 'rb'),
+                  lambda: lzma.LZMADecompressor(lzma.FORMAT_XZ), rb"\xfd7zXZ\x00"),
+    ".zst": _Codec("zstd", _open_zstd,
+                   lambda: _zstd().ZstdDecompressor().decompressobj(), rb"\x28\xb5\x2f\xfd"),
+}
+
+
+def compression_suffix(path: str) -> Optional[str]:
+    """Returns the compression suffix of ``path`` (e.g. ``.gz``), or None for plain files."""
+    suffix = os.path.splitext(path)[1].lower()
+    return suffix if suffix in CODECS else None
+
+
+def is_compressed(path: str) -> bool:
+    return compression_suffix(path) is not None
+
+
+def strip_compression_suffix(path: str) -> str:
+    """``app.log.gz`` -> ``app.log``; other paths are returned unchanged."""
+    return os.path.splitext(path)[0] if is_compressed(path) else path
+
+
+# --- member boundaries ---
+
+def _bgzf_members(mm) -> Optional[List[int]]:
+    """Exact member starts of a bgzip file (BSIZE in every header), or None."""
+    starts, pos, size = [], 0, len(mm)
+    while pos < size:
+        # ID1 ID2 CM FLG(FEXTRA) MTIME(4) XFL OS XLEN(2) 'B' 'C' SLEN(2)=2 BSIZE(2)
+        if mm[pos:pos + 4] != b"\x1f\x8b\x08\x04" or mm[pos + 12:pos + 14] != b"BC":
+            return None
+        starts.append(pos)
+        pos += struct.unpack_from("<H", mm, pos + 16)[0] + 1
+    return starts
+
+
+def _zstd_members(mm) -> Optional[List[int]]:
+    """Exact frame starts of a zstd file, walked through the frame and block headers."""
+    starts, pos, size = [], 0, len(mm)
+    while pos < size:
+        if pos + 4 > size:
+            return None
+        magic = struct.unpack_from("<I", mm, pos)[0]
+        if magic & 0xFFFFFFF0 == 0x184D2A50:
+            # Skippable frame: magic, 4-byte size, payload
+            pos += 8 + struct.unpack_from("<I", mm, pos + 4)[0]
+            continue
+        if magic != _ZSTD_MAGIC:
+            return None
+        starts.append(pos)
+        descriptor = mm[pos + 4]
+        single_segment = descriptor >> 5 & 1
+        content_size_bytes = (1 if single_segment else 0, 2, 4, 8)[descriptor >> 6]
+        pos += 5 + (0 if single_segment else 1) + (0, 1, 2, 4)[descriptor & 3] + content_size_bytes
+        while True:
+            if pos + 3 > size:
+                return None
+            header = int.from_bytes(mm[pos:pos + 3], "little")
+            block_type = header >> 1 & 3
+            if block_type == 3:
+                return None
+            pos += 3 + (1 if block_type == 1 else header >> 3)
+            if header & 1:
+                break
+        if descriptor >> 2 & 1:
+            pos += 4  # content checksum
+    return starts if pos == size else None
+
+
+def _member_starts(codec: _Codec, mm) -> Tuple[List[int], bool]:
+    """Returns (member start offsets, whether they are exact rather than magic-byte guesses)."""
+    if codec.name == "gzip":
+        starts = _bgzf_members(mm)
+        if starts is not None:
+            return starts, True
+    elif codec.name == "zstd":
+        starts = _zstd_members(mm)
+        if starts is not None:
+            return starts, True
+    return [m.start() for m in codec.member_re.finditer(mm)], False
+
+
+def _decodes(codec: _Codec, data) -> bool:
+    try:
+        codec.decompressor().decompress(bytes(data))
+    except Exception:
+        return False
+    return True
+
+
+def _tasks(codec: _Codec, mm) -> Optional[List[Tuple[int, int]]]:
+    """Groups members into (start, end) byte ranges of about TASK_BYTES, or None if unsuitable."""
+    starts, exact = _member_starts(codec, mm)
+    size = len(mm)
+    if len(starts) < 2 or starts[0] != 0:
+        return None
+    ends = starts[1:] + [size]
+    if max(end - start for start, end in zip(starts, ends)) > MAX_MEMBER_BYTES:
+        return None
+    tasks, task_start = [], 0
+    for end in ends:
+        if end == size or (end - task_start >= TASK_BYTES
+                           and (exact or _decodes(codec, mm[end:end + _PROBE_BYTES]))):
+            tasks.append((task_start, end))
+            task_start = end
+    return tasks
+
+
+def _decompress_members(codec: _Codec, data) -> bytes:
+    """Decompresses whole consecutive members; raises ValueError if the data ends mid-member."""
+    out = []
+    data = bytes(data)
+    while data:
+        decompressor = codec.decompressor()
+        out.append(decompressor.decompress(data))
+        if not decompressor.eof:
+            raise ValueError(f"Misaligned {codec.name} member boundary; set decompress_workers: 1")
+        data = decompressor.unused_data
+        if codec.name == "xz":
+            data = data.lstrip(b"\x00")  # stream padding
+    return b"".join(out)
+
+
+class _ParallelReader(io.RawIOBase):
+    """Raw stream over the members of a compressed file, decompressed by a thread pool in order."""
+
+    def __init__(self, codec: _Codec, mm, tasks: List[Tuple[int, int]], workers: int):
+        self._mm = mm
+        self._codec = codec
+        self._tasks = iter(tasks)
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="decompress")
+        self._pending = deque()
+        self._buffer = memoryview(b"")
+        for _ in range(workers * 2):
+            self._submit()
+
+    def _submit(self):
+        task = next(self._tasks, None)
+        if task is not None:
+            start, end = task
+            self._pending.append(self._executor.submit(_decompress_members, self._codec, self._mm[start:end]))
+
+    def readable(self):
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            if not self._pending:
+                return 0
+            self._buffer = memoryview(self._pending.popleft().result())
+            self._submit()
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._buffer = memoryview(b"")
+            self._mm.close()
+        super().close()
+
+
+def _parallel_reader(path: str, codec: _Codec, workers: int) -> Optional[_ParallelReader]:
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < 2 * TASK_BYTES:
+            return None
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    tasks = _tasks(codec, mm)
+    if not tasks or len(tasks) < 2:
+        mm.close()
+        return None
+    return _ParallelReader(codec, mm, tasks, workers)
+
+
+def open_log(path: str, workers: int = 1):
+    """
+    Opens a log for binary reading, decompressing it on the fly when its
+    suffix says it is compressed.
+
+    Args:
+        workers: Decompression threads for multi-member files (0 = one per
+            CPU, 1 = always one streaming decompressor).
+    """
+    codec = CODECS.get(compression_suffix(path))
+    if codec is None:
+        return open(path, 'rb', buffering=READ_BUFFER_BYTES)
+    workers = workers or os.cpu_count() or 1
+    if workers > 1:
+        reader = _parallel_reader(path, codec, workers)
+        if reader is not None:
+            return io.BufferedReader(reader, READ_BUFFER_BYTES)
+    return io.BufferedReader(codec.open(path), READ_BUFFER_BYTES)
+
+
+def open_log_text(path: str, workers: int = 1, errors: str = 'replace'):
+    """``open_log`` as a UTF-8 text stream."""
+    return io.TextIOWrapper(open_log(path, workers), encoding='utf-8', errors=errors)
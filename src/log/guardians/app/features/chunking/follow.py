@@ -0,0 +1,314 @@
+"""
+Follow (tail) mode for continuously growing logs.
+
+``LogFollower`` reads only the bytes appended since the last poll, feeds
+complete lines through the same entry/chunk rules as ``chunk_log_file`` and
+emits chunks as soon as they close. Progress is saved to a checkpoint (byte
+offset, file identity, the open chunk including any partial multi-line entry,
+chunks not yet analyzed, and the segment and index lengths) so a restart
+resumes where it stopped; chunks stored after the checkpoint are rolled back
+first. Rotation
+(the path now points at a new file) and truncation (the file shrank) are
+detected on every poll.
+"""
+
+import asyncio
+import json
+import os
+import re
+from typing import Awaitable, Callable, List, Optional
+
+from src.log.guardians.app.features.chunking.chunk_store import (
+    SEGMENT_FILE, chunk_path, read_index, remove_store, write_index,
+)
+from src.log.guardians.app.features.chunking.chunker import (
+    _ChunkSink, _decode_line, chunk_output_dir,
+)
+from src.log.guardians.app.features.chunking.compressed import is_compressed
+from src.log.guardians.app.features.correlation.entity_index import remove_entity_index
+from src.log.guardians.app.features.dedup.near_duplicates import remove_near_duplicates
+from src.log.guardians.app.features.storage.log_store import LogStore
+
+READ_BLOCK = 1024 * 1024
+
+
+class LogFollower:
+    """Incrementally chunks ``config['input_log_file']`` as it grows."""
+
+    def __init__(self, config, checkpoint_path: Optional[str] = None):
+        self.input_file = config['input_log_file']
+        if is_compressed(self.input_file):
+            raise ValueError(f"Follow mode can't tail compressed input {self.input_file}")
+        self.output_dir = chunk_output_dir(config)
+        self.max_entries = int(config.get('max_entries_per_chunk', 500))
+        profile = config['log_profiles'][config['active_profile']]
+        self.start_pattern = re.compile(profile['log_start_regex'])
+        # Byte ranges of a rotating file can't be referenced later, so copy them
+        self.store = 'segment' if config.get('chunk_store', 'files') == 'reference' else config.get('chunk_store', 'files')
+        self.checkpoint_path = checkpoint_path or os.path.join(
+            '.LogGuardians', 'checkpoints',
+            f"{config['active_profile']}_{os.path.basename(self.output_dir)}.json",
+        )
+
+        self.file_id = None      # (st_dev, st_ino) of the file being followed
+        self.offset = 0          # first byte not yet consumed
+        self.lineno = 0
+        self.next_chunk = 0
+        self.piece = None        # open chunk, same shape as the chunker's pieces
+        self.pending = []        # chunk paths emitted but not yet analyzed
+        self._fh = None
+        self._records = []
+
+        if not self._load_checkpoint():
+            os.makedirs(self.output_dir, exist_ok=True)
+            print("🧹 No checkpoint found, starting from the beginning of the file...")
+            for name in os.listdir(self.output_dir):
+                if name.startswith("chunk_") and name.endswith(".log"):
+                    os.remove(os.path.join(self.output_dir, name))
+            remove_store(self.output_dir)
+            remove_near_duplicates(self.output_dir)
+            log_store = LogStore.from_config(config)
+            if log_store is not None:
+                log_store.clear()
+                log_store.close()
+        # Not built while following; one left by a batch run describes other chunks
+        remove_entity_index(self.output_dir)
+
+    # --- checkpointing ---
+
+    def _load_checkpoint(self) -> bool:
+        if not os.path.exists(self.checkpoint_path):
+            return False
+        with open(self.checkpoint_path, 'r') as f:
+            state = json.load(f)
+        self.file_id = tuple(state['file_id']) if state.get('file_id') else None
+        self.offset = state['offset']
+        self.lineno = state['lineno']
+        self.next_chunk = state['next_chunk']
+        self.piece = state['piece']
+        self.pending = state['pending']
+        if self.store != 'files':
+            index = read_index(self.output_dir)
+            self._records = list(index[1]) if index else []
+        self._roll_back(state)
+        print(f"📍 Resuming {self.input_file} from byte {self.offset} (next chunk {self.next_chunk})")
+        return True
+
+    def _roll_back(self, state):
+        """
+        Drops chunks written after the checkpoint was saved (a crash between
+        writing them and checkpointing), since they are read again from the
+        checkpoint's offset and would otherwise be stored twice.
+        """
+        if self.store == 'files':
+            for name in os.listdir(self.output_dir):
+                if name.startswith("chunk_") and name.endswith(".log") and int(name[6:-4]) >= self.next_chunk:
+                    os.remove(os.path.join(self.output_dir, name))
+            return
+        if state.get('segment_bytes') is None:
+            return  # saved before the store's lengths were checkpointed
+        segment_path = os.path.join(self.output_dir, SEGMENT_FILE)
+        if os.path.exists(segment_path) and os.path.getsize(segment_path) > state['segment_bytes']:
+            os.truncate(segment_path, state['segment_bytes'])
+        if len(self._records) > state['index_records']:
+            del self._records[state['index_records']:]
+            write_index(self.output_dir, segment_path, self._records)
+
+    def save_checkpoint(self):
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        segment_path = os.path.join(self.output_dir, SEGMENT_FILE)
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'input_file': self.input_file, 'file_id': self.file_id,
+                'offset': self.offset, 'lineno': self.lineno,
+                'next_chunk': self.next_chunk, 'piece': self.piece,
+                'pending': self.pending,
+                # What the store held at this point; anything after it is rolled back on resume
+                'segment_bytes': os.path.getsize(segment_path) if os.path.exists(segment_path) else 0,
+                'index_records': len(self._records),
+            }, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    # --- reading ---
+
+    def _open(self):
+        """Opens the followed file, resetting the offset if it was rotated or truncated."""
+        try:
+            stat = os.stat(self.input_file)
+        except FileNotFoundError:
+            return None
+        file_id = (stat.st_dev, stat.st_ino)
+
+        if self._fh is not None and file_id != self.file_id:
+            # Rotated: drain what was appended to the old file, then switch
+            new_chunks = self._read_available(self._fh)
+            self._fh.close()
+            self._fh = None
+            print(f"🔄 {self.input_file} was rotated, following the new file")
+            self.pending.extend(new_chunks)
+            self._restart()
+        elif self._fh is None and self.file_id is not None and file_id != self.file_id:
+            print(f"🔄 {self.input_file} was rotated while stopped, following the new file")
+            self._restart()
+
+        if stat.st_size < self.offset:
+            print(f"✂️  {self.input_file} was truncated, reading from the start")
+            self._restart()
+
+        if self._fh is None:
+            self._fh = open(self.input_file, 'rb')
+        self.file_id = file_id
+        return self._fh
+
+    def _restart(self):
+        """
+        Reads from byte 0 again. The open chunk (with the old content's last,
+        possibly multi-line entry) is closed first, so none of the new
+        content's lines are appended to it.
+        """
+        self.flush()
+        self.offset = 0
+        self.lineno = 0
+
+    def _read_available(self, fh) -> List[str]:
+        """Consumes every complete line appended since ``offset``."""
+        new_chunks = []
+        sink = _ChunkSink(self.store, self.output_dir)
+        tail = b""
+        fh.seek(self.offset)
+        try:
+            while True:
+                block = fh.read(READ_BLOCK)
+                if not block:
+                    break
+                data = tail + block
+                cut = data.rfind(b"\n") + 1
+                if cut == 0:
+                    tail = data
+                    continue
+                tail = data[cut:]
+                base = self.offset
+                lines = data[:cut].split(b"\n")
+                lines.pop()  # empty remainder after the final newline
+                for raw in lines:
+                    raw += b"\n"
+                    new_chunks.extend(self._consume(raw, base, sink))
+                    base += len(raw)
+                self.offset = base
+        finally:
+            sink.close()
+        # An incomplete last line (no newline yet) is left for the next poll
+        self._save_records(sink)
+        return new_chunks
+
+    def _consume(self, raw: bytes, offset: int, sink) -> List[str]:
+        self.lineno += 1
+        line = _decode_line(raw)
+        emitted = []
+        if self.start_pattern.match(line):
+            if self.piece is not None and self.piece['entries'] >= self.max_entries:
+                emitted.append(self._emit(sink))
+            if self.piece is None:
+                self.piece = {
+                    'chunk_num': self.next_chunk, 'lines': [], 'first_entry': 0,
+                    'entries': 0, 'start': offset, 'end': offset,
+                    'first_line': self.lineno, 'last_line': self.lineno,
+                }
+            self.piece['entries'] += 1
+        elif self.piece is None:
+            return emitted
+        self.piece['lines'].append(line)
+        self.piece['end'] = offset + len(raw)
+        self.piece['last_line'] = self.lineno
+        return emitted
+
+    def _emit(self, sink) -> str:
+        sink.emit(self.piece)
+        path = chunk_path(self.output_dir, self.piece['chunk_num'])
+        self.next_chunk += 1
+        self.piece = None
+        return path
+
+    def _save_records(self, sink):
+        if self.store == 'files' or not sink.records:
+            return
+        self._records.extend(sink.records)
+        write_index(self.output_dir, os.path.join(self.output_dir, SEGMENT_FILE), self._records)
+
+    def poll(self) -> List[str]:
+        """Reads newly appended data and returns the paths of chunks that closed."""
+        fh = self._open()
+        if fh is None:
+            return []
+        new_chunks = self._read_available(fh)
+        self.pending.extend(new_chunks)
+        return new_chunks
+
+    def flush(self) -> List[str]:
+        """Closes the open chunk early (used when the log goes quiet)."""
+        if self.piece is None:
+            return []
+        sink = _ChunkSink(self.store, self.output_dir)
+        try:
+            path = self._emit(sink)
+        finally:
+            sink.close()
+        self._save_records(sink)
+        self.pending.append(path)
+        return [path]
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+async def follow_log_file(
+    config,
+    on_chunks: Callable[[List[str]], Awaitable[None]],
+    poll_interval: Optional[float] = None,
+    flush_after: Optional[float] = None,
+    stop_event: Optional[asyncio.Event] = None,
+):
+    """
+    Follows the configured input log and hands each batch of new chunks to
+    ``on_chunks``. Chunks are only removed from the checkpoint's pending list
+    once ``on_chunks`` returns, so a crash never loses a chunk.
+
+    Args:
+        poll_interval: Seconds between polls (``follow_poll_seconds``).
+        flush_after: Close a partially filled chunk once no chunk has closed
+            for this many seconds, so slow or quiet logs are still analyzed
+            promptly (``follow_flush_seconds``).
+        stop_event: Set it to stop following.
+    """
+    poll_interval = poll_interval if poll_interval is not None else float(config.get('follow_poll_seconds', 1.0))
+    flush_after = flush_after if flush_after is not None else float(config.get('follow_flush_seconds', 5.0))
+    follower = LogFollower(config)
+    idle = 0.0
+    print(f"👀 Following {follower.input_file} (poll every {poll_interval}s)")
+
+    try:
+        while stop_event is None or not stop_event.is_set():
+            new_chunks = await asyncio.to_thread(follower.poll)
+            if new_chunks:
+                idle = 0.0
+            else:
+                idle += poll_interval
+                if follower.piece is not None and idle >= flush_after:
+                    await asyncio.to_thread(follower.flush)
+                    idle = 0.0
+            follower.save_checkpoint()
+
+            if follower.pending:
+                batch = list(follower.pending)
+                print(f"📦 {len(batch)} new chunk(s) ready for analysis")
+                await on_chunks(batch)
+                follower.pending = follower.pending[len(batch):]
+                follower.save_checkpoint()
+
+            await asyncio.sleep(poll_interval)
+    finally:
+        follower.close()
+        follower.save_checkpoint()
@@ -0,0 +1,92 @@
+"""
+Per-profile entry timestamp parsing for time-window chunking.
+
+A profile opts in with ``timestamp_format``: a ``strptime`` format, or
+``epoch`` for Unix seconds. The timestamp text is the first group of
+``timestamp_regex``, or the ``timestamp`` group of ``parse_pattern`` when no
+``timestamp_regex`` is given.
+
+``strptime`` is slow, so parsed values are cached per whole second: a
+trailing fractional field (``,%f`` / ``.%f`` / ``:%f``) is split off and
+added back as a number, and entries logged within the same second hit the
+cache.
+"""
+
+import calendar
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+EPOCH_FORMAT = "epoch"
+_FRACTION_SEPARATORS = (",", ".", ":")
+# strptime defaults to 1900, which has no Feb 29; use a leap year instead
+_DEFAULT_YEAR = "2000"
+
+
+class TimestampParser:
+    """Returns an entry line's timestamp in seconds (naive times are read as UTC), or None."""
+
+    def __init__(self, timestamp_regex: str, timestamp_format: str):
+        self.pattern = re.compile(timestamp_regex)
+        self.timestamp_format = timestamp_format
+        self._fraction_sep = None
+        base_format = timestamp_format
+        if timestamp_format != EPOCH_FORMAT:
+            if timestamp_format[-3:-2] in _FRACTION_SEPARATORS and timestamp_format.endswith("%f"):
+                self._fraction_sep = timestamp_format[-3]
+                base_format = timestamp_format[:-3]
+            self._add_year = "%Y" not in base_format and "%y" not in base_format
+            if self._add_year:
+                base_format = "%Y " + base_format
+        self._base_format = base_format
+        self._parse_base = lru_cache(maxsize=65536)(self._parse_base_uncached)
+
+    @classmethod
+    def from_profile(cls, profile) -> Optional["TimestampParser"]:
+        """Builds the profile's parser, or returns None if it has no ``timestamp_format``."""
+        timestamp_format = profile.get('timestamp_format')
+        if not timestamp_format:
+            return None
+        timestamp_regex = profile.get('timestamp_regex')
+        if not timestamp_regex:
+            parse_pattern = profile.get('parse_pattern') or ""
+            if "(?P<timestamp>" not in parse_pattern:
+                raise ValueError("timestamp_format needs a timestamp_regex or a parse_pattern with a timestamp group")
+            timestamp_regex = parse_pattern
+        return cls(timestamp_regex, timestamp_format)
+
+    def _parse_base_uncached(self, text: str) -> Optional[float]:
+        try:
+            if self.timestamp_format == EPOCH_FORMAT:
+                return float(text)
+            if self._add_year:
+                text = f"{_DEFAULT_YEAR} {text}"
+            return float(calendar.timegm(datetime.strptime(text, self._base_format).timetuple()))
+        except ValueError:
+            return None
+
+    def parse_text(self, text: str) -> Optional[float]:
+        """Parses an already extracted timestamp string."""
+        text = text.strip()
+        if self._fraction_sep is None:
+            return self._parse_base(text)
+        base, sep, fraction = text.rpartition(self._fraction_sep)
+        if not sep or not fraction.isdigit():
+            return None
+        seconds = self._parse_base(base)
+        if seconds is None:
+            return None
+        return seconds + int(fraction) / 10 ** len(fraction)
+
+    def __call__(self, line: str) -> Optional[float]:
+        match = self.pattern.match(line)
+        if not match:
+            return None
+        if "timestamp" in self.pattern.groupindex:
+            text = match.group("timestamp")
+        elif self.pattern.groups:
+            text = match.group(1)
+        else:
+            text = match.group(0)
+        return self.parse_text(text) if text else None
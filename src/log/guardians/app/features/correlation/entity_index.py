@@ -0,0 +1,445 @@
+"""
+Entity inverted index for cross-chunk correlation.
+
+While chunking, every line is scanned for entities: IPs, hosts/nodes (the
+profile's ``host``/``node`` group and ``node-N``/``rhost=`` mentions; an
+IP after ``rhost=`` counts as an IP), users, PIDs and request ids (UUIDs,
+Hadoop job/attempt/container ids, HDFS blocks). Each occurrence becomes a posting (chunk id, line number, entry
+timestamp, failure flag), so questions that span chunks are answered
+locally instead of by one huge prompt.
+
+On disk, in ``<chunk dir>/entity_index/``:
+
+* ``lexicon.json``: one entry per entity with its postings range and
+  pre-computed stats (occurrences, failure lines, chunks, first and last
+  time, hosts it appeared with).
+* ``postings.npy``: postings grouped by entity, a numpy structured array
+  opened with ``mmap_mode='r'``.
+* ``chunk_offsets.npy`` / ``chunk_terms.npy``: entity ids per chunk (CSR),
+  for "what else is known about the entities of this chunk".
+
+Lookups such as "all chunks touching 10.0.0.5" or "nodes with more than N
+failures" read the lexicon and one slice of postings, so they take
+milliseconds. ``correlations()`` and ``chunk_hints()`` turn the index into
+short text the report and detector stages add to their prompts.
+
+Query from the project root:
+    python -m src.log.guardians.app.features.correlation.entity_index --chunks 10.0.0.5
+        [--failures host 5] [--correlations]
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.log.guardians.app.features.chunking.chunk_store import chunk_path, read_chunk_view
+from src.log.guardians.app.features.chunking.timestamps import TimestampParser
+
+INDEX_DIR = "entity_index"
+ENTITY_TYPES = ("ip", "host", "user", "pid", "request")
+# Profile parse_pattern groups that name the entity type of their value
+_FIELD_TYPES = {"host": "host", "node": "host", "pid": "pid", "user": "user"}
+
+# (group, entity type, literal that must be in the chunk for the pattern to be tried)
+_ENTITY_PATTERNS = [
+    (kind, re.compile(pattern), gate) for kind, pattern, gate in (
+        ("ip", rb"\b\d{1,3}(?:\.\d{1,3}){3}\b", None),
+        ("host", rb"\bnode-\d+\b", b"node-"),
+        ("host", rb"\br?host=([A-Za-z0-9][\w.-]*)", b"host="),
+        ("user", rb"\b(?i:user)[= ]+['\"]?([A-Za-z_][\w.-]*)", None),
+        ("pid", rb"\bpid[=: ](\d+)", b"pid"),
+        ("request", rb"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", b"-"),
+        ("request", rb"\b(?:job|task|attempt|application|appattempt|container)_\w+\b", b"_"),
+        ("request", rb"\bblk_-?\d+\b", b"blk_"),
+    )
+]
+_IP_RE = re.compile(r"\d{1,3}(?:\.\d{1,3}){3}")
+# Matched against the lower-cased chunk (much faster than re.IGNORECASE)
+FAILURE_RE = re.compile(
+    rb"fail|error|exception|fatal|denied|refused|unavailable|invalid|timed? ?out|panic|critical"
+)
+_POSTING = np.dtype([("chunk", "<u4"), ("line", "<u8"), ("time", "<f8"), ("failure", "u1")])
+# Posting keys pack (entity id, line number) into 64 bits
+_LINE_BITS = 40
+_TOP_HOSTS = 5
+# Smaller runs of chunks are not worth a worker process
+_MIN_CHUNKS_PER_WORKER = 64
+_VERSION = 1
+
+
+def index_dir(output_dir: str) -> str:
+    return os.path.join(output_dir, INDEX_DIR)
+
+
+def remove_entity_index(output_dir: str):
+    shutil.rmtree(index_dir(output_dir), ignore_errors=True)
+
+
+class EntityIndexBuilder:
+    """
+    Collects postings chunk by chunk and writes the index.
+
+    Chunks are scanned as whole byte strings (one regex pass each for
+    entries, entities and failure words); match offsets are mapped to line
+    numbers with numpy, so the cost is per match rather than per line.
+    """
+
+    def __init__(self, profile: Dict[str, Any]):
+        self.start_re = re.compile(profile['log_start_regex'].encode(), re.MULTILINE)
+        parse_pattern = profile.get('parse_pattern')
+        self.parse_re = re.compile(parse_pattern.encode(), re.MULTILINE) if parse_pattern else None
+        groups = self.parse_re.groupindex if self.parse_re else {}
+        self.fields = [(name, _FIELD_TYPES[name]) for name in groups if name in _FIELD_TYPES]
+        self.has_timestamp = "timestamp" in groups
+        try:
+            self.parser = TimestampParser.from_profile(profile)
+        except (ValueError, re.error):
+            self.parser = None
+        self.term_ids: Dict[tuple, int] = {}
+        self.kinds = array("B")  # ENTITY_TYPES index per entity id
+        # Postings as parallel arrays; the host of each posting's entry (-1 if none)
+        self._term = array("I")
+        self._chunk = array("I")
+        self._line = array("Q")
+        self._time = array("d")
+        self._failure = array("B")
+        self._host = array("i")
+
+    def _term_id(self, kind: str, value: str) -> int:
+        key = (kind, value)
+        term = self.term_ids.get(key)
+        if term is None:
+            term = self.term_ids[key] = len(self.term_ids)
+            self.kinds.append(ENTITY_TYPES.index(kind))
+        return term
+
+    def _timestamp(self, text: Optional[bytes]) -> float:
+        if text is None or self.parser is None:
+            return math.nan
+        parsed = self.parser.parse_text(text.decode("ascii", errors="replace"))
+        return parsed if parsed is not None else math.nan
+
+    def _entries(self, data: bytes, terms: List[int], positions: List[int]):
+        """Entry start offsets, timestamps and host ids; field entities go to terms/positions."""
+        starts, times, hosts = [], [], []
+        term_id = self._term_id
+        if self.parse_re is None:
+            for match in self.start_re.finditer(data):
+                end = data.find(b"\n", match.start())
+                line = data[match.start():end if end >= 0 else len(data)]
+                starts.append(match.start())
+                parsed = self.parser(line.decode("utf-8", errors="replace")) if self.parser else None
+                times.append(parsed if parsed is not None else math.nan)
+                hosts.append(-1)
+            return starts, times, hosts
+
+        for match in self.parse_re.finditer(data):
+            position = match.start()
+            starts.append(position)
+            times.append(self._timestamp(match.group("timestamp")) if self.has_timestamp else math.nan)
+            host = -1
+            for name, kind in self.fields:
+                value = match.group(name)
+                if value:
+                    term = term_id(kind, value.decode("utf-8", errors="replace"))
+                    terms.append(term)
+                    positions.append(position)
+                    if kind == "host":
+                        host = term
+            hosts.append(host)
+        return starts, times, hosts
+
+    def add_chunk(self, chunk_id: int, data: bytes, first_line: int):
+        newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 10)
+        terms, positions = [], []
+        entry_starts, entry_times, entry_hosts = self._entries(data, terms, positions)
+
+        term_id = self._term_id
+        for kind, pattern, gate in _ENTITY_PATTERNS:
+            if gate is not None and gate not in data:
+                continue
+            for match in pattern.finditer(data):
+                value = match.group(match.lastindex or 0).decode("utf-8", errors="replace")
+                if kind == "host" and _IP_RE.fullmatch(value):
+                    terms.append(term_id("ip", value))
+                else:
+                    terms.append(term_id(kind, value))
+                positions.append(match.start())
+        if not terms:
+            return
+
+        # Line (0-based within the chunk) of every match, failure word and entry
+        lines = np.searchsorted(newlines, np.asarray(positions, dtype=np.int64))
+        failing = np.zeros(len(newlines) + 1, dtype=np.uint8)
+        failing[np.searchsorted(newlines, [m.start() for m in FAILURE_RE.finditer(data.lower())])] = 1
+        entry_lines = np.searchsorted(newlines, np.asarray(entry_starts, dtype=np.int64))
+        entry = np.searchsorted(entry_lines, lines, side="right") - 1
+        has_entry = entry >= 0
+        entry = np.maximum(entry, 0)
+        times = np.where(has_entry, np.asarray(entry_times + [math.nan], dtype=np.float64)[entry], math.nan)
+        hosts = np.where(has_entry, np.asarray(entry_hosts + [-1], dtype=np.int32)[entry], -1)
+
+        self._term.frombytes(np.asarray(terms, dtype=np.uint32).tobytes())
+        self._chunk.frombytes(np.full(len(terms), chunk_id, dtype=np.uint32).tobytes())
+        self._line.frombytes((lines + first_line).astype(np.uint64).tobytes())
+        self._time.frombytes(times.astype(np.float64).tobytes())
+        self._failure.frombytes(failing[lines].tobytes())
+        self._host.frombytes(hosts.astype(np.int32).tobytes())
+
+    def partial(self) -> Dict[str, Any]:
+        """Picklable postings and entity keys, for ``merge`` in another process."""
+        keys = [None] * len(self.term_ids)
+        for key, term in self.term_ids.items():
+            keys[term] = key
+        arrays = {name: getattr(self, name) for name in ("_term", "_chunk", "_line", "_time", "_failure", "_host")}
+        return {"keys": keys, **arrays}
+
+    def merge(self, partial: Dict[str, Any]):
+        """Appends postings from ``partial()`` of another builder, renumbering its entities."""
+        remap = np.array([self._term_id(*key) for key in partial["keys"]], dtype=np.uint32)
+        terms = np.frombuffer(partial["_term"], dtype=np.uint32)
+        self._term.frombytes(remap[terms].tobytes())
+        hosts = np.frombuffer(partial["_host"], dtype=np.int32)
+        mapped_hosts = np.where(hosts >= 0, remap[np.maximum(hosts, 0)].astype(np.int64), -1)
+        self._host.frombytes(mapped_hosts.astype(np.int32).tobytes())
+        for name in ("_chunk", "_line", "_time", "_failure"):
+            getattr(self, name).extend(partial[name])
+
+    def write(self, output_dir: str) -> str:
+        path = index_dir(output_dir)
+        remove_entity_index(output_dir)
+        os.makedirs(path)
+
+        terms = np.frombuffer(self._term, dtype=np.uint32).astype(np.uint64)
+        lines = np.frombuffer(self._line, dtype=np.uint64)
+        # Sorted by (entity, line); an entity mentioned twice on a line is one posting
+        keys, first = np.unique((terms << np.uint64(_LINE_BITS)) | lines, return_index=True)
+        postings = np.empty(len(keys), dtype=_POSTING)
+        postings["chunk"] = np.frombuffer(self._chunk, dtype=np.uint32)[first]
+        postings["line"] = lines[first]
+        postings["time"] = np.frombuffer(self._time, dtype=np.float64)[first]
+        postings["failure"] = np.frombuffer(self._failure, dtype=np.uint8)[first]
+        np.save(os.path.join(path, "postings.npy"), postings)
+
+        num_terms = len(self.term_ids)
+        sorted_terms = keys >> np.uint64(_LINE_BITS)
+        starts = np.searchsorted(sorted_terms, np.arange(num_terms + 1, dtype=np.uint64))
+        # Every entity has at least one posting, so no reduceat group is empty
+        failures = np.add.reduceat(postings["failure"].astype(np.int64), starts[:-1]) if num_terms else []
+        first_times = np.fmin.reduceat(postings["time"], starts[:-1]) if num_terms else []
+        last_times = np.fmax.reduceat(postings["time"], starts[:-1]) if num_terms else []
+        term_chunks = np.unique((sorted_terms << np.uint64(32)) | postings["chunk"].astype(np.uint64))
+        chunks_per_term = np.bincount((term_chunks >> np.uint64(32)).astype(np.int64), minlength=num_terms)
+
+        # Hosts each non-host entity appeared with
+        host_ids = np.frombuffer(self._host, dtype=np.int32)
+        kinds = np.frombuffer(self.kinds, dtype=np.uint8)
+        host_kind = ENTITY_TYPES.index("host")
+        paired = (host_ids >= 0) & (kinds[terms.astype(np.int64)] != host_kind)
+        pairs, pair_counts = np.unique(
+            (terms[paired] << np.uint64(32)) | host_ids[paired].astype(np.uint64), return_counts=True
+        )
+        hosts_of: Dict[int, List[tuple]] = {}
+        for pair, count in zip(pairs.tolist(), pair_counts.tolist()):
+            hosts_of.setdefault(pair >> 32, []).append((count, pair & 0xFFFFFFFF))
+        values = [None] * num_terms
+        for key, term in self.term_ids.items():
+            values[term] = key
+
+        lexicon = []
+        for term, (kind, value) in enumerate(values):
+            first_time, last_time = float(first_times[term]), float(last_times[term])
+            hosts = sorted(hosts_of.get(term, []), key=lambda item: (-item[0], values[item[1]][1]))
+            lexicon.append({
+                "type": kind, "value": value,
+                "start": int(starts[term]), "count": int(starts[term + 1] - starts[term]),
+                "failures": int(failures[term]), "chunks": int(chunks_per_term[term]),
+                "first_time": None if math.isnan(first_time) else first_time,
+                "last_time": None if math.isnan(last_time) else last_time,
+                "hosts": len(hosts), "top_hosts": [values[h][1] for _, h in hosts[:_TOP_HOSTS]],
+            })
+
+        # Entity ids per chunk
+        by_chunk = np.unique((postings["chunk"].astype(np.uint64) << np.uint64(32)) | sorted_terms)
+        chunk_ids = by_chunk >> np.uint64(32)
+        num_chunks = int(chunk_ids.max()) + 1 if len(chunk_ids) else 0
+        chunk_offsets = np.searchsorted(chunk_ids, np.arange(num_chunks + 1, dtype=np.uint64)).astype(np.uint64)
+        np.save(os.path.join(path, "chunk_offsets.npy"), chunk_offsets)
+        np.save(os.path.join(path, "chunk_terms.npy"), (by_chunk & np.uint64(0xFFFFFFFF)).astype(np.uint32))
+
+        with open(os.path.join(path, "lexicon.json"), 'w') as f:
+            f.write(json.dumps({"version": _VERSION, "entities": lexicon}, separators=(",", ":")))
+        return path
+
+
+def _index_records(args) -> EntityIndexBuilder:
+    output_dir, records, profile = args
+    builder = EntityIndexBuilder(profile)
+    for record in records:
+        path = chunk_path(output_dir, record.chunk_id)
+        view = read_chunk_view(path)
+        if view is not None:
+            data = bytes(view)
+        else:
+            with open(path, 'rb') as f:
+                data = f.read()
+        builder.add_chunk(record.chunk_id, data, record.first_line)
+    return builder
+
+
+def _index_partial(args) -> Dict[str, Any]:
+    return _index_records(args).partial()
+
+
+def build_entity_index(output_dir: str, records, profile: Dict[str, Any], workers: int = 1) -> Optional[str]:
+    """
+    Indexes every chunk of ``records`` (as written by ``chunk_log_file``).
+
+    With ``workers`` > 1 contiguous runs of chunks are scanned by a process
+    pool and the partial indexes merged.
+    """
+    records = list(records)
+    workers = max(1, min(workers, len(records) // _MIN_CHUNKS_PER_WORKER))
+    if workers == 1:
+        return _index_records((output_dir, records, profile)).write(output_dir)
+
+    step = -(-len(records) // workers)
+    parts = [(output_dir, records[i:i + step], profile) for i in range(0, len(records), step)]
+    # The first run is indexed here while the pool works on the others
+    with ProcessPoolExecutor(max_workers=len(parts) - 1) as pool:
+        partials = pool.map(_index_partial, parts[1:])
+        builder = _index_records(parts[0])
+        for partial in partials:
+            builder.merge(partial)
+    return builder.write(output_dir)
+
+
+class EntityIndex:
+    """Read side of the index written by ``EntityIndexBuilder``."""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "lexicon.json"), 'r') as f:
+            lexicon = json.load(f)
+        if lexicon.get("version") != _VERSION:
+            raise ValueError(f"Unsupported entity index version in {path}")
+        self.entities: List[Dict[str, Any]] = lexicon["entities"]
+        self.lookup = {(e["type"], e["value"]): i for i, e in enumerate(self.entities)}
+        self.postings = np.load(os.path.join(path, "postings.npy"), mmap_mode="r")
+        self.chunk_offsets = np.load(os.path.join(path, "chunk_offsets.npy"), mmap_mode="r")
+        self.chunk_terms = np.load(os.path.join(path, "chunk_terms.npy"), mmap_mode="r")
+
+    @classmethod
+    def open(cls, output_dir: str) -> Optional["EntityIndex"]:
+        """Opens the index of a chunk directory, or returns None if it has none."""
+        path = index_dir(output_dir)
+        if not os.path.exists(os.path.join(path, "lexicon.json")):
+            return None
+        return cls(path)
+
+    def find(self, value: str, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Lexicon entries for ``value`` (of any type unless ``kind`` is given)."""
+        kinds = [kind] if kind else ENTITY_TYPES
+        return [self.entities[self.lookup[(k, value)]] for k in kinds if (k, value) in self.lookup]
+
+    def occurrences(self, value: str, kind: Optional[str] = None) -> np.ndarray:
+        """Postings (chunk, line, time, failure) of an entity, in chunk order."""
+        parts = [self.postings[e["start"]:e["start"] + e["count"]] for e in self.find(value, kind)]
+        if not parts:
+            return np.empty(0, dtype=_POSTING)
+        return np.concatenate(parts) if len(parts) > 1 else np.asarray(parts[0])
+
+    def chunks_with(self, value: str, kind: Optional[str] = None) -> List[int]:
+        """Ids of the chunks that mention an entity."""
+        return np.unique(self.occurrences(value, kind)["chunk"]).tolist()
+
+    def with_failures(self, kind: str, min_failures: int) -> List[Dict[str, Any]]:
+        """Entities of one type seen on more than ``min_failures`` failure lines."""
+        found = [e for e in self.entities if e["type"] == kind and e["failures"] > min_failures]
+        return sorted(found, key=lambda e: -e["failures"])
+
+    def chunk_entities(self, chunk_id: int) -> List[Dict[str, Any]]:
+        if chunk_id + 1 >= len(self.chunk_offsets):
+            return []
+        start, end = int(self.chunk_offsets[chunk_id]), int(self.chunk_offsets[chunk_id + 1])
+        return [self.entities[int(term)] for term in self.chunk_terms[start:end]]
+
+    # --- prompt context ---
+
+    @staticmethod
+    def describe(entity: Dict[str, Any]) -> str:
+        text = (f"{entity['type']} {entity['value']}: {entity['count']} lines in {entity['chunks']} chunks, "
+                f"{entity['failures']} failure lines")
+        if entity["hosts"] > 1:
+            text += f", on {entity['hosts']} hosts ({', '.join(entity['top_hosts'])})"
+        if entity["first_time"] is not None:
+            first = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(entity["first_time"]))
+            last = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(entity["last_time"]))
+            text += f", {first} to {last}"
+        return text
+
+    def chunk_hints(self, chunk_id: int, limit: int = 8) -> List[str]:
+        """What the rest of the log says about the entities of one chunk."""
+        entities = [e for e in self.chunk_entities(chunk_id) if e["chunks"] > 1 and e["type"] != "pid"]
+        entities.sort(key=lambda e: (-e["failures"], -e["chunks"], e["value"]))
+        return [self.describe(e) for e in entities[:limit]]
+
+    def correlations(self, limit: int = 20) -> List[str]:
+        """
+        Cross-chunk findings for the report: entities seen on several hosts,
+        and the entities with the most failure lines across chunks.
+        """
+        spread = [e for e in self.entities if e["hosts"] > 1 and e["type"] in ("ip", "user", "request")]
+        spread.sort(key=lambda e: (-e["hosts"], -e["failures"], e["value"]))
+        failing = [e for e in self.entities if e["failures"] > 0 and e["chunks"] > 1 and e["type"] != "pid"]
+        failing.sort(key=lambda e: (-e["failures"], -e["chunks"], e["value"]))
+        chosen, seen = [], set()
+        for entity in spread[:limit // 2] + failing:
+            key = (entity["type"], entity["value"])
+            if key not in seen:
+                seen.add(key)
+                chosen.append(entity)
+            if len(chosen) >= limit:
+                break
+        return [self.describe(e) for e in chosen]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the entity index of a chunk directory.")
+    parser.add_argument("--dir", help="chunk directory (default: the configured input's)")
+    parser.add_argument("--chunks", metavar="VALUE", help="list the chunks mentioning an entity")
+    parser.add_argument("--failures", nargs=2, metavar=("TYPE", "N"), help="entities of TYPE with more than N failure lines")
+    parser.add_argument("--correlations", action="store_true", help="print the report's cross-chunk correlations")
+    args = parser.parse_args(argv)
+
+    output_dir = args.dir
+    if output_dir is None:
+        from src.log.guardians.app.features.chunking.chunker import chunk_output_dir, load_config
+        output_dir = chunk_output_dir(load_config("src/log/guardians/app/main/config/chunker_config.yaml"))
+    started = time.perf_counter()
+    index = EntityIndex.open(output_dir)
+    if index is None:
+        print(f"❌ No entity index in {output_dir}; chunk with entity_index_enabled: true")
+        raise SystemExit(1)
+    if args.chunks:
+        for entity in index.find(args.chunks):
+            print(EntityIndex.describe(entity))
+        print(f"Chunks: {index.chunks_with(args.chunks)}")
+    if args.failures:
+        for entity in index.with_failures(args.failures[0], int(args.failures[1])):
+            print(EntityIndex.describe(entity))
+    if args.correlations:
+        print("\n".join(index.correlations()))
+    print(f"⏱️  {1000 * (time.perf_counter() - started):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Near-duplicate chunk suppression with MinHash signatures.
+
+Many chunks repeat the same heartbeat or state-change lines with only
+timestamps and counters changed, yet each would cost a full LLM conversion
+and anomaly pass. After chunking, every chunk is reduced to the set of its
+normalized lines (IPs, hex ids, month/day names and digit runs masked) and
+sketched with MinHash. An LSH index over bands of the signature finds
+earlier chunks that may be similar. A chunk joins the cluster of the first
+earlier representative whose estimated Jaccard similarity reaches
+``dedup_threshold``. With ``dedup_require_containment`` it must also hold no
+normalized line the representative lacks, so a chunk with one new error line
+is never hidden behind a clean one.
+
+The clusters are written to ``<chunk dir>/near_duplicates.json``. The LLM
+converter and the anomaly detector then send only representatives to the
+model. The detector records the cluster size on each representative's report
+and gives members a report that only refers to it, so the report stage counts
+each cluster's anomalies once. Clusters are built by ``chunk_log_file``, so the
+streaming and follow pipelines analyze every chunk.
+"""
+
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.log.guardians.app.features.chunking.chunk_store import chunk_path, read_chunk_view
+
+CLUSTERS_FILE = "near_duplicates.json"
+_MASKS = (
+    (re.compile(rb"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"), b"<ip>"),
+    (re.compile(rb"\b0x[0-9a-fA-F]+\b|\b(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{8,}\b"), b"<hex>"),
+    (re.compile(rb"\b(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun|Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\b"), b"<t>"),
+    (re.compile(rb"\d+"), b"0"),
+)
+# Universal hashing modulo a Mersenne prime keeps every product inside 64 bits
+_PRIME = (1 << 31) - 1
+_CHUNK_ID = re.compile(r"chunk_(\d+)")
+_VERSION = 1
+
+
+def normalize_line(line: bytes) -> bytes:
+    for pattern, mask in _MASKS:
+        line = pattern.sub(mask, line)
+    return line.strip()
+
+
+def shingles(data: bytes) -> np.ndarray:
+    """Sorted 31-bit hashes of a chunk's distinct normalized lines."""
+    lines = {normalize_line(line) for line in data.splitlines()}
+    lines.discard(b"")
+    hashes = [int.from_bytes(hashlib.blake2b(line, digest_size=4).digest(), "little") % _PRIME for line in lines]
+    return np.unique(np.array(hashes, dtype=np.uint64))
+
+
+class MinHasher:
+    """``num_perm`` hash functions ``(a * x + b) mod p``, fixed by ``seed``."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        if not len(hashes):
+            return np.full(len(self.a), _PRIME, dtype=np.uint64)
+        return ((hashes[:, None] * self.a + self.b) % _PRIME).min(axis=0)
+
+
+class NearDuplicateIndex:
+    """
+    Clusters chunks online, in chunk order: each chunk either joins the
+    cluster of an earlier representative or becomes a representative.
+
+    Args:
+        threshold: Estimated Jaccard similarity needed to join a cluster.
+        num_perm: MinHash signature length.
+        bands: LSH bands; ``num_perm`` must divide into them evenly.
+        require_containment: Members may not hold normalized lines their
+            representative lacks.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, bands: int = 8, require_containment: bool = True):
+        if bands < 1 or num_perm % bands:
+            raise ValueError(f"dedup_num_perm ({num_perm}) must be a multiple of dedup_bands ({bands})")
+        self.threshold = threshold
+        self.require_containment = require_containment
+        self.hasher = MinHasher(num_perm)
+        self.rows = num_perm // bands
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[int, np.ndarray] = {}
+        self._shingles: Dict[int, np.ndarray] = {}
+        self.representative_of: Dict[int, int] = {}
+
+    @classmethod
+    def from_config(cls, config) -> "NearDuplicateIndex":
+        return cls(
+            float(config.get('dedup_threshold', 0.9)),
+            int(config.get('dedup_num_perm', 64)),
+            int(config.get('dedup_bands', 8)),
+            bool(config.get('dedup_require_containment', True)),
+        )
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(len(self._buckets))]
+
+    def add(self, chunk_id: int, data: bytes) -> int:
+        """Adds a chunk and returns its representative (itself if it starts a cluster)."""
+        hashes = shingles(data)
+        signature = self.hasher.signature(hashes)
+        keys = self._band_keys(signature)
+        candidates = sorted({rep for bucket, key in zip(self._buckets, keys) for rep in bucket.get(key, ())})
+        for rep in candidates:
+            if float(np.mean(self._signatures[rep] == signature)) < self.threshold:
+                continue
+            if self.require_containment and not np.isin(hashes, self._shingles[rep], assume_unique=True).all():
+                continue
+            self.representative_of[chunk_id] = rep
+            return rep
+
+        self.representative_of[chunk_id] = chunk_id
+        self._signatures[chunk_id] = signature
+        if self.require_containment:
+            self._shingles[chunk_id] = hashes
+        for bucket, key in zip(self._buckets, keys):
+            bucket.setdefault(key, []).append(chunk_id)
+        return chunk_id
+
+    def write(self, output_dir: str) -> str:
+        clusters: Dict[int, List[int]] = {}
+        for chunk_id, rep in sorted(self.representative_of.items()):
+            if chunk_id != rep:
+                clusters.setdefault(rep, []).append(chunk_id)
+        path = os.path.join(output_dir, CLUSTERS_FILE)
+        with open(path, 'w') as f:
+            json.dump({
+                "version": _VERSION,
+                "threshold": self.threshold,
+                "chunks": len(self.representative_of),
+                "clusters": {str(rep): members for rep, members in clusters.items()},
+            }, f)
+        return path
+
+
+def remove_near_duplicates(output_dir: str):
+    path = os.path.join(output_dir, CLUSTERS_FILE)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def build_near_duplicates(output_dir: str, records, config) -> Tuple[str, int, int]:
+    """
+    Clusters every chunk of ``records`` (as written by ``chunk_log_file``).
+    Returns the clusters path, the number of representatives and of chunks.
+    """
+    index = NearDuplicateIndex.from_config(config)
+    count = 0
+    for record in records:
+        path = chunk_path(output_dir, record.chunk_id)
+        view = read_chunk_view(path)
+        if view is not None:
+            data = bytes(view)
+        else:
+            with open(path, 'rb') as f:
+                data = f.read()
+        index.add(record.chunk_id, data)
+        count += 1
+    representatives = sum(1 for chunk_id, rep in index.representative_of.items() if chunk_id == rep)
+    return index.write(output_dir), representatives, count
+
+
+def chunk_id_of(path: str) -> Optional[int]:
+    match = _CHUNK_ID.search(os.path.basename(path))
+    return int(match.group(1)) if match else None
+
+
+class NearDuplicates:
+    """Read side of the clusters written by ``NearDuplicateIndex``."""
+
+    def __init__(self, clusters: Dict[str, Any]):
+        self.clusters = {int(rep): members for rep, members in clusters["clusters"].items()}
+        self.representative_of = {member: rep for rep, members in self.clusters.items() for member in members}
+
+    @classmethod
+    def open(cls, output_dir: str) -> Optional["NearDuplicates"]:
+        """The clusters of the last chunking run, or None if it built none."""
+        path = os.path.join(output_dir, CLUSTERS_FILE)
+        try:
+            with open(path, 'r') as f:
+                clusters = json.load(f)
+        except FileNotFoundError:
+            return None
+        if clusters.get("version") != _VERSION:
+            print(f"⚠️  Ignoring near-duplicate clusters version {clusters.get('version')} in {path}.")
+            return None
+        return cls(clusters)
+
+    def members(self, chunk_id: int) -> List[int]:
+        return self.clusters.get(chunk_id, [])
+
+    def split(self, paths: List[str]) -> Tuple[List[str], Dict[str, List[int]]]:
+        """
+        Splits chunk or JSON paths into the ones to analyze and, per
+        representative among them, the member chunk ids that take its
+        verdict. A member is analyzed itself when its representative is not
+        among ``paths``.
+        """
+        present = {chunk_id_of(path) for path in paths}
+        kept, members = [], {}
+        for path in paths:
+            chunk_id = chunk_id_of(path)
+            if self.representative_of.get(chunk_id) in present:
+                continue
+            kept.append(path)
+            if self.clusters.get(chunk_id):
+                members[path] = self.clusters[chunk_id]
+        return kept, members
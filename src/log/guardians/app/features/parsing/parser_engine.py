@@ -0,0 +1,89 @@
+"""
+Deterministic log parser engine.
+
+Converts a chunk of raw log text into the same list of records the LLM
+converter produces, using a profile's named-group ``parse_pattern``. Group
+names become the record keys (in pattern order), continuation lines are
+appended to the ``message`` field, and entries whose first line does not match
+the pattern are reported back so only those need the LLM.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# The LLM converter is instructed to keep the raw text in this field
+MESSAGE_KEY = "message"
+
+
+def compile_parse_pattern(parse_pattern: str) -> re.Pattern:
+    """Compiles a parse pattern and checks it has at least one named group."""
+    compiled = re.compile(parse_pattern)
+    if not compiled.groupindex:
+        raise ValueError("parse_pattern must contain at least one named group (?P<name>...)")
+    return compiled
+
+
+def schema_keys(parse_re: re.Pattern) -> List[str]:
+    """Returns the record keys of a compiled pattern in group order."""
+    return sorted(parse_re.groupindex, key=parse_re.groupindex.get)
+
+
+def split_entries(text: str, start_re: re.Pattern) -> List[List[str]]:
+    """
+    Groups the lines of a chunk into log entries.
+
+    Each entry is a list of lines (without line endings); the first line
+    matches ``start_re`` and the rest are continuation lines.
+    """
+    entries = []
+    for line in text.splitlines():
+        if start_re.match(line) or not entries:
+            entries.append([line])
+        else:
+            entries[-1].append(line)
+    return entries
+
+
+def parse_entries(
+    entries: List[List[str]], parse_re: re.Pattern
+) -> Tuple[List[Optional[Dict[str, Any]]], List[Tuple[int, str]]]:
+    """
+    Parses entries with ``parse_re``.
+
+    Returns:
+        (records, unmatched). ``records`` has one slot per entry, None where
+        the entry did not match; ``unmatched`` lists (position, raw entry text)
+        for those slots.
+    """
+    keys = schema_keys(parse_re)
+    tail_key = MESSAGE_KEY if MESSAGE_KEY in keys else keys[-1]
+    match = parse_re.match
+
+    records = []
+    unmatched = []
+    for entry in entries:
+        m = match(entry[0])
+        if m is None:
+            unmatched.append((len(records), "\n".join(entry)))
+            records.append(None)
+            continue
+        record = m.groupdict()
+        if len(entry) > 1:
+            record[tail_key] = "\n".join([record[tail_key] or ""] + entry[1:])
+        records.append(record)
+    return records, unmatched
+
+
+def parse_chunk_text(
+    text: str, parse_re: re.Pattern, start_re: re.Pattern
+) -> Tuple[List[Optional[Dict[str, Any]]], List[Tuple[int, str]]]:
+    """Splits a chunk into entries and parses them. See ``parse_entries``."""
+    return parse_entries(split_entries(text, start_re), parse_re)
+
+
+def match_rate(lines: List[str], parse_re: re.Pattern, start_re: re.Pattern) -> float:
+    """Fraction of entry start lines in ``lines`` that ``parse_re`` matches."""
+    starts = [line.rstrip("\r\n") for line in lines if start_re.match(line)]
+    if not starts:
+        return 0.0
+    return sum(1 for line in starts if parse_re.match(line)) / len(starts)
@@ -0,0 +1,206 @@
+"""
+On-disk formats for structured log records (converted chunks).
+
+* ``json``: one indented JSON array per chunk (the original format).
+* ``jsonl``: one compact JSON object per line.
+* ``columnar`` (``.cols.json``): a header line ``{"keys": [...], "rows": n}``
+  followed by one JSON array per key with that column's values, so each key
+  is written once per chunk instead of once per entry.
+
+Writers stream straight from the records: entries are encoded one at a time
+and reordered to the schema only when their keys are out of order. A lone
+entry or an object wrapping one list of entries is normalized to a list;
+anything that is not an entry object is an error, never silently dropped. Readers
+pick the format from the file suffix. ``iter_records`` yields entries
+lazily (line by line for ``jsonl``), and ``read_column`` returns one key's
+values, loading only that column's line of a columnar file through mmap.
+In columnar files, keys an entry lacks read back as null.
+"""
+
+import json
+import mmap
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+RECORD_FORMATS = {"json": ".json", "jsonl": ".jsonl", "columnar": ".cols.json"}
+# Longest suffix first, so '.cols.json' is not taken for '.json'
+_SUFFIXES = sorted(((suffix, name) for name, suffix in RECORD_FORMATS.items()), key=lambda s: -len(s[0]))
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def record_format(path: str) -> str:
+    """Format of a records file, from its suffix (``json`` for unknown suffixes)."""
+    for suffix, name in _SUFFIXES:
+        if path.endswith(suffix):
+            return name
+    return "json"
+
+
+def strip_record_suffix(path: str) -> str:
+    """``chunk_0001.cols.json`` -> ``chunk_0001``."""
+    for suffix, _ in _SUFFIXES:
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def is_records_file(path: str) -> bool:
+    return any(path.endswith(suffix) for suffix, _ in _SUFFIXES)
+
+
+def _ordered(entry: Dict[str, Any], keys: Optional[tuple]) -> Dict[str, Any]:
+    """``entry`` with ``keys`` first, in order, then its other keys; the entry itself when it already is."""
+    if not keys or not isinstance(entry, dict) or tuple(entry) == keys:
+        return entry
+    position, extra_seen = 0, False
+    for key in entry:
+        if position < len(keys) and key == keys[position]:
+            if extra_seen:
+                break
+            position += 1
+        elif key in keys:
+            break
+        else:
+            extra_seen = True
+    else:
+        return entry
+    ordered = {k: entry[k] for k in keys if k in entry}
+    for k, v in entry.items():
+        if k not in ordered:
+            ordered[k] = v
+    return ordered
+
+
+def _entries(records: Any) -> Iterable[Dict[str, Any]]:
+    """
+    ``records`` as entry dicts: a lone entry is wrapped and an object holding a
+    single list (``{"logs": [...]}``) is unwrapped. Anything that is not an
+    entry raises ValueError rather than being dropped.
+    """
+    if isinstance(records, dict):
+        values = list(records.values())
+        records = values[0] if len(values) == 1 and isinstance(values[0], list) else [records]
+    elif isinstance(records, (str, bytes)) or not isinstance(records, Iterable):
+        raise ValueError(f"Expected a list of log entries, got {type(records).__name__}")
+    for position, entry in enumerate(records):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Entry {position} is not a JSON object: {entry!r:.80}")
+        yield entry
+
+
+def as_entries(records: Any) -> List[Dict[str, Any]]:
+    """``records`` normalized to a list of entry dicts (see ``_entries``)."""
+    return list(_entries(records))
+
+
+def write_records(path: str, records: Iterable[Any], keys: Optional[List[str]] = None, fmt: Optional[str] = None) -> int:
+    """
+    Writes records in ``fmt`` (default: from the suffix) and returns the bytes
+    written. Schema ``keys`` come first in each entry (or column table).
+    Raises ValueError, leaving ``path`` untouched, if ``records`` are not
+    entry objects (see ``_entries``).
+    """
+    fmt = fmt or record_format(path)
+    if fmt not in RECORD_FORMATS:
+        raise ValueError(f"Unknown record format '{fmt}'. Expected one of: {', '.join(RECORD_FORMATS)}")
+    keys = tuple(keys) if keys else None
+    entries = _entries(records)
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            written = _write(f, entries, keys, fmt)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return written
+
+
+def _write(f, entries: Iterable[Dict[str, Any]], keys: Optional[tuple], fmt: str) -> int:
+    if fmt == "json":
+        json.dump([_ordered(entry, keys) for entry in entries], f, indent=2)
+    elif fmt == "jsonl":
+        encode = _encoder.encode
+        for entry in entries:
+            f.write(encode(_ordered(entry, keys)))
+            f.write("\n")
+    else:
+        columns: Dict[str, List[Any]] = {key: [] for key in keys or ()}
+        rows = 0
+        for entry in entries:
+            for key, value in entry.items():
+                column = columns.get(key)
+                if column is None:
+                    column = columns[key] = [None] * rows
+                column.append(value)
+            rows += 1
+            for column in columns.values():
+                if len(column) < rows:
+                    column.append(None)
+        f.write(_encoder.encode({"keys": list(columns), "rows": rows}))
+        f.write("\n")
+        for column in columns.values():
+            f.write(_encoder.encode(column))
+            f.write("\n")
+    return f.tell()
+
+
+def parse_records(content, path: str) -> List[Any]:
+    """Records from a file's raw content (str or bytes), in the format of ``path``."""
+    fmt = record_format(path)
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', errors='replace')
+    if fmt == "jsonl":
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+    if fmt == "columnar":
+        lines = content.splitlines()
+        header = json.loads(lines[0])
+        columns = [json.loads(line) for line in lines[1:1 + len(header["keys"])]]
+        return [dict(zip(header["keys"], row)) for row in zip(*columns)] if columns else [{}] * header["rows"]
+    return json.loads(content)
+
+
+def iter_records(path: str) -> Iterator[Any]:
+    """Yields the records of a file; ``jsonl`` is read line by line."""
+    fmt = record_format(path)
+    if fmt == "jsonl":
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    with open(path, 'rb') as f:
+        content = f.read()
+    records = parse_records(content, path)
+    yield from records if isinstance(records, list) else [records]
+
+
+def read_records(path: str) -> Any:
+    """The whole content of a records file: a list of records (or a plain JSON document)."""
+    if record_format(path) == "json":
+        with open(path, 'r') as f:
+            return json.load(f)
+    return list(iter_records(path))
+
+
+def read_column(path: str, key: str) -> List[Any]:
+    """
+    One key's values across the file's records (null where absent). For
+    columnar files only the header and that column's line are decoded.
+    """
+    if record_format(path) != "columnar":
+        return [entry.get(key) if isinstance(entry, dict) else None for entry in iter_records(path)]
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = mm.find(b"\n")
+            header = json.loads(mm[:end])
+            if key not in header["keys"]:
+                return [None] * header["rows"]
+            for _ in range(header["keys"].index(key)):
+                end = mm.find(b"\n", end + 1)
+            start, end = end + 1, mm.find(b"\n", end + 1)
+            return json.loads(mm[start:end if end >= 0 else len(mm)])
@@ -0,0 +1,214 @@
+"""
+Persistent registry of LLM-designed JSON schemas.
+
+The LLM converter needs a schema design turn before it can convert chunks.
+The registry keeps each design on disk (``.LogGuardians/schema_registry.json``)
+with its key order and field types, so later runs and other processes reuse
+it instead of asking again.
+
+Designs are keyed by ``<profile>:<regex hash>:<sample fingerprint>``. The
+fingerprint hashes the shapes of the sample's entry headers (the text the
+profile's ``log_start_regex`` matches, with digit and letter runs masked) and
+whether entries span several lines, so another day of the same format maps
+to the same design, while a new timestamp layout does not.
+
+Converted entries are checked against the design while a run goes on. When
+more than ``schema_misfit_rate`` of them have other keys or values of the
+wrong type, the design is marked stale and the next run designs a new
+revision.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+REGISTRY_PATH = ".LogGuardians/schema_registry.json"
+REGISTRY_VERSION = 1
+
+_DIGITS = re.compile(r"[0-9]+")
+_LETTERS = re.compile(r"[A-Za-z]+")
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?")
+# Entries checked before a run's misfit rate is trusted
+_MIN_CHECKED = 20
+
+
+def sample_fingerprint(sample: str, log_start_regex: str) -> str:
+    """Hash of the sample's entry header shapes, stable across days of the same format."""
+    start_re = re.compile(log_start_regex)
+    shapes, continuation = set(), False
+    for line in sample.splitlines():
+        match = start_re.match(line)
+        if match is None:
+            continuation = continuation or bool(line.strip())
+            continue
+        shapes.add(_LETTERS.sub("a", _DIGITS.sub("0", match.group(0))))
+    text = "\n".join(sorted(shapes)) + f"\ncontinuation={continuation}"
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def registry_key(profile_name: str, log_start_regex: str, fingerprint: str) -> str:
+    regex_hash = hashlib.sha256(log_start_regex.encode('utf-8')).hexdigest()[:12]
+    return f"{profile_name}:{regex_hash}:{fingerprint}"
+
+
+def _fits_type(value: Any, field_type: Optional[str]) -> bool:
+    if value is None or field_type is None:
+        return True
+    if field_type == "boolean":
+        return isinstance(value, bool)
+    if isinstance(value, bool):
+        return False
+    if field_type == "integer":
+        return isinstance(value, int) or (isinstance(value, str) and value.strip().lstrip('-').isdigit())
+    if field_type == "number":
+        return isinstance(value, (int, float)) or (isinstance(value, str) and bool(_NUMBER.fullmatch(value.strip())))
+    return isinstance(value, str)
+
+
+def infer_field_types(entries: Iterable[Dict[str, Any]], keys: List[str]) -> Dict[str, str]:
+    """Field types observed in converted entries (the widest type seen per key)."""
+    order = {"integer": 0, "number": 1, "boolean": 2, "string": 3}
+    observed: Dict[str, str] = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        for key in keys:
+            value = entry.get(key)
+            if value is None:
+                continue
+            if isinstance(value, bool):
+                kind = "boolean"
+            elif isinstance(value, int):
+                kind = "integer"
+            elif isinstance(value, float):
+                kind = "number"
+            else:
+                kind = "string"
+            if key not in observed or order[kind] > order[observed[key]]:
+                observed[key] = kind
+    return {key: observed.get(key, "string") for key in keys}
+
+
+def count_misfits(entries: Iterable[Any], keys: List[str], field_types: Optional[Dict[str, str]]) -> int:
+    """Entries whose keys differ from ``keys`` or whose values do not fit ``field_types``."""
+    expected = set(keys)
+    field_types = field_types or {}
+    misfits = 0
+    for entry in entries:
+        if (not isinstance(entry, dict) or set(entry) != expected
+                or not all(_fits_type(entry[key], field_types.get(key)) for key in keys)):
+            misfits += 1
+    return misfits
+
+
+class SchemaRegistry:
+    """
+    Schema designs on disk, shared across runs and processes.
+
+    Every write re-reads the file and replaces it atomically under an
+    exclusive lock on ``<path>.lock``, so concurrent runs only ever see
+    complete registries and no writer drops another's keys.
+
+    Args:
+        path: Registry file.
+        max_misfit_rate: Share of misfitting entries above which a design is
+            marked stale.
+    """
+
+    def __init__(self, path: str = REGISTRY_PATH, max_misfit_rate: float = 0.2):
+        self.path = path
+        self.max_misfit_rate = max_misfit_rate
+        self.checked = 0
+        self.misfits = 0
+
+    @classmethod
+    def from_config(cls, config) -> "SchemaRegistry":
+        return cls(
+            config.get('schema_registry', REGISTRY_PATH),
+            float(config.get('schema_misfit_rate', 0.2)),
+        )
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, 'r') as f:
+                registry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"version": REGISTRY_VERSION, "schemas": {}}
+        if registry.get("version") != REGISTRY_VERSION:
+            print(f"⚠️  Ignoring schema registry version {registry.get('version')} in {self.path}.")
+            return {"version": REGISTRY_VERSION, "schemas": {}}
+        return registry
+
+    def _update(self, key: str, change) -> Dict[str, Any]:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.lock", 'w') as lock:
+            # Held from read to replace, so a concurrent write can't be lost
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            registry = self._load()
+            entry = change(registry["schemas"].get(key))
+            registry["schemas"][key] = entry
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(registry, f, indent=2)
+            os.replace(tmp_path, self.path)
+        return entry
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """The current design for ``key``, or None if there is none or it went stale."""
+        entry = self._load()["schemas"].get(key)
+        if entry is None or entry.get("stale"):
+            return None
+        return entry
+
+    def register(self, key: str, schema_text: str, keys: Optional[List[str]],
+                 field_types: Optional[Dict[str, str]], model_name: str) -> Dict[str, Any]:
+        """Stores a new design for ``key``, replacing a stale one with the next revision."""
+        def change(previous):
+            return {
+                "revision": (previous or {}).get("revision", 0) + 1,
+                "schema_text": schema_text,
+                "keys": keys,
+                "field_types": field_types,
+                "model": model_name,
+                "designed_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "checked": 0,
+                "misfits": 0,
+                "stale": False,
+            }
+        return self._update(key, change)
+
+    def set_field_types(self, key: str, field_types: Dict[str, str]):
+        def change(entry):
+            return dict(entry, field_types=field_types)
+        self._update(key, change)
+
+    def check(self, entries: List[Any], keys: Optional[List[str]], field_types: Optional[Dict[str, str]]):
+        """Counts this run's converted entries that do not fit the design."""
+        if not keys:
+            return
+        self.checked += len(entries)
+        self.misfits += count_misfits(entries, keys, field_types)
+
+    def record_fit(self, key: str) -> bool:
+        """
+        Adds this run's fit counts to the design and marks it stale if too many
+        entries misfit. Returns True if the design went stale.
+        """
+        if not self.checked:
+            return False
+        checked, misfits = self.checked, self.misfits
+        self.checked = self.misfits = 0
+        stale = checked >= _MIN_CHECKED and misfits / checked > self.max_misfit_rate
+
+        def change(entry):
+            entry = dict(entry or {})
+            entry["checked"] = entry.get("checked", 0) + checked
+            entry["misfits"] = entry.get("misfits", 0) + misfits
+            entry["stale"] = entry.get("stale", False) or stale
+            return entry
+        self._update(key, change)
+        return stale
@@ -0,0 +1,167 @@
+"""
+Deduplicated index of detected anomalies, built locally before reporting.
+
+Every chunk the detector flags yields its own anomaly objects, so one
+attack or failure usually shows up hundreds of times with slightly
+different numbers. ``AnomalyIndex`` folds them into groups keyed by
+severity and normalized description: IPs, node names, hex ids, quoted
+values and numbers are replaced by placeholders before comparison. Each
+group keeps its count, the files it came from, the entities it mentioned
+(IPs, nodes, users, with counts) and a few raw examples. Anomalies of a
+near-duplicate cluster representative (``cluster_size``) are added once;
+the other chunks of the cluster are counted in ``near_duplicates``. An entity index
+lists entities shared by several groups, e.g. one IP behind both login
+failures and a privilege escalation.
+
+The report stage then sees one line per group instead of one object per
+anomaly, so its input grows with the number of distinct issues.
+"""
+
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+INDEX_PATH = ".LogGuardians/anomaly_index.json"
+SEVERITIES = ("Critical", "High", "Medium", "Low")
+_UNKNOWN_SEVERITY = "Unknown"
+# Characters of evidence kept per example
+_EVIDENCE_CHARS = 300
+
+_ENTITY_PATTERNS = {
+    "ip": re.compile(r"\b(\d{1,3}(?:\.\d{1,3}){3})(?::\d+)?\b"),
+    "node": re.compile(r"\b(node-\d+|(?:r?host)=[\w.-]+)"),
+    "user": re.compile(r"\buser[= ]+['\"]?([A-Za-z_][\w.-]*)", re.IGNORECASE),
+}
+_NORMALIZERS = (
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"), "<ip>"),
+    (re.compile(r"\bnode-\d+\b", re.IGNORECASE), "<node>"),
+    (re.compile(r"\b0x[0-9a-f]+\b|\b[0-9a-f]{8,}\b", re.IGNORECASE), "<hex>"),
+    (re.compile(r"'[^']*'|\"[^\"]*\"|`[^`]*`"), "<str>"),
+    (re.compile(r"\d+(?:\.\d+)?"), "<num>"),
+    (re.compile(r"\s+"), " "),
+)
+
+
+def normalize_description(text: str) -> str:
+    """Lower-cased description with entities and numbers replaced by placeholders."""
+    text = str(text or "").lower()
+    for pattern, placeholder in _NORMALIZERS:
+        text = pattern.sub(placeholder, text)
+    return text.strip(" .;:")
+
+
+def normalize_severity(severity: Any) -> str:
+    text = str(severity or "").strip().capitalize()
+    return text if text in SEVERITIES else _UNKNOWN_SEVERITY
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if value is None:
+        return ""
+    return json.dumps(value, default=str)
+
+
+class AnomalyIndex:
+    """
+    Groups anomalies by (severity, normalized description).
+
+    Args:
+        max_examples: Raw examples kept per group.
+        max_entities: Most frequent entities listed per type and group.
+    """
+
+    def __init__(self, max_examples: int = 3, max_entities: int = 5):
+        self.max_examples = max_examples
+        self.max_entities = max_entities
+        self.total = 0
+        self._groups: Dict[tuple, Dict[str, Any]] = {}
+
+    def add(self, anomaly: Dict[str, Any], source_file: Optional[str] = None):
+        self.total += 1
+        source_file = source_file or anomaly.get("source_file")
+        severity = normalize_severity(anomaly.get("severity"))
+        description = _text(anomaly.get("description"))
+        key = (severity, normalize_description(description))
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = {
+                "severity": severity, "pattern": key[1], "count": 0, "files": set(),
+                "first_file": source_file, "last_file": source_file,
+                "entities": {kind: {} for kind in _ENTITY_PATTERNS}, "examples": [],
+                "near_duplicates": 0,
+            }
+        group["count"] += 1
+        group["near_duplicates"] += max(0, int(anomaly.get("cluster_size") or 1) - 1)
+        if source_file:
+            group["files"].add(source_file)
+            group["last_file"] = source_file
+
+        evidence = _text(anomaly.get("evidence"))
+        text = " ".join((description, evidence, _text(anomaly.get("correlation"))))
+        for kind, pattern in _ENTITY_PATTERNS.items():
+            counts = group["entities"][kind]
+            for value in set(pattern.findall(text)):
+                counts[value] = counts.get(value, 0) + 1
+
+        if len(group["examples"]) < self.max_examples and all(
+            example["description"] != description for example in group["examples"]
+        ):
+            group["examples"].append({
+                "source_file": source_file,
+                "description": description,
+                "evidence": evidence[:_EVIDENCE_CHARS],
+            })
+
+    def groups(self) -> List[Dict[str, Any]]:
+        """Groups most severe and most frequent first, with ids ``G1``, ``G2``, ..."""
+        rank = {severity: i for i, severity in enumerate(SEVERITIES + (_UNKNOWN_SEVERITY,))}
+        ordered = sorted(self._groups.values(), key=lambda g: (rank[g["severity"]], -g["count"], g["pattern"]))
+        result = []
+        for number, group in enumerate(ordered, start=1):
+            entities = {
+                kind: sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:self.max_entities]
+                for kind, counts in group["entities"].items() if counts
+            }
+            result.append({
+                "id": f"G{number}",
+                "severity": group["severity"],
+                "pattern": group["pattern"],
+                "count": group["count"],
+                "files": len(group["files"]),
+                "near_duplicates": group["near_duplicates"],
+                "first_file": group["first_file"],
+                "last_file": group["last_file"],
+                "entities": {kind: [{"value": v, "count": c} for v, c in values] for kind, values in entities.items()},
+                "examples": group["examples"],
+            })
+        return result
+
+    def shared_entities(self, groups: Optional[List[Dict[str, Any]]] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Entities mentioned by more than one group, most widespread first."""
+        groups = groups if groups is not None else self.groups()
+        seen: Dict[tuple, Dict[str, Any]] = {}
+        for group in groups:
+            for kind, values in group["entities"].items():
+                for entity in values:
+                    entry = seen.setdefault((kind, entity["value"]), {
+                        "type": kind, "value": entity["value"], "count": 0, "groups": [],
+                    })
+                    entry["count"] += entity["count"]
+                    entry["groups"].append(group["id"])
+        shared = [entry for entry in seen.values() if len(entry["groups"]) > 1]
+        shared.sort(key=lambda e: (-len(e["groups"]), -e["count"], e["value"]))
+        return shared[:limit]
+
+    def save(self, path: str = INDEX_PATH) -> str:
+        groups = self.groups()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({
+                "anomalies": self.total,
+                "groups": groups,
+                "shared_entities": self.shared_entities(groups),
+            }, f, indent=2)
+        return path
@@ -0,0 +1,229 @@
+"""
+Statistical pre-filter for the anomaly detector.
+
+Scores every structured chunk with cheap vectorized statistics so only
+suspicious chunks are sent to the LLM:
+
+1. Each chunk becomes a count vector over message templates (mined with
+   ``TemplateMiner``) and the values of its categorical columns (level,
+   state, host, component, ...). Chunks are read one at a time and only
+   their non-zero counts are kept; a column with more than ``max_values``
+   distinct values is dropped, which bounds the vocabulary.
+2. Counts are turned into per-chunk event rates. Chunks are taken in input
+   order as consecutive time buckets, and each bucket is compared with a
+   rolling baseline of the ``window`` buckets before it (the whole run while
+   there are fewer than ``min_history`` of them).
+3. A chunk's score is its largest z-score; chunks containing a template
+   rarer than ``rare_share`` of all entries are always suspicious.
+"""
+
+import json
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.log.guardians.app.features.parsing.parser_engine import MESSAGE_KEY
+from src.log.guardians.app.features.parsing.record_io import iter_records, read_column, record_format
+from src.log.guardians.app.features.templates.drain import TemplateMiner
+
+SCORES_LOG = ".LogGuardians/prefilter_scores.jsonl"
+# Columns with more distinct values than this share of entries (ids, free
+# text) are not treated as categorical
+CATEGORICAL_RATIO = 0.5
+# ...nor are columns whose values each show up in fewer chunks than this on
+# average (timestamps, pids): they describe one moment, not a recurring entity
+MIN_CHUNK_SPREAD = 3.0
+
+
+class ChunkPrefilter:
+    """Splits structured chunks into suspicious ones (for the LLM) and clean ones."""
+
+    def __init__(self, threshold: float = 3.0, window: int = 20, min_history: int = 5,
+                 rare_share: float = 0.001, columns: Optional[List[str]] = None, max_values: int = 10000):
+        self.threshold = threshold
+        self.window = max(1, window)
+        self.min_history = max(1, min_history)
+        self.rare_share = rare_share
+        self.columns = columns
+        self.max_values = max_values
+
+    @classmethod
+    def from_config(cls, config) -> "ChunkPrefilter":
+        return cls(
+            float(config.get('prefilter_threshold', 3.0)),
+            int(config.get('prefilter_window', 20)),
+            int(config.get('prefilter_min_history', 5)),
+            float(config.get('prefilter_rare_share', 0.001)),
+            config.get('prefilter_columns'),
+            int(config.get('prefilter_max_values', 10000)),
+        )
+
+    def _count(self, chunks: Iterable[List[Dict[str, Any]]]) -> Tuple[List[Tuple[np.ndarray, np.ndarray]], np.ndarray, List[str], np.ndarray]:
+        """
+        Counts each chunk's features as it arrives, so only one chunk's records
+        are held at a time.
+
+        Returns:
+            (per chunk (feature ids, counts), entries per chunk, feature names,
+            template feature mask)
+        """
+        miner = TemplateMiner()
+        # (column, value) or (None, template id) -> feature id
+        vocab: Dict[Tuple[Optional[str], str], int] = {}
+        # column -> value -> [chunks it appears in, last chunk seen]; None once
+        # the column has too many values to be categorical
+        values: Dict[str, Optional[Dict[str, List[int]]]] = {}
+        rows, entries = [], []
+        for c, records in enumerate(chunks):
+            counts = Counter()
+            for record in records:
+                template_id, _ = miner.add(str(record.get(MESSAGE_KEY) or ""))
+                counts[vocab.setdefault((None, template_id), len(vocab))] += 1
+                for key, value in record.items():
+                    if key == MESSAGE_KEY or (self.columns is not None and key not in self.columns):
+                        continue
+                    seen = values.setdefault(key, {})
+                    if seen is None:
+                        continue
+                    value = str(value)
+                    spread = seen.setdefault(value, [0, -1])
+                    if spread[1] != c:
+                        spread[0] += 1
+                        spread[1] = c
+                    if len(seen) > self.max_values:
+                        values[key] = None
+                        continue
+                    counts[vocab.setdefault((key, value), len(vocab))] += 1
+            entries.append(len(records))
+            rows.append((np.fromiter(counts.keys(), dtype=np.intp, count=len(counts)),
+                         np.fromiter(counts.values(), dtype=float, count=len(counts))))
+
+        columns = {key for key, seen in values.items() if seen is not None}
+        if self.columns is None:
+            total = sum(entries)
+            columns = {
+                key for key in columns
+                if len(values[key]) <= max(1, total * CATEGORICAL_RATIO)
+                and sum(n for n, _ in values[key].values()) / len(values[key]) >= min(MIN_CHUNK_SPREAD, len(rows))
+            }
+        # Renumber the kept features densely
+        keep = np.array([key is None or key in columns for key, _ in vocab], dtype=bool)
+        new_id = np.cumsum(keep) - 1
+        rows = [(new_id[ids[keep[ids]]], counts[keep[ids]]) for ids, counts in rows]
+
+        names, is_template = [], []
+        for (key, value), kept in zip(vocab, keep):
+            if kept:
+                names.append(f"template '{miner.templates[value].text}'" if key is None else f"{key}={value}")
+                is_template.append(key is None)
+        return rows, np.array(entries, dtype=float), names, np.array(is_template, dtype=bool)
+
+    def score(self, chunks: Iterable[List[Dict[str, Any]]]) -> Tuple[np.ndarray, List[str]]:
+        """
+        Scores chunks (lists of records, in input order; any iterable, read
+        once). Counts are kept sparse: z-scores are only computed for the
+        features a chunk holds, as absent ones score 0.
+
+        Returns:
+            (scores, reasons): the score of each chunk and the feature behind it.
+        """
+        rows, entries, names, is_template = self._count(chunks)
+        if not rows:
+            return np.zeros(0), []
+        features = len(names)
+        n = np.maximum(entries, 1.0)
+
+        # Whole-run mean and variance of each feature's rate, for chunks with
+        # too little history
+        run1, run2, totals = np.zeros(features), np.zeros(features), np.zeros(features)
+        for c, (ids, counts) in enumerate(rows):
+            rates = counts / n[c]
+            run1[ids] += rates
+            run2[ids] += rates ** 2
+            totals[ids] += counts
+        run_mean = run1 / len(rows)
+        run_var = run2 / len(rows) - run_mean ** 2
+
+        # Rare templates are suspicious however calm the rates look
+        rare = is_template & (totals / max(entries.sum(), 1.0) < self.rare_share)
+
+        # Rolling sums over the previous `window` chunks
+        window1, window2 = np.zeros(features), np.zeros(features)
+        scores = np.zeros(len(rows))
+        reasons = []
+        for c, (ids, counts) in enumerate(rows):
+            rates = counts / n[c]
+            k = min(c, self.window)
+            if k < self.min_history:
+                mean, var = run_mean[ids], run_var[ids]
+            else:
+                mean = window1[ids] / k
+                var = window2[ids] / k - mean ** 2
+            # Sampling noise of a rate over n entries keeps small chunks from
+            # scoring high on a single event
+            std = np.sqrt(np.maximum(var, 0) + mean * (1 - mean) / n[c] + 1 / n[c] ** 2)
+            z = (rates - mean) / std
+            top = int(np.argmax(z)) if len(ids) else -1
+            if top >= 0 and (z[top] > 0 or len(ids) == features):
+                scores[c] = z[top]
+                reasons.append(f"{names[ids[top]]} spiked (z={scores[c]:.1f})")
+            else:
+                reasons.append("no feature spiked (z=0.0)")
+            rare_ids = ids[rare[ids]]
+            if rare_ids.size and scores[c] < self.threshold:
+                scores[c] = self.threshold
+                reasons[c] = f"rare {names[int(rare_ids.min())]}"
+
+            window1[ids] += rates
+            window2[ids] += rates ** 2
+            if c >= self.window:
+                old_ids, old_counts = rows[c - self.window]
+                old_rates = old_counts / n[c - self.window]
+                window1[old_ids] -= old_rates
+                window2[old_ids] -= old_rates ** 2
+        return scores, reasons
+
+    def _load(self, file_path: str) -> List[Dict[str, Any]]:
+        """
+        A chunk's records, streamed from the file. With ``columns`` set, a
+        columnar file is read column by column: only the message and those
+        columns are decoded (absent values are left out).
+        """
+        if self.columns is None or record_format(file_path) != "columnar":
+            return [r for r in iter_records(file_path) if isinstance(r, dict)]
+        keys = [MESSAGE_KEY] + [k for k in self.columns if k != MESSAGE_KEY]
+        columns = [read_column(file_path, key) for key in keys]
+        return [{k: v for k, v in zip(keys, row) if v is not None} for row in zip(*columns)]
+
+    def split(self, json_files: List[str]) -> Tuple[List[str], List[str], Dict[str, float]]:
+        """
+        Scores the JSON chunk files and logs every verdict to
+        ``prefilter_scores.jsonl``.
+
+        Returns:
+            (suspicious files for the LLM, clean files, score per file), the
+            lists in input order.
+        """
+        # One chunk's records in memory at a time
+        scores, reasons = self.score(self._load(file_path) for file_path in json_files)
+        suspicious, clean = [], []
+        by_file = {}
+        os.makedirs(os.path.dirname(SCORES_LOG), exist_ok=True)
+        with open(SCORES_LOG, 'a') as log:
+            for file_path, score, reason in zip(json_files, scores, reasons):
+                verdict = "suspicious" if score >= self.threshold else "clean"
+                (suspicious if verdict == "suspicious" else clean).append(file_path)
+                by_file[file_path] = round(float(score), 2)
+                log.write(json.dumps({
+                    "file": os.path.basename(file_path),
+                    "verdict": verdict,
+                    "score": by_file[file_path],
+                    "reason": reason,
+                    "threshold": self.threshold,
+                    "source": "prefilter",
+                    "timestamp": time.time(),
+                }) + "\n")
+        return suspicious, clean, by_file
@@ -0,0 +1,376 @@
+"""
+SQLite store of structured log entries and anomaly reports.
+
+With ``log_store_enabled``, ``save_json_tool`` and ``save_anomaly_json_tool``
+also bulk-insert what they save into one local database
+(``.LogGuardians/structured_logs.sqlite``), so questions such as "all ERROR
+entries on node-246 between 02:00 and 03:00" are answered by an indexed
+query instead of by opening every file in ``output_json_structured_logs``.
+The files stay the hand-off between pipeline stages; the store is the index
+over them.
+
+* ``entries``: one row per converted entry with its chunk, position, epoch
+  timestamp (from the profile's ``timestamp_format``), level, host/node,
+  message and the full record as JSON. Indexed on (chunk, seq), time,
+  (level, time) and (host, time).
+* ``anomalies``: one row per detected anomaly with its chunk, severity and
+  the size of the near-duplicate cluster the chunk represents. Reports of
+  cluster members only refer to their representative and add no rows.
+
+Chunk names repeat across inputs, so every row carries a ``scope``: the
+active profile and the absolute path of the input log. A store only reads
+and writes its own scope, and chunking clears the scope before it writes
+new chunks, so a re-chunked run never sees the previous run's rows.
+
+The database runs in WAL mode, so readers never block the writer, and each
+chunk is written in one transaction (rows inserted in batches). Saving a
+chunk again replaces its rows, so re-runs do not duplicate entries. Worker
+processes of the regex converter write concurrently; SQLite serializes them
+through its busy timeout.
+
+Query from the project root:
+    python -m src.log.guardians.app.features.storage.log_store --level ERROR
+        --host node-246 --start "Jun 14 02:00:00" --end "Jun 14 03:00:00"
+        [--chunk chunk_0007] [--contains timeout] [--count-by host] [--anomalies]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.log.guardians.app.features.chunking.timestamps import TimestampParser
+from src.log.guardians.app.features.parsing.parser_engine import MESSAGE_KEY
+
+STORE_PATH = ".LogGuardians/structured_logs.sqlite"
+# Record keys that fill the indexed columns (first present wins)
+_LEVEL_KEYS = ("level", "severity", "log_level")
+_HOST_KEYS = ("host", "node", "hostname")
+_TIMESTAMP_KEYS = ("timestamp", "time", "date")
+_COUNT_COLUMNS = ("level", "host", "chunk")
+_VERSION = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    scope TEXT NOT NULL,
+    chunk TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    ts REAL,
+    timestamp TEXT,
+    level TEXT,
+    host TEXT,
+    message TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_chunk ON entries (scope, chunk, seq);
+CREATE INDEX IF NOT EXISTS entries_ts ON entries (scope, ts);
+CREATE INDEX IF NOT EXISTS entries_level ON entries (scope, level, ts);
+CREATE INDEX IF NOT EXISTS entries_host ON entries (scope, host, ts);
+CREATE TABLE IF NOT EXISTS anomalies (
+    scope TEXT NOT NULL,
+    chunk TEXT NOT NULL,
+    severity TEXT,
+    description TEXT,
+    evidence TEXT,
+    correlation TEXT,
+    file TEXT,
+    analyzed_at TEXT,
+    cluster_size INTEGER
+);
+CREATE INDEX IF NOT EXISTS anomalies_chunk ON anomalies (scope, chunk);
+CREATE INDEX IF NOT EXISTS anomalies_severity ON anomalies (scope, severity);
+"""
+
+
+def store_scope(config) -> str:
+    """The rows of one input under one profile: ``<profile>:<absolute input path>``."""
+    return f"{config['active_profile']}:{os.path.abspath(config['input_log_file'])}"
+
+
+def _first(record: Dict[str, Any], keys) -> Optional[str]:
+    for key in keys:
+        value = record.get(key)
+        if value is not None and value != "":
+            return str(value)
+    return None
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, default=str)
+
+
+class LogStore:
+    """
+    Structured entries and anomalies in one SQLite database.
+
+    Args:
+        path: Database file.
+        parser: The profile's timestamp parser, for the ``ts`` column and for
+            time filters given as text. Without one, time filters must be epoch
+            seconds.
+        batch_rows: Rows per ``executemany`` batch inside a chunk's transaction.
+        scope: The rows this store reads and writes (see ``store_scope``).
+    """
+
+    def __init__(self, path: str = STORE_PATH, parser: Optional[TimestampParser] = None, batch_rows: int = 5000,
+                 scope: str = ""):
+        self.path = path
+        self.parser = parser
+        self.batch_rows = batch_rows
+        self.scope = scope
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    @classmethod
+    def from_config(cls, config) -> Optional["LogStore"]:
+        """The configured store, or None unless ``log_store_enabled``."""
+        if not config.get('log_store_enabled', False):
+            return None
+        profile = config['log_profiles'][config['active_profile']]
+        return cls(
+            config.get('log_store_path', STORE_PATH),
+            TimestampParser.from_profile(profile),
+            int(config.get('log_store_batch_rows', 5000)),
+            store_scope(config),
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections do not survive fork, so worker processes open their own
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != _VERSION:
+                if version:
+                    # Rows of earlier versions belong to no scope; they are rebuilt by the next run
+                    conn.executescript("DROP TABLE IF EXISTS entries; DROP TABLE IF EXISTS anomalies;")
+                conn.executescript(_SCHEMA)
+                conn.execute(f"PRAGMA user_version={_VERSION}")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _replace(self, table: str, chunk: str, sql: str, rows: Iterable[tuple]) -> int:
+        """Replaces a chunk's rows in ``table`` in one transaction; returns the rows written."""
+        written = 0
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(f"DELETE FROM {table} WHERE scope = ? AND chunk = ?", (self.scope, chunk))
+                batch = []
+                for row in rows:
+                    batch.append(row)
+                    if len(batch) >= self.batch_rows:
+                        conn.executemany(sql, batch)
+                        written += len(batch)
+                        batch = []
+                if batch:
+                    conn.executemany(sql, batch)
+                    written += len(batch)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return written
+
+    def _ts(self, text: Optional[str]) -> Optional[float]:
+        if text is None or self.parser is None:
+            return None
+        return self.parser.parse_text(text)
+
+    def write_entries(self, chunk: str, records: Iterable[Any]) -> int:
+        """Stores a chunk's converted entries, replacing any stored before."""
+        def rows():
+            for seq, record in enumerate(records):
+                if not isinstance(record, dict):
+                    continue
+                timestamp = _first(record, _TIMESTAMP_KEYS)
+                level = _first(record, _LEVEL_KEYS)
+                yield (
+                    self.scope, chunk, seq, self._ts(timestamp), timestamp,
+                    level.upper() if level else None, _first(record, _HOST_KEYS),
+                    _text(record.get(MESSAGE_KEY)), json.dumps(record, separators=(",", ":"), default=str),
+                )
+        return self._replace(
+            "entries", chunk,
+            "INSERT INTO entries (scope, chunk, seq, ts, timestamp, level, host, message, record)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows(),
+        )
+
+    def write_anomalies(self, chunk: str, report: Dict[str, Any]) -> int:
+        """Stores a chunk's anomaly report, replacing any stored before."""
+        anomalies = report.get("anomalies") or []
+        rows = (
+            (self.scope, chunk, _text(a.get("severity")), _text(a.get("description")), _text(a.get("evidence")),
+             _text(a.get("correlation")), report.get("file"), report.get("timestamp_analyzed"),
+             report.get("cluster_size"))
+            for a in anomalies if isinstance(a, dict)
+        )
+        return self._replace(
+            "anomalies", chunk,
+            "INSERT INTO anomalies (scope, chunk, severity, description, evidence, correlation, file, analyzed_at,"
+            " cluster_size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+    def clear(self) -> None:
+        """Deletes every row of this store's scope, before its input is chunked again."""
+        if not os.path.exists(self.path):
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM entries WHERE scope = ?", (self.scope,))
+                conn.execute("DELETE FROM anomalies WHERE scope = ?", (self.scope,))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _time_bound(self, value) -> Optional[float]:
+        if value is None or value == "":
+            return None
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            pass
+        parsed = self._ts(str(value))
+        if parsed is None:
+            raise ValueError(f"Cannot parse time bound '{value}' with the profile's timestamp_format")
+        return parsed
+
+    def _where(self, level=None, host=None, start=None, end=None, chunk=None, contains=None):
+        clauses, params = ["scope = ?"], [self.scope]
+        for column, value in (("level", level.upper() if level else None), ("host", host), ("chunk", chunk)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        start, end = self._time_bound(start), self._time_bound(end)
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(end)
+        if contains:
+            clauses.append("instr(message, ?) > 0")
+            params.append(contains)
+        return " WHERE " + " AND ".join(clauses), params
+
+    def query(self, level: Optional[str] = None, host: Optional[str] = None, start=None, end=None,
+              chunk: Optional[str] = None, contains: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Entries matching every given filter, in log order: ``level`` (case
+        insensitive), ``host`` (host or node), ``start``/``end`` (epoch seconds
+        or text in the profile's timestamp format; end excluded), ``chunk`` and
+        ``contains`` (substring of the message). At most ``limit`` rows.
+        """
+        where, params = self._where(level, host, start, end, chunk, contains)
+        rows = self._connection().execute(
+            f"SELECT chunk, seq, record FROM entries{where} ORDER BY chunk, seq LIMIT ?", params + [int(limit)]
+        ).fetchall()
+        return [{"chunk": chunk, "seq": seq, **json.loads(record)} for chunk, seq, record in rows]
+
+    def count_by(self, column: str, limit: int = 20, **filters) -> List[Dict[str, Any]]:
+        """Entry counts per ``level``, ``host`` or ``chunk`` under the same filters as ``query``, largest first."""
+        if column not in _COUNT_COLUMNS:
+            raise ValueError(f"Cannot count by '{column}'. Expected one of: {', '.join(_COUNT_COLUMNS)}")
+        where, params = self._where(**filters)
+        rows = self._connection().execute(
+            f"SELECT {column}, COUNT(*) AS n FROM entries{where} GROUP BY {column} ORDER BY n DESC LIMIT ?",
+            params + [int(limit)],
+        ).fetchall()
+        return [{column: value, "count": count} for value, count in rows]
+
+    def chunks(self) -> List[str]:
+        return [row[0] for row in self._connection().execute(
+            "SELECT DISTINCT chunk FROM entries WHERE scope = ? ORDER BY chunk", (self.scope,)
+        )]
+
+    def entries(self, chunk: str) -> Optional[List[Dict[str, Any]]]:
+        """A chunk's entries as saved, or None if the chunk is not stored."""
+        rows = self._connection().execute(
+            "SELECT record FROM entries WHERE scope = ? AND chunk = ? ORDER BY seq", (self.scope, chunk)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows] if rows else None
+
+    def anomalies(self, severity: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Stored anomalies in chunk order, each tagged with its ``source_file``
+        and, for near-duplicate cluster representatives, ``cluster_size``.
+        """
+        sql = "SELECT chunk, severity, description, evidence, correlation, cluster_size FROM anomalies WHERE scope = ?"
+        params = [self.scope]
+        if severity:
+            sql += " AND severity = ? COLLATE NOCASE"
+            params.append(severity)
+        result = []
+        for chunk, severity, description, evidence, correlation, cluster_size in self._connection().execute(
+            sql + " ORDER BY chunk, rowid", params
+        ):
+            try:
+                evidence = json.loads(evidence) if evidence else evidence
+            except json.JSONDecodeError:
+                pass
+            anomaly = {
+                "severity": severity, "description": description, "evidence": evidence,
+                "correlation": correlation, "source_file": f"{chunk}_anomaly.json",
+            }
+            if cluster_size:
+                anomaly["cluster_size"] = cluster_size
+            result.append(anomaly)
+        return result
+
+    def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+
+def main(argv=None):
+    import yaml
+
+    parser = argparse.ArgumentParser(description="Query the structured-log store.")
+    parser.add_argument("--config", default="src/log/guardians/app/main/config/chunker_config.yaml")
+    parser.add_argument("--level")
+    parser.add_argument("--host")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--chunk")
+    parser.add_argument("--contains")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--count-by", choices=_COUNT_COLUMNS)
+    parser.add_argument("--anomalies", action="store_true",
+                        help="List stored anomalies instead of entries (--level filters their severity)")
+    args = parser.parse_args(argv)
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    store = LogStore.from_config(dict(config, log_store_enabled=True))
+    if not os.path.exists(store.path):
+        print(f"❌ No log store at {store.path}. Set log_store_enabled: true and run the pipeline.")
+        return 1
+    filters = dict(level=args.level, host=args.host, start=args.start, end=args.end,
+                   chunk=args.chunk, contains=args.contains)
+    if args.anomalies:
+        rows = store.anomalies(args.level)
+    elif args.count_by:
+        rows = store.count_by(args.count_by, args.limit, **filters)
+    else:
+        rows = store.query(limit=args.limit, **filters)
+    for row in rows:
+        print(json.dumps(row, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,74 @@
+"""
+Per-entry template assignments.
+
+With ``template_mining_enabled`` (always on for ``detector_prompt_mode:
+'templates'``), the converter mines the messages of every chunk it saves
+into the profile's shared ``TemplateMiner`` and writes one line per entry,
+``{"template_id": ..., "params": [...]}``, to
+``<template_dir>/<profile>/<chunk>.jsonl``. Parameters are read against the
+templates as they stand once the whole chunk is mined. The detector's
+template prompts reuse these ids instead of mining the chunk again.
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+from src.log.guardians.app.features.parsing.parser_engine import MESSAGE_KEY
+from src.log.guardians.app.features.parsing.record_io import iter_records, strip_record_suffix, write_records
+from src.log.guardians.app.features.templates.drain import TemplateMiner
+
+ASSIGNMENT_KEYS = ["template_id", "params"]
+
+
+def message_key(records: List[Dict[str, Any]]) -> str:
+    """The key holding the free-text message: ``message``, else each record's last key."""
+    keys = list(dict.fromkeys(k for record in records for k in record))
+    return MESSAGE_KEY if MESSAGE_KEY in keys or not keys else keys[-1]
+
+
+def message_text(record: Dict[str, Any], key: str) -> str:
+    value = record.get(key)
+    return "" if value is None else str(value).replace("\n", " ")
+
+
+def assignments_path(config, json_path: str) -> str:
+    table_dir = config.get('template_dir', '.LogGuardians/templates')
+    name = strip_record_suffix(os.path.basename(json_path))
+    return os.path.join(table_dir, config['active_profile'], f"{name}.jsonl")
+
+
+def mine_records(records: List[Any], miner: TemplateMiner) -> List[Dict[str, Any]]:
+    """Mines the messages of a chunk's records; returns each entry's template id and parameters."""
+    records = [r for r in records if isinstance(r, dict)]
+    key = message_key(records)
+    messages = [message_text(record, key) for record in records]
+    template_ids = [miner.add(message)[0] for message in messages]
+    return [
+        {"template_id": template_id, "params": miner.templates[template_id].params(message.split())}
+        for template_id, message in zip(template_ids, messages)
+    ]
+
+
+def save_assignments(config, json_path: str, miner: TemplateMiner) -> Optional[str]:
+    """Mines a saved chunk's entries and writes their assignments. Returns the path, or None."""
+    if not os.path.exists(json_path):
+        return None
+    path = assignments_path(config, json_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_records(path, mine_records(list(iter_records(json_path)), miner), ASSIGNMENT_KEYS)
+    return path
+
+
+def load_template_ids(config, json_path: str, entries: int, miner: TemplateMiner) -> Optional[List[int]]:
+    """
+    The template id of each of a chunk's ``entries`` entries, or None if no
+    assignments match the chunk (missing, another entry count, or ids the
+    miner does not know).
+    """
+    path = assignments_path(config, json_path)
+    if not os.path.exists(path):
+        return None
+    template_ids = [row.get("template_id") for row in iter_records(path)]
+    if len(template_ids) != entries or not all(t in miner.templates for t in template_ids):
+        return None
+    return template_ids
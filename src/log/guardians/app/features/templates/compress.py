@@ -0,0 +1,99 @@
+"""
+Template-compressed prompt text for a chunk of structured log records.
+
+Instead of every record, the prompt lists the chunk's templates with their
+counts, the fields that are constant within each template once, and only the
+distinct rows of the remaining fields and template parameters.
+Ordered columns that differ on nearly every entry (ids, timestamps) are
+summarized by their first and last value instead of repeated on each row.
+"""
+
+import json
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from src.log.guardians.app.features.templates.assignments import message_key as find_message_key
+from src.log.guardians.app.features.templates.drain import WILDCARD, TemplateMiner
+
+# Ordered columns with more distinct values than this share of entries are summarized
+VARYING_COLUMN_RATIO = 0.5
+
+
+def _cell(value: Any) -> str:
+    return "" if value is None else str(value).replace("\n", " ")
+
+
+def _is_ordered(values: List[str]) -> bool:
+    """True if values never decrease (numerically when they are all digits)."""
+    if all(v.isdigit() for v in values):
+        values = [int(v) for v in values]
+    return all(a <= b for a, b in zip(values, values[1:]))
+
+
+def compress_records(records: List[Dict[str, Any]], miner: TemplateMiner, source_name: str,
+                     template_ids: Optional[List[int]] = None) -> str:
+    """
+    Mines ``records``' messages into ``miner`` and returns the compressed text.
+    ``template_ids``, one per dict record, reuses the converter's assignments
+    instead of mining the chunk again.
+    """
+    records = [r for r in records if isinstance(r, dict)]
+    if not records:
+        return f"No log entries in {source_name}."
+
+    keys = list(dict.fromkeys(k for record in records for k in record))
+    message_key = find_message_key(records)
+    other_keys = [k for k in keys if k != message_key]
+
+    varying = []
+    if len(records) > 1:
+        for key in other_keys:
+            values = [_cell(r.get(key)) for r in records]
+            if len(set(values)) > len(records) * VARYING_COLUMN_RATIO and _is_ordered(values):
+                varying.append(key)
+    row_keys = [k for k in other_keys if k not in varying]
+
+    # Mine the whole chunk first: templates may still generalize on later
+    # entries, and parameters must line up with the templates as printed
+    if template_ids is None:
+        template_ids = [miner.add(_cell(record.get(message_key)))[0] for record in records]
+    groups: Dict[int, List[Dict[str, Any]]] = {}
+    for template_id, record in zip(template_ids, records):
+        groups.setdefault(template_id, []).append(record)
+
+    lines = [f"{len(records)} log entries from {source_name}, grouped by message template (<*> = parameter)."]
+    if varying:
+        ranges = ", ".join(
+            f"{k} {_cell(records[0].get(k))} .. {_cell(records[-1].get(k))}" for k in varying
+        )
+        lines.append(f"Per-entry columns (omitted below, first .. last): {ranges}")
+
+    for template_id, group in groups.items():
+        template = miner.templates[template_id]
+        lines.append(f"T{template_id} x{len(group)}: {template.text}")
+        # Columns with one value across the template are printed once
+        constant = {k: _cell(group[0].get(k)) for k in row_keys
+                    if all(_cell(r.get(k)) == _cell(group[0].get(k)) for r in group)}
+        if constant:
+            lines.append("  " + ", ".join(f"{k}={v}" for k, v in constant.items()))
+        columns = [k for k in row_keys if k not in constant]
+        with_params = WILDCARD in template.tokens
+        if not columns and not with_params:
+            continue
+
+        rows = Counter()
+        for record in group:
+            row = tuple(_cell(record.get(k)) for k in columns)
+            if with_params:
+                params = template.params(_cell(record.get(message_key)).split())
+                row += (json.dumps(params, ensure_ascii=False, separators=(",", ":")),)
+            rows[row] += 1
+        header = columns + (["parameters"] if with_params else [])
+        if len(rows) == len(group):
+            # Every row is distinct; a count column would only repeat "1"
+            lines.append("  " + " | ".join(header))
+            lines.extend(f"  {' | '.join(row)}" for row in rows)
+        else:
+            lines.append("  entries | " + " | ".join(header))
+            lines.extend(f"  {count} | {' | '.join(row)}" for row, count in rows.items())
+    return "\n".join(lines)
@@ -0,0 +1,185 @@
+"""
+Drain-style online log template miner.
+
+Messages are routed through a fixed-depth parse tree (token count, then the
+first ``depth - 2`` tokens) to a small leaf of candidate templates, and join
+the most similar one or start a new template. Tokens that differ between
+messages of a template become ``<*>`` wildcards; their values are the entry's
+parameters.
+
+Reference: He et al., "Drain: An Online Log Parsing Approach with Fixed Depth
+Tree" (ICWS 2017).
+"""
+
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+WILDCARD = "<*>"
+_TABLE_VERSION = 1
+# One miner per template table in this process, shared by the converter and detector
+_SHARED: Dict[str, "TemplateMiner"] = {}
+
+
+def table_path(config) -> str:
+    """The active profile's template table under ``template_dir``."""
+    table_dir = config.get('template_dir', '.LogGuardians/templates')
+    return os.path.join(table_dir, f"{config['active_profile']}.json")
+
+
+def _has_digit(token: str) -> bool:
+    return any(c.isdigit() for c in token)
+
+
+class Template:
+    __slots__ = ("template_id", "tokens", "count", "path")
+
+    def __init__(self, template_id: int, tokens: List[str], path: Tuple[str, ...], count: int = 0):
+        self.template_id = template_id
+        self.tokens = tokens
+        self.path = path
+        self.count = count
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.tokens)
+
+    def similarity(self, tokens: List[str]) -> Tuple[float, int]:
+        """(share of positions equal to ``tokens``, number of wildcards)."""
+        same = wildcards = 0
+        for template_token, token in zip(self.tokens, tokens):
+            if template_token == WILDCARD:
+                wildcards += 1
+            elif template_token == token:
+                same += 1
+        return (same / len(tokens) if tokens else 1.0), wildcards
+
+    def params(self, tokens: List[str]) -> List[str]:
+        return [token for template_token, token in zip(self.tokens, tokens) if template_token == WILDCARD]
+
+
+class TemplateMiner:
+    """
+    Mines templates online and keeps them in a JSON table at ``table_path``,
+    so template ids stay stable across chunks and runs.
+
+    Args:
+        depth: Depth of the parse tree (>= 3); ``depth - 2`` leading tokens
+            are used for routing.
+        sim_threshold: Minimum share of matching tokens to join a template.
+        max_children: Routing children per node; further tokens share the
+            ``<*>`` child.
+    """
+
+    def __init__(self, table_path: Optional[str] = None, depth: int = 4,
+                 sim_threshold: float = 0.4, max_children: int = 100):
+        self.table_path = table_path
+        self.depth = max(3, depth)
+        self.sim_threshold = sim_threshold
+        self.max_children = max_children
+        self.templates: Dict[int, Template] = {}
+        self._root: Dict = {}
+        if table_path and os.path.exists(table_path):
+            self._load()
+
+    @classmethod
+    def from_config(cls, config) -> "TemplateMiner":
+        return cls(
+            table_path(config),
+            int(config.get('template_depth', 4)),
+            float(config.get('template_similarity', 0.4)),
+        )
+
+    @classmethod
+    def shared(cls, config) -> "TemplateMiner":
+        """The process-wide miner of the configured table, so ids agree between stages."""
+        path = table_path(config)
+        if path not in _SHARED:
+            _SHARED[path] = cls.from_config(config)
+        return _SHARED[path]
+
+    # --- tree ---
+
+    def _route(self, tokens: List[str]) -> Tuple[Tuple[str, ...], List[Template]]:
+        """Walks (and grows) the tree for ``tokens``; returns (path, leaf templates)."""
+        key = str(len(tokens))
+        path = [key]
+        node = self._root.setdefault(key, {})
+
+        for token in tokens[:self.depth - 2]:
+            if _has_digit(token):
+                token = WILDCARD
+            if token not in node and len(node) >= self.max_children - 1:
+                token = WILDCARD  # the last slot is kept for the wildcard child
+            path.append(token)
+            node = node.setdefault(token, {})
+
+        return tuple(path), node.setdefault(None, [])
+
+    def _insert(self, template: Template):
+        node = self._root
+        for key in template.path:
+            node = node.setdefault(key, {})
+        node.setdefault(None, []).append(template)
+        self.templates[template.template_id] = template
+
+    @staticmethod
+    def _best(leaf: List[Template], tokens: List[str], threshold: float) -> Optional[Template]:
+        best, best_score = None, (-1.0, -1)
+        for template in leaf:
+            score = template.similarity(tokens)
+            if score > best_score:
+                best, best_score = template, score
+        if best is not None and best_score[0] >= threshold:
+            return best
+        return None
+
+    # --- mining ---
+
+    def add(self, message: str) -> Tuple[int, List[str]]:
+        """
+        Adds one message to the table.
+
+        Returns:
+            (template id, parameter values at the template's wildcards)
+        """
+        tokens = message.split()
+        path, leaf = self._route(tokens)
+        template = self._best(leaf, tokens, self.sim_threshold)
+        if template is None:
+            template = Template(len(self.templates) + 1, list(tokens), path)
+            leaf.append(template)
+            self.templates[template.template_id] = template
+        else:
+            template.tokens = [
+                t if t == token else WILDCARD for t, token in zip(template.tokens, tokens)
+            ]
+        template.count += 1
+        return template.template_id, template.params(tokens)
+
+    # --- persistence ---
+
+    def _load(self):
+        with open(self.table_path, 'r') as f:
+            table = json.load(f)
+        if table.get('version') != _TABLE_VERSION:
+            print(f"⚠️  Ignoring template table {self.table_path} with an unknown version")
+            return
+        for entry in table['templates']:
+            self._insert(Template(entry['id'], entry['tokens'], tuple(entry['path']), entry['count']))
+
+    def save(self):
+        if not self.table_path:
+            return
+        os.makedirs(os.path.dirname(self.table_path), exist_ok=True)
+        table = {
+            'version': _TABLE_VERSION,
+            'templates': [
+                {'id': t.template_id, 'count': t.count, 'tokens': t.tokens, 'path': list(t.path)}
+                for t in sorted(self.templates.values(), key=lambda t: t.template_id)
+            ],
+        }
+        tmp_path = self.table_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(table, f)
+        os.replace(tmp_path, self.table_path)
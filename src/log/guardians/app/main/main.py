@@ -8,6 +8,7 @@ This module orchestrates the complete log analysis pipeline:
 4. Generate consolidated report
 """
 
+import argparse
 import asyncio
 import sys
 import os
@@ -16,6 +17,9 @@ import os
 sys.path.append(os.getcwd())
 
 from src.log.guardians.app.features.chunking.chunker import load_config, chunk_log_file
+from src.log.guardians.app.features.chunking.follow import follow_log_file
+from src.log.guardians.app.main.streaming_pipeline import run_streaming_pipeline
+from src.log.guardians.app.utils.metrics import tracer
 
 
 async def run_pipeline():
@@ -31,6 +35,7 @@ async def run_pipeline():
         print("\n📝 STEP 1: Generating and Chunking Logs...")
         print("-" * 80)
         config = load_config('src/log/guardians/app/main/config/chunker_config.yaml')
+        tracer.configure(config)
         chunk_log_file(config)
         print("✅ Log chunking completed.")
 
@@ -55,6 +60,8 @@ async def run_pipeline():
         await run_report_generation()
         print("✅ Report generation completed.")
 
+        print("\n" + tracer.summary())
+
         print("\n" + "=" * 80)
         print("🎉 PIPELINE COMPLETED SUCCESSFULLY!")
         print("=" * 80)
@@ -67,9 +74,50 @@ async def run_pipeline():
         sys.exit(1)
 
 
+async def run_follow_pipeline():
+    """
+    Follows the configured input log and sends every new chunk through
+    conversion and anomaly detection as soon as it closes.
+    """
+    print("=" * 80)
+    print("👀 LOG GUARDIANS PIPELINE (Follow Mode)")
+    print("=" * 80)
+
+    from src.log.guardians.app.agent.json_converter_agent import run_conversion
+    from src.log.guardians.app.agent.anomaly_detection_agent import run_anomaly_detection
+    from src.log.guardians.app.agent.tools import json_output_path
+
+    async def analyze_new_chunks(chunk_paths):
+        await run_conversion(chunk_paths)
+        json_files = [json_output_path(path) for path in chunk_paths]
+        await run_anomaly_detection([path for path in json_files if os.path.exists(path)])
+
+    config = load_config('src/log/guardians/app/main/config/chunker_config.yaml')
+    tracer.configure(config)
+    await follow_log_file(config, analyze_new_chunks)
+
+
 def main():
     """Entry point for the pipeline."""
-    asyncio.run(run_pipeline())
+    parser = argparse.ArgumentParser(description="Log Guardians pipeline")
+    parser.add_argument(
+        "--follow", action="store_true",
+        help="Keep following the input log and analyze new chunks as they are written",
+    )
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Overlap all stages through bounded queues (same as pipeline_mode: 'streaming')",
+    )
+    args = parser.parse_args()
+    if args.follow:
+        asyncio.run(run_follow_pipeline())
+        return
+
+    config = load_config('src/log/guardians/app/main/config/chunker_config.yaml')
+    if args.stream or config.get('pipeline_mode', 'staged') == 'streaming':
+        asyncio.run(run_streaming_pipeline(config))
+    else:
+        asyncio.run(run_pipeline())
 
 
 if __name__ == "__main__":
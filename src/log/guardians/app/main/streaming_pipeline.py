@@ -0,0 +1,144 @@
+"""
+Log Guardians Streaming Pipeline
+
+Runs the same four stages as `run_pipeline`, overlapped instead of one after
+another. Chunks flow through bounded asyncio queues:
+
+    chunker -> converter workers -> detector workers -> report aggregator
+
+Each stage starts on the first chunk as soon as it exists, and a full queue
+blocks the stage feeding it, so memory stays flat however large the input.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# Ensure we can import modules from src when running from project root
+sys.path.append(os.getcwd())
+
+from src.log.guardians.app.features.chunking.chunker import load_config, chunk_log_file
+from src.log.guardians.app.utils.metrics import tracer
+
+CONFIG_PATH = 'src/log/guardians/app/main/config/chunker_config.yaml'
+
+# Queue sentinel telling a worker its upstream stage has finished
+_DONE = object()
+
+
+async def run_streaming_pipeline(config=None):
+    """
+    Executes the pipeline with all stages running concurrently.
+
+    Returns a dict of stage name -> {chunk path: error} for chunks that failed
+    after all retries; failed chunks are dropped from later stages only.
+    """
+    from src.log.guardians.app.agent.json_converter_agent import ChunkConverter, retry_config
+    from src.log.guardians.app.agent.anomaly_detection_agent import AnomalyDetector
+    from src.log.guardians.app.agent.report_generator_agent import run_report_generation
+    from src.log.guardians.app.agent.tools import anomaly_output_path
+    from src.log.guardians.app.utils.async_pool import call_with_retries
+
+    config = config or load_config(CONFIG_PATH)
+    tracer.configure(config)
+    queue_size = int(config.get('stream_queue_size', 16))
+    concurrency = max(1, int(config.get('agent_concurrency', 1)))
+
+    chunk_queue = asyncio.Queue(maxsize=queue_size)
+    json_queue = asyncio.Queue(maxsize=queue_size)
+    result_queue = asyncio.Queue(maxsize=queue_size)
+    failures = {'converter': {}, 'detector': {}}
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+
+    converter = ChunkConverter(config)
+    detector = AnomalyDetector(config)
+    print("\n🧩 Preparing converter...")
+    with tracer.stage("conversion"):
+        await converter.prepare()
+
+    chunk_count = 0
+
+    def on_chunk(path):
+        # Called on the chunker thread; blocks while the queue is full (backpressure)
+        nonlocal chunk_count
+        asyncio.run_coroutine_threadsafe(chunk_queue.put((chunk_count, path)), loop).result()
+        chunk_count += 1
+
+    async def chunk_stage():
+        try:
+            await asyncio.to_thread(chunk_log_file, config, on_chunk)
+        finally:
+            for _ in range(concurrency):
+                await chunk_queue.put(_DONE)
+
+    async def convert_worker(slot):
+        while (item := await chunk_queue.get()) is not _DONE:
+            index, path = item
+            try:
+                json_path = await call_with_retries(retry_config, converter.convert, slot, path, index)
+            except Exception as e:
+                failures['converter'][path] = f"{type(e).__name__}: {e}"
+                continue
+            await json_queue.put((index, json_path))
+
+    @tracer.traced("conversion")
+    async def convert_stage():
+        try:
+            await asyncio.gather(*(convert_worker(slot) for slot in range(concurrency)))
+        finally:
+            converter.close()
+            for _ in range(concurrency):
+                await json_queue.put(_DONE)
+
+    async def detect_worker(slot):
+        while (item := await json_queue.get()) is not _DONE:
+            index, json_path = item
+            try:
+                result = await call_with_retries(retry_config, detector.analyze, slot, json_path, index)
+            except Exception as e:
+                failures['detector'][json_path] = f"{type(e).__name__}: {e}"
+                continue
+            await result_queue.put((index, json_path, result))
+
+    @tracer.traced("detection")
+    async def detect_stage():
+        try:
+            await asyncio.gather(*(detect_worker(slot) for slot in range(concurrency)))
+        finally:
+            await result_queue.put(_DONE)
+
+    async def aggregate_stage():
+        by_chunk = {}
+        while (item := await result_queue.get()) is not _DONE:
+            index, json_path, result = item
+            report = result.get('report')
+            if not report or not report.get('anomalies'):
+                continue
+            if not by_chunk:
+                print(f"\n⏱️  First anomaly after {time.perf_counter() - started:.1f}s")
+            source_file = os.path.basename(anomaly_output_path(os.path.basename(json_path)))
+            for anomaly in report['anomalies']:
+                anomaly["source_file"] = source_file
+            by_chunk[index] = report['anomalies']
+        # Chunks finish out of order; report in chunk order so runs are reproducible
+        return [anomaly for index in sorted(by_chunk) for anomaly in by_chunk[index]]
+
+    print(f"\n🌊 Streaming {config['input_log_file']} ({concurrency} workers per stage, queue size {queue_size})")
+    _, _, _, aggregated = await asyncio.gather(
+        chunk_stage(), convert_stage(), detect_stage(), aggregate_stage()
+    )
+    print(f"\n✅ {chunk_count} chunks streamed in {time.perf_counter() - started:.1f}s")
+    converter.summary()
+    detector.summary()
+
+    for stage, stage_failures in failures.items():
+        if stage_failures:
+            print(f"⚠️  {len(stage_failures)} chunks failed in the {stage} stage:")
+            for path, error in stage_failures.items():
+                print(f"  - {os.path.basename(path)}: {error}")
+
+    await run_report_generation(aggregated)
+    print("\n" + tracer.summary())
+    return failures
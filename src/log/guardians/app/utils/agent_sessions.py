@@ -0,0 +1,120 @@
+import json
+import os
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+SESSION_STRATEGIES = ("per_chunk", "bounded", "per_worker")
+
+# run_debug's default user id; sessions are created under it
+DEBUG_USER_ID = "debug_user_id"
+
+
+class SessionStrategy:
+    """
+    Decides which runner session each chunk is sent on.
+
+    * ``per_chunk``: a fresh session per chunk, deleted afterwards, so every
+      call sends only its own prompt (plus whatever the caller puts in it,
+      such as the designed schema).
+    * ``bounded``: one session per pool worker, recycled after
+      ``max_chunks`` chunks so history can never grow past that many turns.
+    * ``per_worker``: one session per pool worker for the whole run. Context
+      grows with every chunk; kept for comparison.
+    """
+
+    def __init__(self, runner, stage: str, strategy: str = "per_chunk", max_chunks: int = 10):
+        if strategy not in SESSION_STRATEGIES:
+            raise ValueError(f"Unknown session_strategy '{strategy}'. Expected one of: {', '.join(SESSION_STRATEGIES)}")
+        self.runner = runner
+        self.stage = stage
+        self.strategy = strategy
+        self.max_chunks = max(1, max_chunks)
+        self._worker_usage: Dict[int, int] = {}
+        self._worker_generation: Dict[int, int] = {}
+
+    @classmethod
+    def from_config(cls, runner, stage: str, config: Dict[str, Any]) -> "SessionStrategy":
+        return cls(
+            runner,
+            stage,
+            config.get("session_strategy", "per_chunk"),
+            int(config.get("session_max_chunks", 10)),
+        )
+
+    async def acquire(self, slot: int, index: int) -> str:
+        """Returns the session id to use for chunk ``index`` on pool worker ``slot``."""
+        if self.strategy == "per_chunk":
+            return f"{self.stage}_chunk_{index}"
+
+        if self.strategy == "bounded":
+            used = self._worker_usage.get(slot, 0)
+            if used >= self.max_chunks:
+                await self._delete(self._worker_session(slot))
+                self._worker_generation[slot] = self._worker_generation.get(slot, 0) + 1
+                used = 0
+            self._worker_usage[slot] = used + 1
+
+        return self._worker_session(slot)
+
+    async def release(self, session_id: str):
+        """Frees a session once its chunk is done (only per_chunk sessions are dropped)."""
+        if self.strategy == "per_chunk":
+            await self._delete(session_id)
+
+    def _worker_session(self, slot: int) -> str:
+        return f"{self.stage}_worker_{slot}_{self._worker_generation.get(slot, 0)}"
+
+    async def _delete(self, session_id: str):
+        try:
+            await self.runner.session_service.delete_session(
+                app_name=self.runner.app_name, user_id=DEBUG_USER_ID, session_id=session_id
+            )
+        except Exception:
+            pass
+
+
+def prompt_tokens(events) -> Optional[int]:
+    """Largest prompt_token_count among a call's events, i.e. the context size sent."""
+    counts = [
+        event.usage_metadata.prompt_token_count
+        for event in events
+        if getattr(event, "usage_metadata", None) and event.usage_metadata.prompt_token_count
+    ]
+    return max(counts) if counts else None
+
+
+class ContextMeter:
+    """
+    Records the context size of every agent call so growth across a run is
+    visible. Samples are appended to ``.LogGuardians/context_usage.jsonl``.
+    """
+
+    def __init__(self, stage: str, log_path: str = ".LogGuardians/context_usage.jsonl"):
+        self.stage = stage
+        self.log_path = log_path
+        self.samples: List[int] = []
+
+    def record(self, index: int, session_id: str, events) -> Optional[int]:
+        tokens = prompt_tokens(events)
+        if tokens is None:
+            return None
+        self.samples.append(tokens)
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        with open(self.log_path, "a") as f:
+            f.write(json.dumps({
+                "stage": self.stage, "chunk": index, "session_id": session_id,
+                "prompt_tokens": tokens, "time": time.time(),
+            }) + "\n")
+        return tokens
+
+    def summary(self) -> str:
+        if not self.samples:
+            return f"📏 {self.stage}: no token usage reported."
+        first = self.samples[: max(1, len(self.samples) // 10)]
+        last = self.samples[-len(first):]
+        return (
+            f"📏 {self.stage} context per call: mean {statistics.mean(self.samples):.0f}, "
+            f"max {max(self.samples)} tokens; first 10% avg {statistics.mean(first):.0f} -> "
+            f"last 10% avg {statistics.mean(last):.0f} over {len(self.samples)} calls"
+        )
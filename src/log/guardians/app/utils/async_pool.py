@@ -0,0 +1,130 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.log.guardians.app.utils.metrics import tracer
+from src.log.guardians.app.utils.token_budget import pack_first_fit_decreasing
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(retry_options, attempt: int) -> float:
+    """
+    Seconds to wait before retry number ``attempt`` (1-based), following the
+    same exponential schedule as ``types.HttpRetryOptions``.
+    """
+    initial_delay = getattr(retry_options, 'initial_delay', None) or 1.0
+    exp_base = getattr(retry_options, 'exp_base', None) or 2.0
+    max_delay = getattr(retry_options, 'max_delay', None) or 60.0
+    return min(initial_delay * exp_base ** (attempt - 1), max_delay)
+
+
+def retried_by_client(retry_options, error: BaseException) -> bool:
+    """
+    True for HTTP errors whose status the model client already retries on
+    ``retry_options`` (``http_status_codes``): by the time one reaches the
+    caller, the client has used all its attempts.
+    """
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    return code is not None and code in (getattr(retry_options, 'http_status_codes', None) or ())
+
+
+async def call_with_retries(retry_options, fn: Callable[..., Awaitable[Any]], *args) -> Any:
+    """
+    Awaits ``fn(*args)``, retrying failures on the ``retry_options`` schedule.
+
+    Only failures the model client does not retry itself (e.g. an agent that
+    finished without saving its output) are retried here; HTTP errors the
+    client retries on the same options are re-raised at once, so a
+    rate-limited call is not retried attempts x attempts times. The last
+    exception is re-raised once all attempts are used.
+    """
+    attempts = max(1, getattr(retry_options, 'attempts', None) or 1)
+    for attempt in range(1, attempts + 1):
+        try:
+            return await fn(*args)
+        except Exception as e:
+            if attempt == attempts or retried_by_client(retry_options, e):
+                raise
+            delay = retry_delay(retry_options, attempt)
+            tracer.count("retries")
+            logger.warning(f"Call failed ({e}); retry {attempt}/{attempts - 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def run_bounded(
+    items: Sequence[Any],
+    worker: Callable[[int, Any, int], Awaitable[Any]],
+    concurrency: int,
+    retry_options=None,
+) -> Tuple[List[Any], Dict[int, str]]:
+    """
+    Runs ``worker(slot, item, index)`` for every item with at most
+    ``concurrency`` calls in flight.
+
+    ``slot`` identifies the pool worker running the call (0..concurrency-1),
+    which callers can use to keep per-worker state such as a session id.
+    Failed calls are retried following ``retry_options`` (an
+    ``HttpRetryOptions``), except for errors the model client already retried
+    (see ``call_with_retries``); an item that still fails is recorded on its
+    own and does not stop the others.
+
+    Returns:
+        (results, failures). ``results`` is in the same order as ``items``,
+        with None for failed items; ``failures`` maps item index -> error.
+    """
+    results: List[Optional[Any]] = [None] * len(items)
+    failures: Dict[int, str] = {}
+    queue: asyncio.Queue = asyncio.Queue()
+    for index, item in enumerate(items):
+        queue.put_nowait((index, item))
+
+    async def _worker(slot: int):
+        while True:
+            try:
+                index, item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                results[index] = await call_with_retries(retry_options, worker, slot, item, index)
+            except Exception as e:
+                failures[index] = f"{type(e).__name__}: {e}"
+
+    concurrency = max(1, min(concurrency, len(items) or 1))
+    await asyncio.gather(*(_worker(slot) for slot in range(concurrency)))
+    return results, failures
+
+
+async def run_batched(
+    items: Sequence[Any],
+    sizes: Sequence[int],
+    budget: int,
+    worker: Callable[[int, List[Any], int], Awaitable[List[Any]]],
+    concurrency: int,
+    retry_options=None,
+) -> Tuple[List[Any], Dict[int, str]]:
+    """
+    Like ``run_bounded``, but packs items into batches whose total ``sizes``
+    fit ``budget`` (first-fit decreasing) and calls
+    ``worker(slot, batch, batch_index)`` once per batch. The worker returns
+    one result per item of its batch, in batch order.
+
+    Returns:
+        (results, failures) per item, as ``run_bounded``. Every item of a
+        batch that failed after all retries gets that batch's error.
+    """
+    batches = pack_first_fit_decreasing(sizes, budget)
+    logger.info(f"Packed {len(items)} items into {len(batches)} batches (budget {budget})")
+    batch_results, batch_failures = await run_bounded(
+        [[items[i] for i in batch] for batch in batches], worker, concurrency, retry_options
+    )
+
+    results: List[Optional[Any]] = [None] * len(items)
+    failures: Dict[int, str] = {}
+    for b, batch in enumerate(batches):
+        if b in batch_failures:
+            failures.update((i, batch_failures[b]) for i in batch)
+        else:
+            for i, result in zip(batch, batch_results[b]):
+                results[i] = result
+    return results, failures
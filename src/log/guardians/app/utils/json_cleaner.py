@@ -1,26 +1,121 @@
 import re
 import json
 import logging
+from typing import Any, Iterator, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
-def clean_json_content(raw_content: str) -> str:
-        """Extract valid JSON object from raw LLM output and return compact JSON string."""
-        content = re.sub(r'```json', '', raw_content, flags=re.IGNORECASE)
-        content = re.sub(r'```', '', content)
+_decoder = json.JSONDecoder()
+# Where a JSON value may start; code fences and prose around it are skipped over
+_CANDIDATE = re.compile(r'[\[{]')
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def _is_truncation(error: json.JSONDecodeError, text: str) -> bool:
+    """True if decoding failed because the text ended, not because it is malformed."""
+    return error.pos >= len(text.rstrip()) or error.msg.startswith("Unterminated string")
 
-        # Find the first { ... } or [ ... ]
-        match = re.search(r'(\{.*\}|\[.*\])', content, flags=re.DOTALL)
-        if not match:
-            logger.warning("No JSON block found in LLM output")
-            return json.dumps({"Response": content.strip()})  # fallback
 
-        json_str = match.group(0).strip()
+def _recover_truncated(text: str, start: int) -> Optional[Tuple[Any, int]]:
+    """
+    Salvages a value cut off at the end of ``text``.
 
+    A truncated array keeps every element that completed; a truncated object
+    keeps every key/value pair that completed. When an object's last value is
+    itself a cut-off array or object (e.g. ``{"anomalies": [...``), it is
+    recovered the same way and kept. Returns the value and the number of
+    complete items in the innermost truncated array or object, or None if the
+    value is malformed rather than truncated.
+    """
+    is_array = text[start] == '['
+    value = [] if is_array else {}
+    pos = start + 1
+    while True:
+        pos = _WHITESPACE.match(text, pos).end()
+        if pos >= len(text):
+            return value, len(value)
         try:
-            parsed_json = json.loads(json_str)
-            # Return COMPACT JSON string (no indent!) → safe for json.loads()
-            return json.dumps(parsed_json)
+            if is_array:
+                item, pos = _decoder.raw_decode(text, pos)
+                value.append(item)
+            else:
+                key, pos = _decoder.raw_decode(text, pos)
+                pos = _WHITESPACE.match(text, pos).end()
+                if pos >= len(text):
+                    return value, len(value)
+                if not isinstance(key, str) or text[pos] != ':':
+                    return None
+                pos = _WHITESPACE.match(text, pos + 1).end()
+                try:
+                    item, pos = _decoder.raw_decode(text, pos)
+                except json.JSONDecodeError as e:
+                    if pos < len(text) and text[pos] in '[{' and _is_truncation(e, text):
+                        recovered = _recover_truncated(text, pos)
+                        if recovered is None:
+                            return None
+                        value[key] = recovered[0]
+                        return value, recovered[1]
+                    raise
+                value[key] = item
         except json.JSONDecodeError as e:
-            logger.warning(f"Failed to parse JSON block: {e}\nBlock: {json_str[:200]}")
-            return json.dumps({"Response": json_str})  # safe fallback
\ No newline at end of file
+            return (value, len(value)) if _is_truncation(e, text) else None
+
+        pos = _WHITESPACE.match(text, pos).end()
+        if pos >= len(text):
+            return value, len(value)
+        if text[pos] != ',':
+            return None
+        pos += 1
+
+
+def iter_json_values(raw_content: str, recover_truncated: bool = True) -> Iterator[Tuple[Any, int]]:
+    """
+    Yields ``(value, start offset)`` for each top-level JSON object or array
+    embedded in ``raw_content``, left to right.
+
+    Each ``{`` or ``[`` is tried with ``JSONDecoder.raw_decode``; text that
+    does not decode is skipped, so prose, code fences and stray braces around
+    the JSON do not matter. With ``recover_truncated``, a value cut off at the
+    end of the text is yielded with its completed elements.
+    """
+    pos = 0
+    while True:
+        match = _CANDIDATE.search(raw_content, pos)
+        if not match:
+            return
+        start = match.start()
+        try:
+            value, pos = _decoder.raw_decode(raw_content, start)
+        except json.JSONDecodeError as e:
+            if recover_truncated and _is_truncation(e, raw_content):
+                recovered = _recover_truncated(raw_content, start)
+                if recovered is not None:
+                    value, complete = recovered
+                    logger.warning(f"Recovered truncated JSON with {complete} complete items")
+                    yield value, start
+                    return
+            pos = start + 1
+            continue
+        yield value, start
+
+
+def extract_json(raw_content: str, default: Any = None) -> Any:
+    """
+    Returns the first JSON object or array in raw LLM output as Python data,
+    or ``default`` if there is none.
+    """
+    for value, _ in iter_json_values(raw_content):
+        return value
+    logger.warning("No JSON block found in LLM output")
+    return default
+
+
+def clean_json_content(raw_content: str) -> str:
+        """Extract valid JSON object from raw LLM output and return compact JSON string."""
+        value = extract_json(raw_content)
+        if value is None:
+            content = re.sub(r'```(json)?', '', raw_content, flags=re.IGNORECASE)
+            return json.dumps({"Response": content.strip()})  # fallback
+
+        # Return COMPACT JSON string (no indent!) → safe for json.loads()
+        return json.dumps(value)
@@ -0,0 +1,252 @@
+import asyncio
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import statistics
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+PROFILERS = ("none", "cprofile", "tracemalloc")
+
+# Stage that the running code belongs to; copied into asyncio tasks and
+# asyncio.to_thread calls, so workers report to the stage that started them
+_current_stage: contextvars.ContextVar[str] = contextvars.ContextVar("stage", default="unstaged")
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """True for HTTP 429 / RESOURCE_EXHAUSTED errors from the model API."""
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    text = str(error)
+    return "429" in text or "RESOURCE_EXHAUSTED" in text
+
+
+def _usage(events) -> Dict[str, int]:
+    """Sums token usage over every model response among a call's events."""
+    usage = {"model_calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    for event in events or []:
+        metadata = getattr(event, "usage_metadata", None)
+        if not metadata:
+            continue
+        usage["model_calls"] += 1
+        usage["prompt_tokens"] += getattr(metadata, "prompt_token_count", None) or 0
+        usage["completion_tokens"] += getattr(metadata, "candidates_token_count", None) or 0
+    return usage
+
+
+class _StageStats:
+    def __init__(self):
+        self.wall_s = 0.0
+        self.runs = 0
+        self.latencies: List[float] = []
+        self.counters: Dict[str, int] = {}
+
+    def add(self, name: str, n: int):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+
+class Tracer:
+    """
+    Collects pipeline metrics and appends them as JSON lines to ``trace_path``.
+
+    Every event carries the run id and the stage it belongs to: stage wall
+    times (``stage``), one ``llm_call`` per agent call with its latency and
+    token usage, and at the end a ``summary`` with per-stage counters
+    (retries, 429s, bytes read/written, cache hits/misses).
+
+    ``profiler`` optionally wraps every stage in cProfile (top functions by
+    cumulative time) or tracemalloc (peak memory and top allocation sites),
+    written to ``profile_dir``. cProfile can only watch one stage at a time,
+    so overlapping streaming stages are profiled first come, first served.
+    """
+
+    def __init__(self, trace_path: Optional[str] = ".LogGuardians/trace.jsonl", profiler: str = "none",
+                 profile_dir: str = ".LogGuardians/profiles"):
+        self.trace_path = trace_path
+        self.profiler = profiler
+        self.profile_dir = profile_dir
+        self.run_id = uuid.uuid4().hex[:12]
+        self.stages: Dict[str, _StageStats] = {}
+        self._lock = threading.Lock()
+        self._cprofile_busy = False
+        self._profile_count = 0
+
+    def configure(self, config):
+        profiler = config.get('profile_stages', 'none') or 'none'
+        if profiler not in PROFILERS:
+            raise ValueError(f"Unknown profile_stages '{profiler}'. Expected one of: {', '.join(PROFILERS)}")
+        self.trace_path = config.get('metrics_trace_file', '.LogGuardians/trace.jsonl') or None
+        self.profiler = profiler
+        self.profile_dir = config.get('profile_dir', '.LogGuardians/profiles')
+
+    # --- recording ---
+
+    def _stats(self, stage: str) -> _StageStats:
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = _StageStats()
+        return stats
+
+    def emit(self, event_type: str, **fields):
+        if not self.trace_path:
+            return
+        record = {"type": event_type, "run": self.run_id, "stage": _current_stage.get(), "time": time.time()}
+        record.update(fields)
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.trace_path) or ".", exist_ok=True)
+            with open(self.trace_path, "a") as f:
+                f.write(line)
+
+    def count(self, name: str, n: int = 1):
+        """Adds ``n`` to counter ``name`` of the current stage."""
+        with self._lock:
+            self._stats(_current_stage.get()).add(name, n)
+
+    def llm_call(self, chunk: Optional[int], latency_s: float, events=None, error: BaseException = None,
+                 session_id: Optional[str] = None):
+        usage = _usage(events)
+        with self._lock:
+            stats = self._stats(_current_stage.get())
+            stats.latencies.append(latency_s)
+            for name, value in usage.items():
+                stats.add(name, value)
+            if error is not None:
+                stats.add("llm_errors", 1)
+                if is_rate_limited(error):
+                    stats.add("rate_limited", 1)
+        self.emit(
+            "llm_call", chunk=chunk, session_id=session_id, latency_s=round(latency_s, 4),
+            ok=error is None, error=f"{type(error).__name__}: {error}" if error is not None else None,
+            **usage,
+        )
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times (and optionally profiles) a pipeline stage; code inside reports to it."""
+        token = _current_stage.set(name)
+        profile = self._start_profile()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_s = time.perf_counter() - started
+            profile_path = self._stop_profile(profile, name)
+            with self._lock:
+                stats = self._stats(name)
+                stats.wall_s += wall_s
+                stats.runs += 1
+            self.emit("stage", wall_s=round(wall_s, 4), profile=profile_path)
+            _current_stage.reset(token)
+
+    def traced(self, name: str):
+        """Decorator running a (sync or async) function as stage ``name``."""
+        def decorate(fn):
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.stage(name):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    # --- profiling ---
+
+    def _start_profile(self):
+        if self.profiler == "cprofile":
+            with self._lock:
+                if self._cprofile_busy:
+                    return None
+                self._cprofile_busy = True
+            profile = cProfile.Profile()
+            profile.enable()
+            return profile
+        if self.profiler == "tracemalloc":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+            tracemalloc.reset_peak()
+            return "tracemalloc"
+        return None
+
+    def _stop_profile(self, profile, stage: str) -> Optional[str]:
+        if profile is None:
+            return None
+        os.makedirs(self.profile_dir, exist_ok=True)
+        with self._lock:
+            self._profile_count += 1
+            base = os.path.join(self.profile_dir, f"{self.run_id}_{self._profile_count:02d}_{stage}")
+        if isinstance(profile, cProfile.Profile):
+            profile.disable()
+            with self._lock:
+                self._cprofile_busy = False
+            profile.dump_stats(base + ".prof")
+            text = io.StringIO()
+            pstats.Stats(profile, stream=text).sort_stats("cumulative").print_stats(30)
+            with open(base + ".txt", "w") as f:
+                f.write(text.getvalue())
+            return base + ".prof"
+
+        _, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics("lineno")[:30]
+        with open(base + ".txt", "w") as f:
+            f.write(f"Peak traced memory: {peak / 1024 / 1024:.1f} MB\n\n")
+            f.writelines(f"{stat}\n" for stat in top)
+        return base + ".txt"
+
+    # --- reporting ---
+
+    def summary(self) -> str:
+        """Writes a ``summary`` event and returns the per-stage table as text."""
+        header = (f"{'stage':<12} {'wall s':>8} {'LLM calls':>9} {'p50 s':>7} {'p95 s':>7} {'prompt tok':>11} "
+                  f"{'compl tok':>10} {'retries':>7} {'429s':>5} {'read MB':>8} {'write MB':>8} {'cache hit/miss':>14}")
+        lines = ["📊 Pipeline metrics", header, "-" * len(header)]
+        stages = {}
+        with self._lock:
+            items = list(self.stages.items())
+        for name, stats in items:
+            c = stats.counters
+            latencies = sorted(stats.latencies)
+            p50 = statistics.median(latencies) if latencies else 0.0
+            p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else 0.0
+            stages[name] = dict(c, wall_s=round(stats.wall_s, 4), llm_calls=len(latencies),
+                                latency_p50_s=round(p50, 4), latency_p95_s=round(p95, 4))
+            lines.append(
+                f"{name:<12} {stats.wall_s:>8.2f} {len(latencies):>9} {p50:>7.2f} {p95:>7.2f} "
+                f"{c.get('prompt_tokens', 0):>11} {c.get('completion_tokens', 0):>10} {c.get('retries', 0):>7} "
+                f"{c.get('rate_limited', 0):>5} {c.get('bytes_read', 0) / 1048576:>8.2f} "
+                f"{c.get('bytes_written', 0) / 1048576:>8.2f} "
+                f"{str(c.get('cache_hits', 0)) + '/' + str(c.get('cache_misses', 0)):>14}"
+            )
+        self.emit("summary", stages=stages)
+        if self.trace_path:
+            lines.append(f"Trace: {os.path.abspath(self.trace_path)} (run {self.run_id})")
+        return "\n".join(lines)
+
+
+tracer = Tracer()
+
+
+async def timed_run(runner, message: str, chunk: Optional[int] = None, **kwargs):
+    """``runner.run_debug`` that records the call's latency and token usage."""
+    started = time.perf_counter()
+    try:
+        events = await runner.run_debug(message, **kwargs)
+    except Exception as e:
+        tracer.llm_call(chunk, time.perf_counter() - started, error=e, session_id=kwargs.get('session_id'))
+        raise
+    tracer.llm_call(chunk, time.perf_counter() - started, events, session_id=kwargs.get('session_id'))
+    return events
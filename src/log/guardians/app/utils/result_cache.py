@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+from typing import Any, Optional
+
+from src.log.guardians.app.utils.metrics import tracer
+
+
+class ResultCache:
+    """
+    Content-addressed, size-bounded on-disk cache for stage results.
+
+    Entries are JSON files named by a SHA-256 key (see ``make_key``) under
+    ``<cache_dir>/<stage>/``. Reads refresh an entry's mtime and writes evict
+    the least recently used entries once the stage exceeds ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir: str, stage: str, max_bytes: int = 512 * 1024 * 1024, enabled: bool = True):
+        self.root = os.path.join(cache_dir, stage)
+        self.stage = stage
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None
+
+    @classmethod
+    def from_config(cls, config, stage: str) -> "ResultCache":
+        return cls(
+            config.get('cache_dir', '.LogGuardians/cache'),
+            stage,
+            int(float(config.get('cache_max_mb', 512)) * 1024 * 1024),
+            bool(config.get('cache_enabled', True)),
+        )
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Hashes the parts (strings, or anything JSON-serializable) into a cache key."""
+        digest = hashlib.sha256()
+        for part in parts:
+            if not isinstance(part, (str, bytes)):
+                part = json.dumps(part, sort_keys=True)
+            if isinstance(part, str):
+                part = part.encode('utf-8')
+            digest.update(len(part).to_bytes(8, 'little'))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                value = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            tracer.count("cache_misses")
+            return None
+        os.utime(path)  # mark as recently used
+        self.hits += 1
+        tracer.count("cache_hits")
+        return value
+
+    def put(self, key: str, value: Any):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(value, f, separators=(',', ':'))
+        size = os.path.getsize(tmp_path)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+
+        if self._total_bytes is None:
+            self._total_bytes = self._scan_size()
+        else:
+            self._total_bytes += size - previous
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Deletes least recently used entries until the stage fits in 90% of max_bytes."""
+        target = self.max_bytes * 0.9
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        self._total_bytes = total
+
+    def stats(self) -> str:
+        lookups = self.hits + self.misses
+        rate = (self.hits / lookups) if lookups else 0.0
+        return f"💽 {self.stage} cache: {self.hits} hits, {self.misses} misses ({rate:.0%} hit rate)"
@@ -0,0 +1,98 @@
+from typing import Any, Dict, List, Optional
+
+from google.genai import types
+
+from src.log.guardians.app.utils.json_cleaner import extract_json
+
+# How agents exchange chunk data with the model: 'tools' (the model reads and
+# saves through function calls) or 'direct' (Python puts the chunk in the
+# prompt, the model replies once with schema-constrained JSON, Python saves it)
+AGENT_IO_MODES = ("tools", "direct")
+
+ANOMALY_REPORT_SCHEMA = types.Schema(
+    type=types.Type.OBJECT,
+    properties={
+        "anomalies": types.Schema(
+            type=types.Type.ARRAY,
+            items=types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    "severity": types.Schema(type=types.Type.STRING, enum=["Critical", "High", "Medium", "Low"]),
+                    "description": types.Schema(type=types.Type.STRING),
+                    "evidence": types.Schema(type=types.Type.ARRAY, items=types.Schema(type=types.Type.STRING)),
+                    "correlation": types.Schema(type=types.Type.STRING),
+                },
+                required=["severity", "description", "evidence", "correlation"],
+                property_ordering=["severity", "description", "evidence", "correlation"],
+            ),
+        ),
+    },
+    required=["anomalies"],
+)
+
+
+_SCHEMA_TYPES = {
+    "string": types.Type.STRING,
+    "integer": types.Type.INTEGER,
+    "number": types.Type.NUMBER,
+    "boolean": types.Type.BOOLEAN,
+}
+
+
+def entries_schema(keys: Optional[List[str]], field_types: Optional[Dict[str, str]] = None) -> Optional[types.Schema]:
+    """
+    Response schema for a chunk's converted entries: an array of objects with
+    ``keys`` in order, typed by ``field_types`` (strings where unknown).
+    """
+    if not keys:
+        return None
+    field_types = field_types or {}
+    return types.Schema(
+        type=types.Type.ARRAY,
+        items=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                key: types.Schema(type=_SCHEMA_TYPES.get(field_types.get(key), types.Type.STRING), nullable=True)
+                for key in keys
+            },
+            required=list(keys),
+            property_ordering=list(keys),
+        ),
+    )
+
+
+def schema_keys(schema_text: str) -> Optional[List[str]]:
+    """
+    Field names in order from a schema design reply.
+
+    Accepts ``{"schema_keys": [...]}``, a JSON Schema with ``properties``, a
+    ``{"fields": {...}}`` object, an example entry or a plain list of names;
+    None if the reply has none of these.
+    """
+    design: Any = extract_json(schema_text or "")
+    if isinstance(design, dict):
+        for name in ("schema_keys", "properties", "fields"):
+            if name in design:
+                design = design[name]
+                break
+        if isinstance(design, dict) and design.get("type") == "array":
+            design = design.get("items", {}).get("properties")
+    if isinstance(design, dict):
+        design = list(design)
+    if isinstance(design, list) and design and all(isinstance(key, str) for key in design):
+        return design
+    return None
+
+
+def field_types(schema_text: str) -> Optional[Dict[str, str]]:
+    """``{"field_types": {key: type}}`` from a schema design reply, types normalized; None if absent."""
+    design: Any = extract_json(schema_text or "")
+    declared = design.get("field_types") if isinstance(design, dict) else None
+    if not isinstance(declared, dict):
+        return None
+    aliases = {"str": "string", "int": "integer", "float": "number", "bool": "boolean"}
+    result = {}
+    for key, value in declared.items():
+        value = aliases.get(str(value).lower(), str(value).lower())
+        result[key] = value if value in _SCHEMA_TYPES else "string"
+    return result
@@ -0,0 +1,53 @@
+import os
+from typing import List, Sequence
+
+# Rough characters-per-token ratio for log text and JSON with Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text) -> int:
+    """Cheap token estimate for ``text`` (str or bytes) without calling the API."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def estimate_file_tokens(file_path: str) -> int:
+    """Token estimate for a file's content, from its size alone."""
+    return os.path.getsize(file_path) // CHARS_PER_TOKEN + 1
+
+
+def pack_first_fit_decreasing(sizes: Sequence[int], budget: int) -> List[List[int]]:
+    """
+    Packs items into batches whose total size stays within ``budget``.
+
+    Items are placed largest first into the first batch with room left
+    (first-fit decreasing). An item larger than the budget gets a batch of
+    its own rather than being dropped.
+
+    Returns:
+        Batches of item indices. Each batch is in ascending index order and
+        batches are ordered by their first index, so output follows input
+        order as closely as the packing allows.
+    """
+    batches: List[List[int]] = []
+    remaining: List[int] = []
+    open_batches: List[int] = []  # batches that can still take the smallest item
+    smallest = min(sizes, default=0)
+    for index in sorted(range(len(sizes)), key=lambda i: sizes[i], reverse=True):
+        size = sizes[index]
+        for position, b in enumerate(open_batches):
+            if size <= remaining[b]:
+                batches[b].append(index)
+                remaining[b] -= size
+                break
+        else:
+            b, position = len(batches), len(open_batches)
+            batches.append([index])
+            remaining.append(budget - size)
+            open_batches.append(b)
+        if remaining[b] < smallest:
+            del open_batches[position]
+
+    for batch in batches:
+        batch.sort()
+    batches.sort(key=lambda batch: batch[0])
+    return batches
@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.log.guardians.app.features.chunking.chunk_store import (
+    INDEX_FILE, ChunkRecord, append_index_record, read_index, write_index,
+)
+
+
+def _record(chunk_id, offset, length):
+    return ChunkRecord(chunk_id, offset, length, 1, chunk_id + 1, chunk_id + 1)
+
+
+def test_appended_records_extend_the_cached_index(tmp_path):
+    output_dir = str(tmp_path)
+    write_index(output_dir, str(tmp_path / "chunks.seg"), [])
+    assert read_index(output_dir)[1] == []
+
+    for chunk_id in range(3):
+        append_index_record(output_dir, _record(chunk_id, chunk_id * 10, 10))
+        assert [r.chunk_id for r in read_index(output_dir)[1]] == list(range(chunk_id + 1))
+
+
+def test_larger_index_rewritten_in_place_is_read_again(tmp_path):
+    output_dir = str(tmp_path)
+    index_path = write_index(output_dir, str(tmp_path / "chunks.seg"), [_record(0, 0, 10)])
+    assert [r.length for r in read_index(output_dir)[1]] == [10]
+
+    # Build a longer index elsewhere and copy it over the same inode
+    other_dir = tmp_path / "other"
+    other_dir.mkdir()
+    write_index(str(other_dir), str(other_dir / "chunks.seg"), [_record(0, 0, 99), _record(1, 99, 5)])
+    with open(other_dir / INDEX_FILE, "rb") as f:
+        rewritten = f.read()
+    with open(index_path, "r+b") as f:
+        f.write(rewritten)
+
+    assert [(r.offset, r.length) for r in read_index(output_dir)[1]] == [(0, 99), (99, 5)]
@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.log.guardians.app.features.chunking import chunker
+from src.log.guardians.app.features.chunking.chunk_store import read_chunk_view
+
+ENTRIES = 3000
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "app.log"
+    with open(path, "w") as f:
+        for i in range(ENTRIES):
+            f.write(f"2024-01-01 00:{i // 60 % 60:02d}:{i % 60:02d} INFO worker-{i % 7} request {i} done\n")
+            if i % 5 == 0:
+                # Continuation lines belong to the entry above
+                f.write(f"    at handler.process(line {i})\n")
+    return str(path)
+
+
+def _chunks(log_file, tmp_path, name, max_entries, workers, store):
+    config = {
+        'input_log_file': log_file,
+        'active_profile': 'test',
+        'output_chunk_dir': str(tmp_path / name),
+        'max_entries_per_chunk': max_entries,
+        'chunk_workers': workers,
+        'chunk_store': store,
+        'log_profiles': {'test': {'log_start_regex': r'^\d{4}-\d{2}-\d{2} ', 'description': 'test'}},
+    }
+    paths = chunker.chunk_log_file(config)
+    contents = []
+    for path in paths:
+        view = read_chunk_view(path)
+        if view is not None:
+            contents.append(bytes(view))
+        else:
+            with open(path, 'rb') as f:
+                contents.append(f.read())
+    return [os.path.basename(path) for path in paths], contents
+
+
+@pytest.mark.parametrize("store", ["files", "segment"])
+@pytest.mark.parametrize("max_entries", [7, 500, 200000])
+def test_parallel_chunking_matches_serial(log_file, tmp_path, monkeypatch, store, max_entries):
+    # Small shards so the test file is split across every worker
+    monkeypatch.setattr(chunker, "MIN_SHARD_BYTES", 4096)
+    # Run metrics land in .LogGuardians under the working directory
+    monkeypatch.chdir(tmp_path)
+    serial_names, serial = _chunks(log_file, tmp_path, "serial", max_entries, 1, store)
+    parallel_names, parallel = _chunks(log_file, tmp_path, "parallel", max_entries, 4, store)
+
+    assert parallel_names == serial_names
+    assert len(set(serial_names)) == len(serial_names)
+    assert parallel == serial
+    with open(log_file, 'rb') as f:
+        assert b"".join(serial) == f.read()
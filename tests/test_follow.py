@@ -0,0 +1,87 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.log.guardians.app.features.chunking.chunk_store import SEGMENT_FILE, read_index
+from src.log.guardians.app.features.chunking.follow import LogFollower
+
+OLD = (
+    "2024-01-01 00:00:00 INFO first\n"
+    "2024-01-01 00:00:01 ERROR second\n"
+    "    at old.trace(line 1)\n"
+)
+NEW = "    at new.trace(line 1)\n2024-01-02 00:00:00 INFO third\n"
+
+
+def _follower(tmp_path, store='files', max_entries=500):
+    config = {
+        'input_log_file': str(tmp_path / "app.log"),
+        'active_profile': 'test',
+        'output_chunk_dir': str(tmp_path / "chunks"),
+        'max_entries_per_chunk': max_entries,
+        'chunk_store': store,
+        'log_profiles': {'test': {'log_start_regex': r'^\d{4}-\d{2}-\d{2} ', 'description': 'test'}},
+    }
+    return LogFollower(config, checkpoint_path=str(tmp_path / "checkpoint.json"))
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read().decode()
+
+
+@pytest.mark.parametrize("rotate", [False, True])
+def test_restart_closes_the_open_chunk(tmp_path, rotate):
+    log_path = tmp_path / "app.log"
+    log_path.write_text(OLD)
+    follower = _follower(tmp_path)
+    assert follower.poll() == []
+
+    if rotate:
+        os.rename(log_path, tmp_path / "app.log.1")
+    log_path.write_text(NEW)
+    follower.poll()
+    follower.flush()
+    follower.close()
+
+    # The old content's last entry is closed before any new line is read
+    assert [_read(path) for path in follower.pending] == [OLD, "2024-01-02 00:00:00 INFO third\n"]
+
+
+def test_chunks_stored_after_the_checkpoint_are_not_stored_twice(tmp_path):
+    log_path = tmp_path / "app.log"
+    entries = [f"2024-01-01 00:00:0{i} INFO entry {i}\n" for i in range(4)]
+    log_path.write_text("".join(entries[:2]))
+    follower = _follower(tmp_path, store='segment', max_entries=1)
+    follower.poll()
+    follower.save_checkpoint()
+
+    # Chunks 1 and 2 reach the segment and index, then the process dies
+    with open(log_path, 'a') as f:
+        f.write("".join(entries[2:]))
+    follower.poll()
+    follower.close()
+
+    follower = _follower(tmp_path, store='segment', max_entries=1)
+    follower.poll()
+    follower.close()
+
+    assert [r.chunk_id for r in read_index(follower.output_dir)[1]] == [0, 1, 2]
+    assert _read(os.path.join(follower.output_dir, SEGMENT_FILE)) == "".join(entries[:3])
+
+
+def test_restart_numbers_lines_from_one(tmp_path):
+    log_path = tmp_path / "app.log"
+    log_path.write_text(OLD)
+    follower = _follower(tmp_path, store='segment')
+    follower.poll()
+
+    log_path.write_text(NEW)  # truncated, then rewritten
+    follower.poll()
+    follower.flush()
+    follower.close()
+
+    assert [(r.first_line, r.last_line) for r in read_index(follower.output_dir)[1]] == [(1, 3), (2, 2)]
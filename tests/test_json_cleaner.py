@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.log.guardians.app.utils.json_cleaner import extract_json
+
+
+def test_complete_json_inside_prose():
+    assert extract_json('Here you go:\n```json\n{"anomalies": []}\n```') == {"anomalies": []}
+
+
+def test_truncated_top_level_array_keeps_complete_items():
+    assert extract_json('[{"a": 1}, {"a": 2}, {"a"') == [{"a": 1}, {"a": 2}]
+
+
+@pytest.mark.parametrize("text, expected", [
+    (
+        '{"anomalies": [{"severity": "HIGH", "description": "a"}, {"severity": "LOW", "desc',
+        {"anomalies": [{"severity": "HIGH", "description": "a"}]},
+    ),
+    (
+        '{"anomalies": [{"severity": "HIGH", "description": "a"}, ',
+        {"anomalies": [{"severity": "HIGH", "description": "a"}]},
+    ),
+    (
+        '{"entries": [{"timestamp": "t1", "message": "started"}, {"timestamp": "t2", "message": "sto',
+        {"entries": [{"timestamp": "t1", "message": "started"}]},
+    ),
+    (
+        '```json\n{"entries": [{"timestamp": "t1"}, {"timestamp": "t2"}, {"times',
+        {"entries": [{"timestamp": "t1"}, {"timestamp": "t2"}]},
+    ),
+])
+def test_truncated_wrapped_array_keeps_complete_items(text, expected):
+    assert extract_json(text) == expected
+
+
+def test_truncated_nested_value_keeps_completed_keys():
+    assert extract_json('{"file": "chunk_0001.json", "anomalies": [{"severity": "HIGH"}, ') == {
+        "file": "chunk_0001.json", "anomalies": [{"severity": "HIGH"}],
+    }
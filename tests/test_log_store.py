@@ -0,0 +1,37 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.log.guardians.app.features.storage.log_store import LogStore, store_scope
+
+
+def _store(tmp_path, input_name, profile='test'):
+    config = {'active_profile': profile, 'input_log_file': str(tmp_path / input_name)}
+    return LogStore(str(tmp_path / "store.sqlite"), scope=store_scope(config))
+
+
+def test_runs_on_other_inputs_do_not_mix(tmp_path):
+    first, second = _store(tmp_path, "a.log"), _store(tmp_path, "b.log")
+    first.write_entries("chunk_0000", [{"level": "error", "message": "disk full"}])
+    first.write_anomalies("chunk_0000", {"anomalies": [{"severity": "HIGH", "description": "disk"}]})
+    second.write_entries("chunk_0000", [{"level": "info", "message": "ok"}, {"level": "info", "message": "ok"}])
+
+    assert first.count_by("level") == [{"level": "ERROR", "count": 1}]
+    assert second.count_by("level") == [{"level": "INFO", "count": 2}]
+    assert [a["description"] for a in first.anomalies()] == ["disk"]
+    assert second.anomalies() == []
+    assert _store(tmp_path, "a.log", profile='other').chunks() == []
+
+
+def test_clear_drops_only_its_scope(tmp_path):
+    first, second = _store(tmp_path, "a.log"), _store(tmp_path, "b.log")
+    for store in (first, second):
+        store.write_entries("chunk_0000", [{"level": "info", "message": "ok"}])
+        store.write_anomalies("chunk_0000", {"anomalies": [{"severity": "LOW"}]})
+
+    first.clear()
+    assert first.entries("chunk_0000") is None
+    assert first.anomalies() == []
+    assert second.entries("chunk_0000") == [{"level": "info", "message": "ok"}]
+    assert len(second.anomalies()) == 1
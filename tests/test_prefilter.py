@@ -0,0 +1,43 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.log.guardians.app.features.scoring.prefilter import ChunkPrefilter
+
+SPIKE = 40
+RARE = 70
+
+
+def _chunks():
+    rng = random.Random(0)
+    for c in range(100):
+        records = []
+        for i in range(30):
+            error = c == SPIKE and i % 2 == 0
+            records.append({
+                "level": "ERROR" if error else "INFO",
+                "host": f"node-{rng.randint(1, 6)}",
+                "request": f"req-{c}-{i}",
+                "message": "kernel panic on cpu 3" if c == RARE and i == 0 else f"job {rng.randint(1, 99)} done",
+            })
+        yield records
+
+
+def test_spikes_and_rare_templates_are_suspicious():
+    prefilter = ChunkPrefilter()
+    scores, reasons = prefilter.score(_chunks())
+
+    suspicious = [c for c, score in enumerate(scores) if score >= prefilter.threshold]
+    assert suspicious == [SPIKE, RARE]
+    assert reasons[SPIKE].startswith("level=ERROR spiked")
+    assert reasons[RARE].startswith("rare template 'kernel panic")
+    # Per-entry ids are not categorical, so they never explain a score
+    assert not any("request=" in reason for reason in reasons)
+
+
+def test_columns_over_max_values_are_dropped():
+    _, reasons = ChunkPrefilter(columns=["level", "host"], max_values=3).score(_chunks())
+    assert not any("host=" in reason for reason in reasons)
+    assert any("level=" in reason for reason in reasons)
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.log.guardians.app.features.parsing.record_io import (
+    RECORD_FORMATS, iter_records, read_column, read_records, write_records,
+)
+
+ENTRIES = [
+    {"timestamp": "t1", "level": "INFO", "message": "started"},
+    {"level": "WARN", "timestamp": "t2", "message": "slow", "extra": 1},
+    {"timestamp": "t3", "level": "ERROR", "message": "failed"},
+]
+KEYS = ["timestamp", "level", "message"]
+
+
+@pytest.mark.parametrize("fmt", list(RECORD_FORMATS))
+def test_round_trip(tmp_path, fmt):
+    path = str(tmp_path / f"chunk_0000{RECORD_FORMATS[fmt]}")
+    write_records(path, ENTRIES, KEYS)
+
+    records = read_records(path)
+    assert [list(r)[:3] for r in records] == [KEYS] * 3
+    if fmt != "columnar":  # columnar reads keys an entry lacks back as null
+        assert records == ENTRIES
+    assert list(iter_records(path)) == records
+    assert read_column(path, "level") == ["INFO", "WARN", "ERROR"]
+    assert len(read_column(path, "message")) == len(ENTRIES)
+
+
+@pytest.mark.parametrize("fmt", list(RECORD_FORMATS))
+def test_wrapped_and_single_entries_are_normalized(tmp_path, fmt):
+    path = str(tmp_path / f"chunk_0000{RECORD_FORMATS[fmt]}")
+    write_records(path, {"logs": ENTRIES}, KEYS)
+    assert read_column(path, "message") == ["started", "slow", "failed"]
+
+    write_records(path, ENTRIES[0], KEYS)
+    assert read_records(path) == [ENTRIES[0]]
+
+
+@pytest.mark.parametrize("fmt", list(RECORD_FORMATS))
+def test_non_entries_are_rejected(tmp_path, fmt):
+    path = str(tmp_path / f"chunk_0000{RECORD_FORMATS[fmt]}")
+    write_records(path, ENTRIES, KEYS)
+    with pytest.raises(ValueError):
+        write_records(path, ENTRIES + ["stray text"], KEYS)
+    # The earlier file is left as it was, with no temporary file behind
+    assert len(read_records(path)) == len(ENTRIES)
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
@@ -0,0 +1,29 @@
+import json
+import os
+import sys
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.log.guardians.app.features.parsing.schema_registry import SchemaRegistry
+
+WRITERS = 4
+KEYS_PER_WRITER = 25
+
+
+def _register(args):
+    path, writer = args
+    registry = SchemaRegistry(path)
+    for i in range(KEYS_PER_WRITER):
+        registry.register(f"profile:{writer}:{i}", "schema", ["timestamp", "message"], None, "model")
+
+
+def test_concurrent_writers_keep_every_key(tmp_path):
+    path = str(tmp_path / "schema_registry.json")
+    with Pool(WRITERS) as pool:
+        pool.map(_register, [(path, writer) for writer in range(WRITERS)])
+
+    with open(path) as f:
+        schemas = json.load(f)["schemas"]
+    assert len(schemas) == WRITERS * KEYS_PER_WRITER
+    assert SchemaRegistry(path).lookup("profile:0:0")["revision"] == 1
@@ -0,0 +1,55 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.log.guardians.app.features.parsing.record_io import iter_records, write_records
+from src.log.guardians.app.features.templates.assignments import load_template_ids, save_assignments
+from src.log.guardians.app.features.templates.compress import compress_records
+from src.log.guardians.app.features.templates.drain import TemplateMiner
+
+RECORDS = [
+    {"level": "INFO", "message": f"job {i} finished in {i * 3} ms"} for i in range(5)
+] + [{"level": "ERROR", "message": "disk sda1 full"}]
+
+
+def _setup(tmp_path):
+    config = {'active_profile': 'test', 'template_dir': str(tmp_path / "templates")}
+    json_path = str(tmp_path / "chunk_0000.jsonl")
+    write_records(json_path, RECORDS, ["level", "message"])
+    return config, json_path
+
+
+def test_assignments_are_saved_per_entry(tmp_path):
+    config, json_path = _setup(tmp_path)
+    miner = TemplateMiner()
+    path = save_assignments(config, json_path, miner)
+
+    rows = list(iter_records(path))
+    assert len(rows) == len(RECORDS)
+    assert len({row["template_id"] for row in rows[:5]}) == 1
+    assert rows[0]["params"] == ["0", "0"]
+    assert rows[5]["template_id"] != rows[0]["template_id"]
+
+
+def test_detector_reuses_saved_ids(tmp_path):
+    config, json_path = _setup(tmp_path)
+    miner = TemplateMiner()
+    save_assignments(config, json_path, miner)
+    template_ids = load_template_ids(config, json_path, len(RECORDS), miner)
+
+    assert template_ids is not None
+    before = {t: template.count for t, template in miner.templates.items()}
+    text = compress_records(RECORDS, miner, "chunk_0000.jsonl", template_ids)
+    # Nothing was mined again
+    assert {t: template.count for t, template in miner.templates.items()} == before
+    assert text == compress_records(RECORDS, TemplateMiner(), "chunk_0000.jsonl")
+
+
+def test_mismatched_assignments_are_ignored(tmp_path):
+    config, json_path = _setup(tmp_path)
+    miner = TemplateMiner()
+    assert load_template_ids(config, json_path, len(RECORDS), miner) is None
+    save_assignments(config, json_path, miner)
+    assert load_template_ids(config, json_path, len(RECORDS) + 1, miner) is None
+    assert load_template_ids(config, json_path, len(RECORDS), TemplateMiner()) is None